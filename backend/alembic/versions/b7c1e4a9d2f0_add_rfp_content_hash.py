@@ -0,0 +1,34 @@
+"""add content_hash and analysis_key to rfp_submissions
+
+Revision ID: b7c1e4a9d2f0
+Revises: da43202f3006
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1e4a9d2f0'
+down_revision: Union[str, Sequence[str], None] = 'da43202f3006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rfp_submissions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('rfp_submissions', sa.Column('analysis_key', sa.String(length=64), nullable=True))
+    op.create_index('idx_rfp_content_hash', 'rfp_submissions', ['content_hash'], unique=False)
+    op.create_index('idx_rfp_analysis_key', 'rfp_submissions', ['analysis_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_rfp_analysis_key', table_name='rfp_submissions')
+    op.drop_index('idx_rfp_content_hash', table_name='rfp_submissions')
+    op.drop_column('rfp_submissions', 'analysis_key')
+    op.drop_column('rfp_submissions', 'content_hash')
@@ -0,0 +1,44 @@
+"""add llm_response_cache table
+
+Revision ID: c5a2f8d1e7b3
+Revises: b7c1e4a9d2f0
+Create Date: 2026-10-19 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a2f8d1e7b3'
+down_revision: Union[str, Sequence[str], None] = 'b7c1e4a9d2f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('llm_response_cache',
+    sa.Column('cache_key', sa.String(length=64), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('operation', sa.String(length=50), nullable=False),
+    sa.Column('scope', sa.String(length=50), nullable=True),
+    sa.Column('response', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('last_hit_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index('idx_llm_cache_scope', 'llm_response_cache', ['scope'], unique=False)
+    op.create_index('idx_llm_cache_expires', 'llm_response_cache', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_llm_cache_expires', table_name='llm_response_cache')
+    op.drop_index('idx_llm_cache_scope', table_name='llm_response_cache')
+    op.drop_table('llm_response_cache')
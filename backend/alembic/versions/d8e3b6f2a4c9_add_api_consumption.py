@@ -0,0 +1,47 @@
+"""add api_consumption table
+
+Revision ID: d8e3b6f2a4c9
+Revises: c5a2f8d1e7b3
+Create Date: 2026-10-19 15:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8e3b6f2a4c9'
+down_revision: Union[str, Sequence[str], None] = 'c5a2f8d1e7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('api_consumption',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('operation', sa.String(length=50), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('input_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('output_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('thinking_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('total_tokens', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('latency_ms', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('cost_usd', sa.Float(), nullable=False, server_default='0'),
+    sa.Column('success', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_api_consumption_timestamp', 'api_consumption', ['timestamp'], unique=False)
+    op.create_index('idx_api_consumption_user', 'api_consumption', ['user_id', 'timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_api_consumption_user', table_name='api_consumption')
+    op.drop_index('idx_api_consumption_timestamp', table_name='api_consumption')
+    op.drop_table('api_consumption')
@@ -0,0 +1,40 @@
+"""add embedding columns to experiences, chapters and certifications
+
+Revision ID: e4b9c7a1f5d2
+Revises: d8e3b6f2a4c9
+Create Date: 2026-10-19 17:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9c7a1f5d2'
+down_revision: Union[str, Sequence[str], None] = 'd8e3b6f2a4c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+EMBEDDING_DIMENSIONS = 768
+TABLES = ('experiences', 'chapters', 'certifications')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    for table in TABLES:
+        op.add_column(table, sa.Column('embedding', Vector(EMBEDDING_DIMENSIONS), nullable=True))
+        op.execute(
+            f'CREATE INDEX idx_{table}_embedding ON {table} '
+            f'USING hnsw (embedding vector_cosine_ops)'
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_index(f'idx_{table}_embedding', table_name=table)
+        op.drop_column(table, 'embedding')
@@ -7,6 +7,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 from core.services.analyzer import get_analyzer_service
+from core.services.embeddings import get_embedding_index
 from core.database import get_db
 from core.storage import get_storage_service
 from models.certification import Certification
@@ -78,6 +79,7 @@ async def create_certification(
         location=file_uri,
         description=cert_desc
     )
+    await get_embedding_index().index(cert)
     db.add(cert)
     await db.commit()
     await db.refresh(cert)
@@ -5,7 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from core.services.analyzer import get_analyzer_service
+from core.services.analyzer import get_analyzer_service, CHAPTERS_CACHE_SCOPE
+from core.services.llm_cache import get_llm_response_cache
+from core.services.embeddings import get_embedding_index, rfp_query_text, similarity_recommendations
+from core.config import settings
 from core.database import get_db
 from core.storage import get_storage_service
 from models.chapter import Chapter
@@ -81,9 +84,11 @@ async def create_chapter(
         location=file_uri,
         description=chapter_desc
     )
+    await get_embedding_index().index(chapter)
     db.add(chapter)
     await db.commit()
     await db.refresh(chapter)
+    await get_llm_response_cache().invalidate(CHAPTERS_CACHE_SCOPE)
     
     return {"message": "Capítulo cargado exitosamente", "id": chapter.id}
 
@@ -109,6 +114,7 @@ async def delete_chapter(chapter_id: str, db: AsyncSession = Depends(get_db)):
     from sqlalchemy import delete
     await db.execute(delete(Chapter).where(Chapter.id == chap_uuid))
     await db.commit()
+    await get_llm_response_cache().invalidate(CHAPTERS_CACHE_SCOPE)
     
     return {"message": "Capítulo eliminado exitosamente"}
 
@@ -160,9 +166,19 @@ async def get_chapter_recommendations(
         if not rfp:
             raise HTTPException(status_code=404, detail="RFP not found")
 
-        # 2. Fetch All Active Chapters
-        chap_result = await db.execute(select(Chapter).where(Chapter.is_active == True))
-        chapters = chap_result.scalars().all()
+        # 2. Preselección por similitud de embeddings (o todos si el índice no está disponible)
+        index = get_embedding_index()
+        ranked = await index.shortlist(db, Chapter, rfp_query_text(rfp), Chapter.is_active == True)
+        use_llm = request.use_llm if request.use_llm is not None else settings.RECOMMENDATION_LLM_RERANK
+        
+        if ranked is None:
+            chap_result = await db.execute(select(Chapter).where(Chapter.is_active == True))
+            chapters = chap_result.scalars().all()
+            use_llm = True
+        elif not use_llm:
+            return similarity_recommendations(ranked, "chapter_id")
+        else:
+            chapters = [item for item, _ in ranked]
         
         if not chapters:
             return []
@@ -180,7 +196,9 @@ async def get_chapter_recommendations(
 
         # 4. Call AI Analyzer
         analyzer = get_analyzer_service()
-        recommendations = await analyzer.analyze_chapter_relevance(rfp_summary, chap_list)
+        recommendations = await analyzer.analyze_chapter_relevance(
+            rfp_summary, chap_list, context_key=rfp.analysis_key
+        )
         
         return recommendations
 
@@ -1,7 +1,7 @@
 """
 Endpoints para el Dashboard.
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -145,6 +145,7 @@ async def get_rfps_by_status(
 @router.get("/api-consumption")
 async def get_api_consumption(
     current_user: User = Depends(get_current_user),
+    hours: int = Query(24, ge=1, le=24 * 365, description="Ventana del historial (horas)"),
 ):
     """
     Obtiene el resumen de consumo de la API de Gemini.
@@ -154,9 +155,17 @@ async def get_api_consumption(
     - Tokens consumidos (input, output, thinking)
     - Tasa de éxito
     - Últimos 10 logs
+    - Cache persistente de respuestas (hit rate y entradas por scope)
+    - Historial persistido de las últimas `hours` horas: por modelo, operación
+      y usuario (con latencias p50/p95) y costo por día
     """
     from core.gcp.gemini_client import get_consumption_summary
-    return get_consumption_summary()
+    from core.services.api_consumption import get_consumption_recorder
+    from core.services.llm_cache import get_llm_response_cache
+    summary = get_consumption_summary()
+    summary["response_cache"] = await get_llm_response_cache().stats()
+    summary["history"] = await get_consumption_recorder().summary(hours)
+    return summary
 
 
 @router.get("/storage-info")
@@ -8,7 +8,10 @@ from core.database import get_db
 from models.experience import Experience
 from models.rfp import RFPSubmission
 from models.schemas.experience_schemas import ExperienceCreate, Experience as ExperienceSchema, ExperienceRecommendationRequest, ExperienceRecommendation
-from core.services.analyzer import get_analyzer_service
+from core.services.analyzer import get_analyzer_service, EXPERIENCES_CACHE_SCOPE
+from core.services.llm_cache import get_llm_response_cache
+from core.services.embeddings import get_embedding_index, rfp_query_text, similarity_recommendations
+from core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,9 +26,11 @@ async def get_experiences(db: AsyncSession = Depends(get_db)):
 @router.post("/", response_model=ExperienceSchema)
 async def create_experience(experience: ExperienceCreate, db: AsyncSession = Depends(get_db)):
     new_experience = Experience(**experience.dict())
+    await get_embedding_index().index(new_experience)
     db.add(new_experience)
     await db.commit()
     await db.refresh(new_experience)
+    await get_llm_response_cache().invalidate(EXPERIENCES_CACHE_SCOPE)
     return new_experience
 
 @router.put("/{experience_id}", response_model=ExperienceSchema)
@@ -45,8 +50,10 @@ async def update_experience(
     for key, value in update_data.items():
         setattr(experience, key, value)
     
+    await get_embedding_index().index(experience)
     await db.commit()
     await db.refresh(experience)
+    await get_llm_response_cache().invalidate(EXPERIENCES_CACHE_SCOPE)
     return experience
 
 @router.delete("/{experience_id}")
@@ -58,6 +65,7 @@ async def delete_experience(experience_id: UUID, db: AsyncSession = Depends(get_
     
     await db.execute(delete(Experience).where(Experience.id == experience_id))
     await db.commit()
+    await get_llm_response_cache().invalidate(EXPERIENCES_CACHE_SCOPE)
     return {"message": "Experience deleted successfully"}
     await db.commit()
     return {"message": "Experience deleted successfully"}
@@ -78,9 +86,19 @@ async def get_experience_recommendations(
         if not rfp:
             raise HTTPException(status_code=404, detail="RFP not found")
 
-        # 2. Fetch All Experiences
-        exp_result = await db.execute(select(Experience))
-        experiences = exp_result.scalars().all()
+        # 2. Preselección por similitud de embeddings (o todas si el índice no está disponible)
+        index = get_embedding_index()
+        ranked = await index.shortlist(db, Experience, rfp_query_text(rfp))
+        use_llm = request.use_llm if request.use_llm is not None else settings.RECOMMENDATION_LLM_RERANK
+        
+        if ranked is None:
+            exp_result = await db.execute(select(Experience))
+            experiences = exp_result.scalars().all()
+            use_llm = True
+        elif not use_llm:
+            return similarity_recommendations(ranked, "experience_id")
+        else:
+            experiences = [item for item, _ in ranked]
         
         if not experiences:
             return []
@@ -99,7 +117,9 @@ async def get_experience_recommendations(
 
         # 4. Call AI Analyzer
         analyzer = get_analyzer_service()
-        recommendations = await analyzer.analyze_experience_relevance(rfp_summary, exp_list)
+        recommendations = await analyzer.analyze_experience_relevance(
+            rfp_summary, exp_list, context_key=rfp.analysis_key
+        )
         
         return recommendations
 
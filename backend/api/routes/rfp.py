@@ -2,12 +2,14 @@
 Endpoints para gestión de RFPs.
 Usa almacenamiento híbrido (GCS con fallback local).
 """
+import json
 import logging
+from contextlib import aclosing
 from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -15,7 +17,9 @@ from sqlalchemy.orm import selectinload
 from core.database import get_db
 from core.dependencies import get_current_user
 from core.storage import get_storage_service
-from core.services.analyzer import get_analyzer_service
+from core.gcp.gemini_client import get_gemini_client
+from core.services.analyzer import get_analyzer_service, compute_content_hash
+from core.services.analysis_jobs import get_analysis_queue, QueueFullError
 from core.services.mcp_client import get_mcp_client, convert_team_estimation_to_mcp_roles
 from models.rfp import RFPSubmission, RFPQuestion, RFPStatus
 from models.user import User
@@ -34,22 +38,29 @@ from models.schemas import (
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/rfp", tags=["RFP"])
 
+SSE_HEARTBEAT_SECONDS = 15
+
 
 # ============ UPLOAD ============
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_rfp(
     file: UploadFile = File(...),
+    force_reanalysis: bool = False,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """
-    Sube un archivo RFP y realiza el análisis con Gemini.
+    Sube un archivo RFP y encola su análisis con Gemini.
     
     - Acepta PDF y DOCX
     - Guarda localmente (o GCS si está disponible)
-    - Realiza análisis SÍNCRONO (espera a que termine)
-    - Retorna cuando el análisis está completo
+    - Retorna de inmediato con status ANALYZING y el id del job
+    - El progreso se sigue en GET /rfp/{id}/events (SSE) o GET /rfp/jobs/{job_id}
+    - Las preguntas para el cliente se generan junto con el análisis
+    - Si el mismo archivo ya fue analizado (hash SHA-256) con el mismo prompt,
+      modo y catálogo de certificaciones, se reutiliza ese análisis
+      salvo que `force_reanalysis=true`
     """
     # Validar tipo de archivo
     allowed_types = [
@@ -65,6 +76,7 @@ async def upload_rfp(
     # Leer contenido
     content = await file.read()
     file_size = len(content)
+    content_hash = compute_content_hash(content)
     
     # Obtener nombre de archivo
     filename = file.filename or "documento_sin_nombre.pdf"
@@ -83,6 +95,7 @@ async def upload_rfp(
         file_name=filename,
         file_gcs_path=file_uri,
         file_size_bytes=file_size,
+        content_hash=content_hash,
         status=RFPStatus.ANALYZING.value,  # Directamente analyzing
     )
     db.add(rfp)
@@ -94,102 +107,102 @@ async def upload_rfp(
     analysis_mode = user_prefs.get("analysis_mode", "balanced")
     logger.info(f"Using analysis mode: {analysis_mode} (from user preferences)")
     
-    # Realizar análisis SÍNCRONO
+    # Encolar análisis (workers en background)
+    queue = get_analysis_queue()
     try:
-        analyzer = get_analyzer_service()
-        extracted_data = await analyzer.analyze_rfp_from_content(
-            content, 
+        job = queue.submit(
+            str(rfp.id),
             filename,
+            content=content,
+            file_uri=file_uri,
             analysis_mode=analysis_mode,
-            db=db,
-        )
-        
-        # Extraer campos indexados
-        indexed_fields = analyzer.extract_indexed_fields(extracted_data)
-        
-        # Actualizar RFP con resultados
-        rfp.extracted_data = extracted_data
-        rfp.status = RFPStatus.ANALYZED.value
-        rfp.analyzed_at = datetime.utcnow()
-        
-        for field, value in indexed_fields.items():
-            setattr(rfp, field, value)
-        
-        # Guardar recommended_isos en su columna específica
-        if "recommended_isos" in extracted_data:
-            rfp.recommended_isos = extracted_data["recommended_isos"]
-        
-        await db.commit()
-        await db.refresh(rfp)
-        
-        logger.info(f"RFP analysis completed: {rfp.id}")
-        
-        return UploadResponse(
-            id=rfp.id,
-            file_name=filename,
-            status=RFPStatus.ANALYZED.value,
-            message="RFP subido y analizado exitosamente.",
+            force=force_reanalysis,
+            user_id=str(current_user.id),
         )
-        
-    except Exception as e:
-        logger.error(f"Error analyzing RFP {rfp.id}: {e}")
+    except QueueFullError as e:
         rfp.status = RFPStatus.ERROR.value
         await db.commit()
-        
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error al analizar el RFP: {str(e)}"
-        )
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    logger.info(f"RFP {rfp.id} queued for analysis (job {job.id})")
+    
+    return UploadResponse(
+        id=rfp.id,
+        file_name=filename,
+        status=RFPStatus.ANALYZING.value,
+        message="RFP subido. Análisis en progreso.",
+        job_id=job.id,
+    )
 
 
-async def analyze_rfp_task(rfp_id: str, file_uri: str, file_content: bytes):
-    """Task en background para analizar el RFP."""
-    from core.database import AsyncSessionLocal
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Estado de un job de análisis (polling).
+    """
+    job = get_analysis_queue().get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job.to_dict()
+
+
+def _sse(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/{rfp_id}/events")
+async def rfp_events(
+    rfp_id: UUID,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Progreso del análisis de un RFP via Server-Sent Events.
     
-    async with AsyncSessionLocal() as db:
-        rfp = None
+    - Eventos `progress` mientras el job corre y `completed`/`failed` al terminar
+    - Si no hay job en memoria, emite el estado actual del RFP y cierra
+    """
+    result = await db.execute(
+        select(RFPSubmission.status).where(RFPSubmission.id == rfp_id)
+    )
+    status = result.scalar_one_or_none()
+    if status is None:
+        raise HTTPException(status_code=404, detail="RFP no encontrado")
+    
+    # El cleanup de get_db corre al terminar la respuesta: liberar la conexión
+    # (compartida con get_current_user) para no retenerla durante todo el stream
+    await db.close()
+    
+    job = get_analysis_queue().job_for_rfp(rfp_id)
+    
+    async def event_stream():
+        if job is None:
+            yield _sse("status", {"rfp_id": str(rfp_id), "rfp_status": status})
+            return
+        
+        events = get_analysis_queue().subscribe(job, heartbeat=SSE_HEARTBEAT_SECONDS)
         try:
-            # Obtener RFP
-            result = await db.execute(
-                select(RFPSubmission).where(RFPSubmission.id == rfp_id)
-            )
-            rfp = result.scalar_one_or_none()
-            
-            if not rfp:
-                logger.error(f"RFP not found: {rfp_id}")
-                return
-            
-            # Actualizar status
-            rfp.status = RFPStatus.ANALYZING.value
-            await db.commit()
-            
-            # Analizar con Gemini
-            analyzer = get_analyzer_service()
-            extracted_data = await analyzer.analyze_rfp_from_content(file_content, rfp.file_name, db=db)
-            
-            # Extraer campos indexados
-            indexed_fields = analyzer.extract_indexed_fields(extracted_data)
-            
-            # Actualizar RFP
-            rfp.extracted_data = extracted_data
-            rfp.status = RFPStatus.ANALYZED.value
-            rfp.analyzed_at = datetime.utcnow()
-            
-            for field, value in indexed_fields.items():
-                setattr(rfp, field, value)
-            
-            # Guardar recommended_isos en su columna específica
-            if "recommended_isos" in extracted_data:
-                rfp.recommended_isos = extracted_data["recommended_isos"]
-            
-            await db.commit()
-            logger.info(f"RFP analysis completed: {rfp_id}")
-            
-        except Exception as e:
-            logger.error(f"Error analyzing RFP {rfp_id}: {e}")
-            if rfp:
-                rfp.status = RFPStatus.ERROR.value
-                await db.commit()
+            async for event in events:
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                name = event["status"] if event["status"] in ("completed", "failed") else "progress"
+                yield _sse(name, event)
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============ DOWNLOAD ============
@@ -399,12 +412,13 @@ async def make_decision(
     rfp.decided_at = datetime.utcnow()
     rfp.status = RFPStatus.GO.value if decision.decision == "go" else RFPStatus.NO_GO.value
     
-    # Si es GO, generar preguntas en background
-    if decision.decision == "go" and rfp.extracted_data:
+    # Si es GO y el análisis no dejó preguntas, generarlas en background
+    if decision.decision == "go" and rfp.extracted_data and not rfp.questions:
         background_tasks.add_task(
             generate_questions_task, 
             str(rfp.id), 
-            rfp.extracted_data
+            rfp.extracted_data,
+            rfp.analysis_key,
         )
     
     await db.commit()
@@ -413,14 +427,14 @@ async def make_decision(
     return RFPDetail.model_validate(rfp)
 
 
-async def generate_questions_task(rfp_id: str, extracted_data: dict):
+async def generate_questions_task(rfp_id: str, extracted_data: dict, context_key: str | None = None):
     """Task en background para generar preguntas."""
     from core.database import AsyncSessionLocal
     
     async with AsyncSessionLocal() as db:
         try:
             analyzer = get_analyzer_service()
-            questions = await analyzer.generate_questions(extracted_data)
+            questions = await analyzer.generate_questions(extracted_data, context_key=context_key)
             
             # Obtener RFP
             result = await db.execute(
@@ -499,7 +513,7 @@ async def regenerate_questions(
     
     # Generar nuevas preguntas
     analyzer = get_analyzer_service()
-    questions = await analyzer.generate_questions(rfp.extracted_data)
+    questions = await analyzer.generate_questions(rfp.extracted_data, context_key=rfp.analysis_key)
     
     # Crear en BD
     new_questions = []
@@ -546,6 +560,20 @@ async def delete_rfp(
     except Exception as e:
         logger.warning(f"Failed to delete local file: {e}")
     
+    # Eliminar el contexto cacheado en Gemini si ningún otro RFP comparte el análisis
+    if rfp.analysis_key:
+        shared = await db.execute(
+            select(func.count(RFPSubmission.id)).where(
+                RFPSubmission.analysis_key == rfp.analysis_key,
+                RFPSubmission.id != rfp.id,
+            )
+        )
+        if not shared.scalar():
+            try:
+                await get_gemini_client().delete_context_cache(rfp.analysis_key)
+            except Exception as e:
+                logger.warning(f"Failed to delete Gemini context cache: {e}")
+    
     # Eliminar de BD (cascade eliminará las preguntas)
     await db.delete(rfp)
     await db.commit()
@@ -618,8 +646,8 @@ async def suggest_team(
             detail="RFP no tiene estimación de equipo. Vuelva a analizar el documento."
         )
     
-    # Si ya tiene suggested_team y no se fuerza refresh, retornarlo
-    if suggested_team and not force_refresh:
+    # Si ya tiene suggested_team completo y no se fuerza refresh, retornarlo
+    if suggested_team and not suggested_team.get("parcial") and not force_refresh:
         logger.info(f"Returning cached suggested team for RFP {rfp_id}")
         return {
             "rfp_id": rfp_id,
@@ -664,13 +692,46 @@ async def suggest_team(
             "message": "MCP no disponible. Solo se muestra estimación.",
         }
     
-    # Llamar a MCP
+    # Llamar a MCP en modo streaming: cada rol resuelto se persiste de inmediato,
+    # asi un equipo grande no depende de una unica respuesta dentro del timeout
     try:
-        mcp_results = await mcp_client.search_team(mcp_roles)
+        mcp_results: dict = {
+            "exito": True,
+            "resultados": {},
+            "total_candidatos": 0,
+            "generated_at": datetime.utcnow().isoformat(),
+            "mcp_available": True,
+            "parcial": True,
+        }
         
-        # Agregar metadata
-        mcp_results["generated_at"] = datetime.utcnow().isoformat()
-        mcp_results["mcp_available"] = True
+        # aclosing: el break en el resumen cierra el stream (y su conexión HTTP)
+        async with aclosing(mcp_client.search_team_stream(mcp_roles)) as stream:
+            async for record in stream:
+                tipo = record.pop("tipo", None)
+                
+                if tipo == "rol":
+                    mcp_results["resultados"][record["rol_id"]] = record
+                    mcp_results["total_candidatos"] += record.get("total", 0)
+                elif tipo == "error":
+                    logger.warning(f"MCP role {record.get('rol_id')} failed: {record.get('error')}")
+                    mcp_results.setdefault("errores", {})[record.get("rol_id")] = record.get("error")
+                    continue
+                elif tipo == "resumen":
+                    mcp_results["exito"] = record.get("exito", False)
+                    if record.get("mensaje"):
+                        mcp_results["mensaje"] = record["mensaje"]
+                    if record.get("error"):
+                        mcp_results["error"] = record["error"]
+                    # Un resumen con "error" lo genera el cliente: el stream se corto
+                    mcp_results["parcial"] = "error" in record
+                    break
+                else:
+                    continue
+                
+                # Persistir parcial (JSONB sin MutableDict: reasignar para marcar el cambio)
+                rfp.extracted_data = {**rfp.extracted_data, "suggested_team": dict(mcp_results)}
+                rfp.updated_at = datetime.utcnow()
+                await db.commit()
         
         # Calcular cobertura
         roles_with_candidates = sum(
@@ -683,7 +744,7 @@ async def suggest_team(
         )
         
         # Guardar en extracted_data
-        rfp.extracted_data["suggested_team"] = mcp_results
+        rfp.extracted_data = {**rfp.extracted_data, "suggested_team": mcp_results}
         rfp.updated_at = datetime.utcnow()
         await db.commit()
         
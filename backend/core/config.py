@@ -50,6 +50,170 @@ class Settings(BaseSettings):
         default="gemini-3-pro-preview",
         description="Gemini model to use (gemini-3-pro-preview es el más potente para análisis complejos)"
     )
+    GEMINI_TIMEOUT_SECONDS: float = Field(
+        default=120.0,
+        description="Timeout por llamada a Gemini (segundos)"
+    )
+    GEMINI_GROUNDING_TIMEOUT_SECONDS: float = Field(
+        default=180.0,
+        description="Timeout por llamada a Gemini con Google Search grounding (segundos)"
+    )
+    
+    # Límites y reintentos de llamadas a Gemini (scheduler compartido)
+    GEMINI_MAX_CONCURRENCY: int = Field(
+        default=8,
+        description="Llamadas a Gemini en vuelo como máximo"
+    )
+    GEMINI_RPM: int = Field(
+        default=60,
+        description="Requests por minuto por modelo (default)"
+    )
+    GEMINI_TPM: int = Field(
+        default=1_000_000,
+        description="Tokens por minuto por modelo (default)"
+    )
+    GEMINI_MODEL_LIMITS: str = Field(
+        default="",
+        description='Límites por modelo en JSON, ej: {"gemini-3-pro-preview": {"rpm": 25, "tpm": 1000000}}'
+    )
+    GEMINI_MAX_RETRIES: int = Field(
+        default=4,
+        description="Reintentos ante 429/5xx/errores de red"
+    )
+    GEMINI_RETRY_BASE_DELAY: float = Field(
+        default=1.0,
+        description="Base del backoff exponencial (segundos)"
+    )
+    GEMINI_RETRY_MAX_DELAY: float = Field(
+        default=30.0,
+        description="Espera máxima entre reintentos (segundos)"
+    )
+    
+    # Context caching de Gemini (documento del RFP reutilizado entre llamadas)
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="Cachear en Gemini el documento y análisis de cada RFP"
+    )
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: float = Field(
+        default=3600.0,
+        description="Vigencia del contenido cacheado en Gemini (segundos)"
+    )
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = Field(
+        default=4096,
+        description="Tokens estimados mínimos para cachear un documento"
+    )
+    
+    # Cache persistente de respuestas de Gemini (tabla llm_response_cache)
+    LLM_CACHE_ENABLED: bool = Field(
+        default=True,
+        description="Reutilizar respuestas de prompts deterministas (experiencias, capítulos)"
+    )
+    LLM_CACHE_TTL_SECONDS: float = Field(
+        default=604800.0,
+        description="Vigencia de cada respuesta cacheada (segundos, default 7 días)"
+    )
+    
+    # Embeddings: prefiltro de experiencias, capítulos y certificaciones (pgvector)
+    EMBEDDINGS_ENABLED: bool = Field(
+        default=True,
+        description="Preseleccionar por similitud de embeddings antes de consultar al LLM"
+    )
+    EMBEDDING_MODEL: str = Field(
+        default="gemini-embedding-001",
+        description="Modelo de embeddings de Gemini"
+    )
+    EMBEDDING_DIMENSIONS: int = Field(
+        default=768,
+        description="Dimensión de los vectores (debe coincidir con las columnas vector de la migración)"
+    )
+    EMBEDDING_QUERY_MAX_CHARS: int = Field(
+        default=8000,
+        description="Caracteres del RFP usados como consulta de similitud"
+    )
+    RECOMMENDATION_SHORTLIST_SIZE: int = Field(
+        default=30,
+        description="Elementos más similares que pasan al ranking del LLM"
+    )
+    RECOMMENDATION_LLM_RERANK: bool = Field(
+        default=True,
+        description="Ordenar la preselección con Gemini (False: solo similitud de embeddings)"
+    )
+    
+    # Historial de consumo de Gemini (tabla api_consumption)
+    CONSUMPTION_PERSIST_ENABLED: bool = Field(
+        default=True,
+        description="Guardar cada llamada a Gemini en la tabla api_consumption"
+    )
+    CONSUMPTION_RECENT_LOGS: int = Field(
+        default=200,
+        description="Registros recientes que se mantienen en memoria"
+    )
+    CONSUMPTION_BATCH_SIZE: int = Field(
+        default=100,
+        description="Registros por lote de escritura"
+    )
+    CONSUMPTION_FLUSH_INTERVAL_SECONDS: float = Field(
+        default=5.0,
+        description="Intervalo máximo entre escrituras (segundos)"
+    )
+    CONSUMPTION_MAX_PENDING: int = Field(
+        default=10000,
+        description="Registros pendientes máximos si la base de datos no responde"
+    )
+    CONSUMPTION_RETENTION_DAYS: int = Field(
+        default=180,
+        description="Días de historial que se conservan (0 = sin límite)"
+    )
+    
+    # Cola de análisis de RFPs (background)
+    ANALYSIS_MAX_CONCURRENCY: int = Field(
+        default=2,
+        description="Análisis de RFP simultáneos como máximo"
+    )
+    ANALYSIS_QUEUE_MAX_PENDING: int = Field(
+        default=100,
+        description="RFPs en espera antes de rechazar nuevos uploads (503)"
+    )
+    ANALYSIS_RECOVER_ON_STARTUP: bool = Field(
+        default=True,
+        description="Re-encolar al arrancar los RFPs que quedaron en 'analyzing'"
+    )
+    
+    # Análisis map-reduce de RFPs grandes
+    ANALYSIS_MAP_REDUCE_MIN_CHARS: int = Field(
+        default=400_000,
+        description="Caracteres a partir de los cuales el RFP se analiza por secciones"
+    )
+    ANALYSIS_SECTION_MAX_CHARS: int = Field(
+        default=120_000,
+        description="Tamaño máximo de cada sección en el análisis map-reduce"
+    )
+    ANALYSIS_MAP_CONCURRENCY: int = Field(
+        default=4,
+        description="Secciones analizadas en paralelo como máximo"
+    )
+    
+    # Extracción de texto (pool de procesos)
+    EXTRACTION_MAX_WORKERS: int = Field(
+        default=0,
+        description="Procesos del pool de extracción (0 = número de CPUs)"
+    )
+    EXTRACTION_MAX_PAGES: int = Field(
+        default=500,
+        description="Páginas máximas a extraer por PDF"
+    )
+    EXTRACTION_TIMEOUT_SECONDS: float = Field(
+        default=60.0,
+        description="Timeout de la extracción de texto por documento (segundos)"
+    )
+    EXTRACTION_PAGES_PER_CHUNK: int = Field(
+        default=25,
+        description="Páginas por tarea al extraer PDFs grandes en paralelo"
+    )
+    EXTRACTION_PARALLEL_MIN_PAGES: int = Field(
+        default=50,
+        description="Páginas a partir de las cuales un PDF se extrae en paralelo"
+    )
     
     # MCP Talent Search Server
     MCP_TALENT_URL: str = Field(
@@ -8,6 +8,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.database import get_db
+from core.gcp.gemini_client import set_consumption_user
 from core.services.auth import decode_access_token, get_user_by_id
 from models.user import User
 
@@ -54,6 +55,8 @@ async def get_current_user(
             detail="Usuario inactivo",
         )
     
+    # Las llamadas a Gemini del request se atribuyen a este usuario
+    set_consumption_user(user.id)
     return user
 
 
@@ -2,11 +2,16 @@
 Cliente para Gemini via Google Gen AI SDK.
 Usa API Key para autenticación directa con Gemini 3 Pro.
 """
+import asyncio
 import json
 import logging
 import os
 import re
 import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any, Literal
@@ -15,6 +20,7 @@ from google import genai
 from google.genai import types
 
 from core.config import settings
+from core.gcp.rate_limiter import get_gemini_scheduler
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +52,11 @@ PRICING = {
         "input": 0.10,      # $0.10 / 1M input tokens
         "output": 0.40,     # $0.40 / 1M output tokens
     },
+    # Embeddings (prefiltro de recomendaciones)
+    "gemini-embedding-001": {
+        "input": 0.15,      # $0.15 / 1M input tokens
+        "output": 0.0,
+    },
     # Fallback para modelos no listados
     "default": {
         "input": 2.00,
@@ -70,6 +81,45 @@ def calculate_cost(model: str, input_tokens: int, output_tokens: int, thinking_t
     return cost
 
 
+def estimate_text_tokens(contents: Any) -> int:
+    """
+    Tokens estimados (~4 caracteres por token) de las partes de texto.
+    
+    Las partes binarias (p.ej. el PDF de `analyze_pdf_bytes`) no se cuentan:
+    su costo real se descuenta del TPM al recibir la respuesta.
+    """
+    if isinstance(contents, str):
+        return len(contents) // 4
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_text_tokens(item) for item in contents)
+    if isinstance(contents, dict):
+        return estimate_text_tokens(contents.get("text") or contents.get("parts") or "")
+    text = getattr(contents, "text", None)
+    if isinstance(text, str):
+        return len(text) // 4
+    parts = getattr(contents, "parts", None)
+    return estimate_text_tokens(parts) if parts else 0
+
+
+# Usuario al que se atribuyen las llamadas (lo fija la autenticación o el job de análisis)
+_consumption_user: ContextVar[str | None] = ContextVar("consumption_user", default=None)
+
+
+def set_consumption_user(user_id: Any):
+    """Atribuye al usuario las llamadas a Gemini del request actual."""
+    _consumption_user.set(str(user_id) if user_id is not None else None)
+
+
+@contextmanager
+def consumption_user(user_id: Any) -> Iterator[None]:
+    """Atribuye al usuario las llamadas a Gemini hechas dentro del bloque."""
+    token = _consumption_user.set(str(user_id) if user_id is not None else None)
+    try:
+        yield
+    finally:
+        _consumption_user.reset(token)
+
+
 @dataclass
 class APIConsumptionLog:
     """Registro de consumo de API."""
@@ -84,12 +134,14 @@ class APIConsumptionLog:
     cost_usd: float = 0.0
     success: bool = True
     error: str | None = None
+    user_id: str | None = field(default_factory=_consumption_user.get)
     
     def to_dict(self) -> dict:
         return {
             "timestamp": self.timestamp.isoformat(),
             "model": self.model,
             "operation": self.operation,
+            "user_id": self.user_id,
             "input_tokens": self.input_tokens,
             "output_tokens": self.output_tokens,
             "total_tokens": self.total_tokens,
@@ -103,8 +155,15 @@ class APIConsumptionLog:
 
 @dataclass
 class ConsumptionTracker:
-    """Tracker para monitorear consumo total de API."""
-    logs: list[APIConsumptionLog] = field(default_factory=list)
+    """
+    Tracker para monitorear consumo total de API.
+    
+    En memoria solo quedan los últimos `CONSUMPTION_RECENT_LOGS` registros;
+    el historial completo se escribe en lotes en la tabla `api_consumption`.
+    """
+    logs: deque[APIConsumptionLog] = field(
+        default_factory=lambda: deque(maxlen=settings.CONSUMPTION_RECENT_LOGS)
+    )
     total_input_tokens: int = 0
     total_output_tokens: int = 0
     total_thinking_tokens: int = 0
@@ -113,7 +172,7 @@ class ConsumptionTracker:
     total_cost_usd: float = 0.0
     
     def add_log(self, log: APIConsumptionLog):
-        """Agrega un log y actualiza totales."""
+        """Agrega un log, actualiza totales y lo encola para persistirlo."""
         self.logs.append(log)
         self.total_requests += 1
         
@@ -125,40 +184,30 @@ class ConsumptionTracker:
         else:
             self.failed_requests += 1
         
+        if settings.CONSUMPTION_PERSIST_ENABLED:
+            # Import diferido: core.services importa este módulo
+            from core.services.api_consumption import get_consumption_recorder
+            get_consumption_recorder().record(log)
+        
         # Log to console
         self._log_to_console(log)
     
     def _log_to_console(self, log: APIConsumptionLog):
-        """Imprime log formateado en consola."""
-        status = "✅ SUCCESS" if log.success else "❌ FAILED"
-        logger.info(
-            f"\n{'='*70}\n"
-            f"💎 GEMINI API CONSUMPTION LOG\n"
-            f"{'='*70}\n"
-            f"📅 Timestamp: {log.timestamp.strftime('%Y-%m-%d %H:%M:%S')}\n"
-            f"🔧 Operation: {log.operation}\n"
-            f"🤖 Model: {log.model}\n"
-            f"📊 Status: {status}\n"
-            f"⏱️  Latency: {log.latency_ms:.2f}ms\n"
-            f"{'─'*70}\n"
-            f"📥 Input Tokens:    {log.input_tokens:>10,}\n"
-            f"📤 Output Tokens:   {log.output_tokens:>10,}\n"
-            f"🧠 Thinking Tokens: {log.thinking_tokens:>10,}\n"
-            f"📊 Total Tokens:    {log.total_tokens:>10,}\n"
-            f"{'─'*70}\n"
-            f"💵 THIS REQUEST COST: ${log.cost_usd:.6f} USD\n"
-            f"{'─'*70}\n"
-            f"📈 SESSION TOTALS:\n"
-            f"   Requests: {self.total_requests} (Failed: {self.failed_requests})\n"
-            f"   Input:    {self.total_input_tokens:,} tokens\n"
-            f"   Output:   {self.total_output_tokens:,} tokens\n"
-            f"   Thinking: {self.total_thinking_tokens:,} tokens\n"
-            f"   💰 TOTAL SESSION COST: ${self.total_cost_usd:.6f} USD\n"
-            f"{'='*70}\n"
-        )
+        """Una línea por llamada."""
+        if log.success:
+            logger.info(
+                f"Gemini {log.operation} [{log.model}] {log.latency_ms:.0f}ms "
+                f"in={log.input_tokens} out={log.output_tokens} thinking={log.thinking_tokens} "
+                f"cost=${log.cost_usd:.6f} (session ${self.total_cost_usd:.4f}, "
+                f"{self.total_requests} requests)"
+            )
+        else:
+            logger.warning(
+                f"Gemini {log.operation} [{log.model}] FAILED after {log.latency_ms:.0f}ms: {log.error}"
+            )
     
     def get_summary(self) -> dict:
-        """Retorna resumen de consumo."""
+        """Retorna resumen de consumo del proceso actual."""
         return {
             "total_requests": self.total_requests,
             "failed_requests": self.failed_requests,
@@ -171,7 +220,7 @@ class ConsumptionTracker:
             "total_thinking_tokens": self.total_thinking_tokens,
             "total_tokens": self.total_input_tokens + self.total_output_tokens + self.total_thinking_tokens,
             "total_cost_usd": round(self.total_cost_usd, 6),
-            "recent_logs": [log.to_dict() for log in self.logs[-10:]],
+            "recent_logs": [log.to_dict() for log in list(self.logs)[-10:]],
         }
 
 
@@ -179,6 +228,19 @@ class ConsumptionTracker:
 consumption_tracker = ConsumptionTracker()
 
 
+class GeminiTimeoutError(TimeoutError):
+    """Gemini no respondió dentro del timeout de la llamada."""
+
+
+@dataclass
+class ContextCacheEntry:
+    """Contenido cacheado en Gemini (context caching explícito)."""
+    name: str
+    model: str
+    expires_at: float
+    tokens: int = 0
+
+
 # Configuraciones de modo de análisis - Gemini 3 Family
 ANALYSIS_MODES = {
     "fast": {
@@ -218,6 +280,9 @@ class GeminiClient:
         # Usar modelo Gemini 3 Pro
         self.model_id = settings.GEMINI_MODEL
         
+        # Contenidos cacheados por documento: (clave, modelo) -> entrada
+        self._context_caches: dict[tuple[str, str], ContextCacheEntry] = {}
+        
         logger.info(f"Gemini client initialized with API Key")
         logger.info(f"Gemini model: {self.model_id}")
     
@@ -280,6 +345,172 @@ class GeminiClient:
         # Si nada funciona, lanzar error
         raise json.JSONDecodeError("No valid JSON found", text, 0)
     
+    async def _generate_content(
+        self,
+        *,
+        model: str,
+        contents: Any,
+        config: dict[str, Any],
+        timeout: float | None = None,
+        cached_content: str | None = None,
+    ):
+        """
+        Llama a Gemini sin bloquear el event loop (superficie async del SDK).
+        
+        La llamada se cancela si supera el timeout o si se cancela la tarea
+        que la espera (p.ej. el cliente HTTP cerró la conexión).
+        
+        Args:
+            cached_content: Nombre de un contenido cacheado a usar como contexto
+        
+        Raises:
+            GeminiTimeoutError: Si Gemini no responde a tiempo
+        """
+        timeout = timeout or settings.GEMINI_TIMEOUT_SECONDS
+        if cached_content:
+            config = {**config, "cached_content": cached_content}
+        
+        async def call():
+            try:
+                return await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=model,
+                        contents=contents,
+                        config=config,
+                    ),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                raise GeminiTimeoutError(f"Gemini no respondió en {timeout:.0f}s ({model})")
+        
+        # Cuotas, concurrencia, prioridad y reintentos (ver rate_limiter)
+        estimated_tokens = estimate_text_tokens(contents) + config.get("max_output_tokens", 0)
+        return await get_gemini_scheduler().run(
+            model,
+            call,
+            estimated_tokens=estimated_tokens,
+            actual_tokens=lambda response: sum(self._extract_token_counts(response)),
+        )
+    
+    async def create_context_cache(
+        self,
+        key: str,
+        content: str,
+        model: str | None = None,
+        ttl_seconds: float | None = None,
+        replace: bool = False,
+    ) -> str | None:
+        """
+        Cachea un documento en Gemini para reutilizarlo en llamadas posteriores.
+        
+        Args:
+            key: Identificador del contenido (p.ej. analysis_key del RFP)
+            content: Texto a cachear
+            model: Modelo que usará el cache (default GEMINI_MODEL)
+            ttl_seconds: Vigencia (default GEMINI_CONTEXT_CACHE_TTL_SECONDS)
+            replace: Si ya existe un cache para `key`, eliminarlo y crear
+                uno nuevo con `content` (en vez de reutilizarlo)
+            
+        Returns:
+            Nombre del contenido cacheado, o None si el caching no aplica
+            (deshabilitado, documento pequeño o error al crearlo)
+        """
+        if not settings.GEMINI_CONTEXT_CACHE_ENABLED or not key:
+            return None
+        
+        model = model or self.model_id
+        self.cleanup_context_caches()
+        if replace:
+            await self.delete_context_cache(key, model)
+        existing = self.get_context_cache(key, model)
+        if existing:
+            return existing
+        
+        # Gemini exige un mínimo de tokens para cachear (~4 caracteres por token)
+        if len(content) // 4 < settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        
+        ttl = ttl_seconds or settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS
+        start_time = time.time()
+        log = APIConsumptionLog(
+            timestamp=datetime.now(),
+            model=model,
+            operation="create_context_cache",
+        )
+        try:
+            cache = await get_gemini_scheduler().run(
+                model,
+                lambda: asyncio.wait_for(
+                    self.client.aio.caches.create(
+                        model=model,
+                        config=types.CreateCachedContentConfig(
+                            contents=content,
+                            display_name=f"rfp-{key[:16]}",
+                            ttl=f"{int(ttl)}s",
+                        ),
+                    ),
+                    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+                ),
+                estimated_tokens=len(content) // 4,
+            )
+        except Exception as e:
+            log.latency_ms = (time.time() - start_time) * 1000
+            log.success = False
+            log.error = str(e)
+            consumption_tracker.add_log(log)
+            logger.warning(f"Could not create Gemini context cache for {key[:16]}: {e}")
+            return None
+        
+        usage = getattr(cache, "usage_metadata", None)
+        tokens = getattr(usage, "total_token_count", 0) or 0
+        log.input_tokens = tokens
+        log.total_tokens = tokens
+        log.cost_usd = calculate_cost(model, tokens, 0)
+        log.latency_ms = (time.time() - start_time) * 1000
+        consumption_tracker.add_log(log)
+        
+        self._context_caches[(key, model)] = ContextCacheEntry(
+            name=cache.name,
+            model=model,
+            expires_at=time.time() + ttl,
+            tokens=tokens,
+        )
+        logger.info(f"Gemini context cache created: {cache.name} ({tokens} tokens, ttl {int(ttl)}s)")
+        return cache.name
+    
+    def get_context_cache(self, key: str | None, model: str | None = None) -> str | None:
+        """Nombre del contenido cacheado vigente para `key`, o None."""
+        if not key:
+            return None
+        entry = self._context_caches.get((key, model or self.model_id))
+        # Margen para no usar un cache que expira durante la llamada
+        if entry and entry.expires_at - settings.GEMINI_TIMEOUT_SECONDS > time.time():
+            return entry.name
+        return None
+    
+    def cleanup_context_caches(self):
+        """Olvida los caches expirados (Gemini los elimina solo al vencer el TTL)."""
+        now = time.time()
+        for cache_key, entry in list(self._context_caches.items()):
+            if entry.expires_at <= now:
+                del self._context_caches[cache_key]
+    
+    async def delete_context_cache(self, key: str | None, model: str | None = None):
+        """Elimina los caches de un documento (p.ej. al borrar el RFP), de todos los modelos o de `model`."""
+        if not key:
+            return
+        for cache_key in [k for k in self._context_caches if k[0] == key and model in (None, k[1])]:
+            entry = self._context_caches.pop(cache_key)
+            try:
+                await self.client.aio.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.debug(f"Could not delete context cache {entry.name}: {e}")
+    
+    async def close_context_caches(self):
+        """Elimina todos los caches vigentes (shutdown de la app)."""
+        for key in {k[0] for k in self._context_caches}:
+            await self.delete_context_cache(key)
+    
     def _extract_token_counts(self, response) -> tuple[int, int, int]:
         """Extrae conteo de tokens de la respuesta."""
         input_tokens = 0
@@ -304,6 +535,7 @@ class GeminiClient:
         temperature: float = 0.1,
         max_output_tokens: int = 8192,
         analysis_mode: Literal["fast", "balanced", "deep"] = "balanced",
+        timeout: float | None = None,
     ) -> dict[str, Any]:
         """
         Analiza un documento con Gemini via API Key.
@@ -314,6 +546,7 @@ class GeminiClient:
             temperature: Temperatura para generación (ignorada si se usa analysis_mode)
             max_output_tokens: Máximo de tokens de salida (ignorado si se usa analysis_mode)
             analysis_mode: Modo de análisis (fast/balanced/deep)
+            timeout: Segundos máximos de espera (default GEMINI_TIMEOUT_SECONDS)
             
         Returns:
             Dict con el resultado del análisis parseado desde JSON
@@ -350,7 +583,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
             logger.info(f"  Temperature: {temp_to_use}")
             
             # Generar contenido usando la nueva API
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=model_to_use,
                 contents=full_prompt,
                 config={
@@ -358,6 +591,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
                     "max_output_tokens": max_tokens,
                     "response_mime_type": "application/json",
                 },
+                timeout=timeout,
             )
             
             # Extraer tokens
@@ -407,6 +641,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
         prompt: str,
         temperature: float = 0.1,
         max_output_tokens: int = 8192,
+        timeout: float | None = None,
     ) -> dict[str, Any]:
         """
         Analiza un PDF directamente desde bytes con Gemini.
@@ -416,6 +651,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
             prompt: Prompt para el análisis
             temperature: Temperatura para generación
             max_output_tokens: Máximo de tokens de salida
+            timeout: Segundos máximos de espera (default GEMINI_TIMEOUT_SECONDS)
             
         Returns:
             Dict con el resultado del análisis
@@ -436,7 +672,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
                 mime_type="application/pdf",
             )
             
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model_id,
                 contents=[pdf_part, prompt],
                 config={
@@ -444,6 +680,7 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
                     "max_output_tokens": max_output_tokens,
                     "response_mime_type": "application/json",
                 },
+                timeout=timeout,
             )
             
             input_tokens, output_tokens, thinking_tokens = self._extract_token_counts(response)
@@ -475,6 +712,8 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
         rfp_data: dict[str, Any],
         prompt: str,
         temperature: float = 0.3,
+        timeout: float | None = None,
+        cache_key: str | None = None,
     ) -> list[dict[str, Any]]:
         """
         Genera preguntas basadas en el análisis del RFP.
@@ -483,32 +722,40 @@ Responde ÚNICAMENTE con JSON válido siguiendo el schema indicado.
             rfp_data: Datos extraídos del RFP
             prompt: Prompt para generación de preguntas
             temperature: Temperatura para generación
+            timeout: Segundos máximos de espera (default GEMINI_TIMEOUT_SECONDS)
+            cache_key: Documento cacheado con `create_context_cache`; si está
+                vigente, los datos del RFP no se reenvían
             
         Returns:
             Lista de preguntas generadas
         """
         start_time = time.time()
+        cached_content = self.get_context_cache(cache_key)
         log = APIConsumptionLog(
             timestamp=datetime.now(),
             model=self.model_id,
-            operation="generate_questions",
+            operation="generate_questions (cached)" if cached_content else "generate_questions",
         )
         
         try:
+            if cached_content:
+                rfp_context = "El documento RFP y su análisis están en el contexto cacheado."
+            else:
+                rfp_context = f"""DATOS DEL RFP ANALIZADO:
+```json
+{json.dumps(rfp_data, ensure_ascii=False, indent=2)}
+```"""
             full_prompt = f"""
 {prompt}
 
-DATOS DEL RFP ANALIZADO:
-```json
-{json.dumps(rfp_data, ensure_ascii=False, indent=2)}
-```
+{rfp_context}
 
 Genera las preguntas en formato JSON como un array de objetos.
 """
             
             logger.info("Generating questions with Gemini API")
             
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model_id,
                 contents=full_prompt,
                 config={
@@ -516,6 +763,8 @@ Genera las preguntas en formato JSON como un array de objetos.
                     "max_output_tokens": 4096,
                     "response_mime_type": "application/json",
                 },
+                timeout=timeout,
+                cached_content=cached_content,
             )
             
             input_tokens, output_tokens, thinking_tokens = self._extract_token_counts(response)
@@ -554,6 +803,8 @@ Genera las preguntas en formato JSON como un array de objetos.
         message: str,
         context: str | None = None,
         temperature: float = 0.7,
+        timeout: float | None = None,
+        cache_scope: str | None = None,
     ) -> str:
         """
         Chat simple con Gemini.
@@ -562,10 +813,29 @@ Genera las preguntas en formato JSON como un array de objetos.
             message: Mensaje del usuario
             context: Contexto adicional (opcional)
             temperature: Temperatura para generación
+            timeout: Segundos máximos de espera (default GEMINI_TIMEOUT_SECONDS)
+            cache_scope: Si se indica, usa el cache persistente de respuestas
+                (solo tiene sentido con temperatura baja)
             
         Returns:
             Respuesta del modelo
         """
+        prompt = message
+        if context:
+            prompt = f"Contexto:\n{context}\n\nPregunta: {message}"
+        
+        response_cache = None
+        if cache_scope and settings.LLM_CACHE_ENABLED:
+            from core.services.llm_cache import get_llm_response_cache
+            response_cache = get_llm_response_cache()
+            response_key = response_cache.make_key(
+                self.model_id, prompt, {"temperature": temperature, "max_output_tokens": 2048}
+            )
+            cached_response = await response_cache.get(response_key)
+            if cached_response is not None:
+                logger.info(f"chat served from response cache ({cache_scope})")
+                return cached_response
+        
         start_time = time.time()
         log = APIConsumptionLog(
             timestamp=datetime.now(),
@@ -574,17 +844,14 @@ Genera las preguntas en formato JSON como un array de objetos.
         )
         
         try:
-            prompt = message
-            if context:
-                prompt = f"Contexto:\n{context}\n\nPregunta: {message}"
-            
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config={
                     "temperature": temperature,
                     "max_output_tokens": 2048,
                 },
+                timeout=timeout,
             )
             
             input_tokens, output_tokens, thinking_tokens = self._extract_token_counts(response)
@@ -598,6 +865,12 @@ Genera las preguntas en formato JSON como un array de objetos.
             log.success = True
             consumption_tracker.add_log(log)
             
+            if response_cache and response.text:
+                await response_cache.set(
+                    response_key, response.text,
+                    model=self.model_id, operation="chat", scope=cache_scope,
+                )
+            
             return response.text
             
         except Exception as e:
@@ -614,21 +887,47 @@ Genera las preguntas en formato JSON como un array de objetos.
         prompt: str,
         temperature: float = 0.1,
         max_output_tokens: int = 4096,
+        timeout: float | None = None,
+        cache_key: str | None = None,
+        cache_scope: str | None = None,
     ) -> Any:
         """
         Genera una respuesta en formato JSON a partir de un prompt libre.
+        
+        Con `cache_key` vigente, el documento cacheado se usa como contexto.
+        Con `cache_scope`, la respuesta se guarda en el cache persistente
+        y se reutiliza para el mismo modelo, prompt y configuración.
         """
+        response_cache = None
+        if cache_scope and settings.LLM_CACHE_ENABLED:
+            from core.services.llm_cache import get_llm_response_cache
+            response_cache = get_llm_response_cache()
+            response_key = response_cache.make_key(
+                self.model_id,
+                prompt,
+                {
+                    "temperature": temperature,
+                    "max_output_tokens": max_output_tokens,
+                    "context": cache_key,
+                },
+            )
+            cached_response = await response_cache.get(response_key)
+            if cached_response is not None:
+                logger.info(f"generate_json served from response cache ({cache_scope})")
+                return cached_response
+        
         start_time = time.time()
+        cached_content = self.get_context_cache(cache_key)
         log = APIConsumptionLog(
             timestamp=datetime.now(),
             model=self.model_id,
-            operation="generate_json",
+            operation="generate_json (cached)" if cached_content else "generate_json",
         )
         
         try:
             logger.info("Generating JSON with Gemini API")
             
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config={
@@ -636,6 +935,8 @@ Genera las preguntas en formato JSON como un array de objetos.
                     "max_output_tokens": max_output_tokens,
                     "response_mime_type": "application/json",
                 },
+                timeout=timeout,
+                cached_content=cached_content,
             )
             
             input_tokens, output_tokens, thinking_tokens = self._extract_token_counts(response)
@@ -652,6 +953,12 @@ Genera las preguntas en formato JSON como un array de objetos.
             log.success = True
             consumption_tracker.add_log(log)
             
+            if response_cache:
+                await response_cache.set(
+                    response_key, result,
+                    model=self.model_id, operation="generate_json", scope=cache_scope,
+                )
+            
             return result
             
         except Exception as e:
@@ -663,12 +970,78 @@ Genera las preguntas en formato JSON como un array de objetos.
             logger.error(f"Error generating JSON: {e}")
             raise
     
+    async def embed_texts(
+        self,
+        texts: list[str],
+        task_type: Literal["RETRIEVAL_DOCUMENT", "RETRIEVAL_QUERY"] = "RETRIEVAL_DOCUMENT",
+        model: str | None = None,
+        dimensions: int | None = None,
+        batch_size: int = 100,
+    ) -> list[list[float]]:
+        """
+        Calcula embeddings de una lista de textos (en lotes de `batch_size`).
+        
+        Args:
+            texts: Textos a indexar o consultar
+            task_type: RETRIEVAL_DOCUMENT para el catálogo, RETRIEVAL_QUERY para el RFP
+            model: Modelo de embeddings (default: EMBEDDING_MODEL)
+            dimensions: Dimensión del vector (default: EMBEDDING_DIMENSIONS)
+        """
+        model = model or settings.EMBEDDING_MODEL
+        dimensions = dimensions or settings.EMBEDDING_DIMENSIONS
+        vectors: list[list[float]] = []
+        
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            start_time = time.time()
+            # La API de embeddings no reporta tokens: se estiman por caracteres
+            input_tokens = sum(len(t) for t in batch) // 4
+            log = APIConsumptionLog(
+                timestamp=datetime.now(),
+                model=model,
+                operation="embed_texts",
+                input_tokens=input_tokens,
+                total_tokens=input_tokens,
+            )
+            
+            async def call():
+                return await asyncio.wait_for(
+                    self.client.aio.models.embed_content(
+                        model=model,
+                        contents=batch,
+                        config=types.EmbedContentConfig(
+                            task_type=task_type,
+                            output_dimensionality=dimensions,
+                        ),
+                    ),
+                    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+                )
+            
+            try:
+                response = await get_gemini_scheduler().run(model, call, estimated_tokens=input_tokens)
+                vectors.extend(list(e.values) for e in response.embeddings)
+                
+                log.cost_usd = calculate_cost(model, input_tokens, 0)
+                log.latency_ms = (time.time() - start_time) * 1000
+                consumption_tracker.add_log(log)
+            except Exception as e:
+                log.latency_ms = (time.time() - start_time) * 1000
+                log.success = False
+                log.error = str(e)
+                consumption_tracker.add_log(log)
+                
+                logger.error(f"Error computing embeddings: {e}")
+                raise
+        
+        return vectors
+    
     async def analyze_with_grounding(
         self,
         document_content: str,
         prompt: str,
         temperature: float = 0.1,
         max_output_tokens: int = 16384,
+        timeout: float | None = None,
     ) -> dict[str, Any]:
         """
         Analiza un documento con Gemini usando Google Search Grounding.
@@ -681,6 +1054,7 @@ Genera las preguntas en formato JSON como un array de objetos.
             prompt: Prompt para el análisis (debe instruir a usar Google Search)
             temperature: Temperatura para generación
             max_output_tokens: Máximo de tokens de salida
+            timeout: Segundos máximos de espera (default GEMINI_GROUNDING_TIMEOUT_SECONDS)
             
         Returns:
             Dict con el resultado del análisis parseado desde JSON
@@ -719,7 +1093,7 @@ Responde UNICAMENTE con JSON valido siguiendo el schema indicado.
             
             # Generar contenido con grounding habilitado
             # NOTA: No usamos response_mime_type con grounding porque puede causar conflictos
-            response = self.client.models.generate_content(
+            response = await self._generate_content(
                 model=grounding_model,
                 contents=full_prompt,
                 config={
@@ -728,6 +1102,7 @@ Responde UNICAMENTE con JSON valido siguiendo el schema indicado.
                     "tools": [google_search_tool],
                     # No usar response_mime_type con grounding - parseamos manualmente
                 },
+                timeout=timeout or settings.GEMINI_GROUNDING_TIMEOUT_SECONDS,
             )
             
             # Extraer tokens
@@ -847,6 +1222,14 @@ def get_gemini_client() -> GeminiClient:
     return _gemini_client
 
 
+async def close_context_caches():
+    """Elimina los caches de contexto del cliente, si fue creado (shutdown de la app)."""
+    if _gemini_client is not None:
+        await _gemini_client.close_context_caches()
+
+
 def get_consumption_summary() -> dict:
     """Obtiene resumen de consumo de API."""
-    return consumption_tracker.get_summary()
+    summary = consumption_tracker.get_summary()
+    summary["scheduler"] = get_gemini_scheduler().stats()
+    return summary
@@ -0,0 +1,310 @@
+"""
+Scheduler compartido para las llamadas a Gemini.
+
+- Presupuestos por modelo de requests y tokens por minuto (token bucket)
+- Máximo de llamadas en vuelo, con prioridad para las interactivas
+- Reintentos con backoff exponencial y jitter ante errores transitorios
+  (429, 5xx, errores de red)
+
+La prioridad se propaga con un ContextVar: los workers en background
+(análisis encolados) marcan su contexto con `gemini_priority(BACKGROUND)`
+y todas las llamadas que hagan, incluidas las de sub-tareas, quedan detrás
+de las interactivas.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+import httpx
+from google.genai import errors as genai_errors
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_priority: ContextVar[int] = ContextVar("gemini_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def gemini_priority(priority: int) -> Iterator[None]:
+    """Fija la prioridad de las llamadas a Gemini hechas dentro del bloque."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """
+    Token bucket con recarga continua; admite saldo negativo (ajustes posteriores).
+
+    Mientras haya esperando una solicitud de mayor prioridad (menor número),
+    las de menor prioridad no consumen aunque alcance el saldo.
+    """
+
+    # Reintento mientras cede el paso a una solicitud de mayor prioridad
+    YIELD_DELAY = 0.05
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._waiting: Counter[int] = Counter()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def _ahead(self, priority: int) -> bool:
+        return any(count for p, count in self._waiting.items() if p < priority)
+
+    async def acquire(self, amount: float, priority: int = INTERACTIVE) -> float:
+        """Espera hasta poder consumir `amount`. Retorna los segundos esperados."""
+        # Una solicitud mayor que la capacidad esperaría para siempre
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        self._waiting[priority] += 1
+        try:
+            while True:
+                # La espera se calcula con el lock, pero se duerme sin él
+                async with self._lock:
+                    self._refill()
+                    ahead = self._ahead(priority)
+                    if not ahead and self.tokens >= amount:
+                        self.tokens -= amount
+                        return waited
+                    delay = max(
+                        (amount - self.tokens) / self.refill_per_second,
+                        self.YIELD_DELAY if ahead else 0.0,
+                    )
+                await asyncio.sleep(delay)
+                waited += delay
+        finally:
+            self._waiting[priority] -= 1
+
+    def adjust(self, amount: float):
+        """Descuenta (o devuelve, si es negativo) tokens sin esperar."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class PrioritySemaphore:
+    """Semáforo que despierta primero a los de menor número de prioridad (FIFO dentro de cada una)."""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: int):
+        if self._value > 0 and not self.waiting:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Si ya se le había asignado el slot, devolverlo
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class ModelLimits:
+    """Buckets de RPM y TPM de un modelo."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, rpm / 60)
+        self.tokens = TokenBucket(tpm, tpm / 60)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Errores transitorios: cuota/sobrecarga de Gemini o fallas de red."""
+    if isinstance(error, genai_errors.APIError):
+        return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+class GeminiScheduler:
+    """
+    Punto único por el que pasan las llamadas a Gemini.
+
+    Uso:
+        result = await scheduler.run(model, lambda: client.aio.models.generate_content(...),
+                                     estimated_tokens=...)
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        default_rpm: int = 60,
+        default_tpm: int = 1_000_000,
+        model_limits: dict[str, dict[str, int]] | None = None,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.model_limits_config = model_limits or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_concurrency = max_concurrency
+        self._slots = PrioritySemaphore(max_concurrency)
+        self._models: dict[str, ModelLimits] = {}
+        self._in_flight = 0
+        self._stats = {"calls": 0, "retries": 0, "throttled_seconds": 0.0, "failed": 0}
+
+    def _limits(self, model: str) -> ModelLimits:
+        if model not in self._models:
+            config = self.model_limits_config.get(model, {})
+            self._models[model] = ModelLimits(
+                rpm=config.get("rpm", self.default_rpm),
+                tpm=config.get("tpm", self.default_tpm),
+            )
+        return self._models[model]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniforme entre 0 y el techo exponencial
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        priority: int | None = None,
+        actual_tokens: Callable[[T], int] | None = None,
+    ) -> T:
+        """
+        Ejecuta `call` respetando los límites del modelo.
+
+        Args:
+            model: Modelo de Gemini (define los buckets RPM/TPM)
+            call: Fábrica de la corrutina (se invoca de nuevo en cada reintento)
+            estimated_tokens: Tokens estimados (entrada + salida máxima)
+            priority: INTERACTIVE o BACKGROUND (default: la del contexto)
+            actual_tokens: Extrae los tokens reales de la respuesta para ajustar el TPM
+        """
+        priority = _priority.get() if priority is None else priority
+        limits = self._limits(model)
+        attempt = 0
+
+        while True:
+            # La cuota se espera sin ocupar un slot (los buckets ya ceden el paso
+            # por prioridad): una llamada en background corta de TPM no bloquea
+            # a las interactivas de otros modelos ni a las que sí tienen cuota
+            waited = await limits.requests.acquire(1, priority)
+            waited += await limits.tokens.acquire(estimated_tokens, priority)
+            self._stats["throttled_seconds"] += waited
+            if waited > 1:
+                logger.info(f"Gemini call throttled {waited:.1f}s by {model} rate limits")
+
+            await self._slots.acquire(priority)
+            self._in_flight += 1
+            try:
+                self._stats["calls"] += 1
+                result = await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._stats["failed"] += 1
+                    raise
+                error = e
+            else:
+                if actual_tokens is not None:
+                    try:
+                        limits.tokens.adjust(actual_tokens(result) - estimated_tokens)
+                    except Exception:
+                        pass
+                return result
+            finally:
+                self._in_flight -= 1
+                self._slots.release()
+
+            delay = self._backoff(attempt)
+            attempt += 1
+            self._stats["retries"] += 1
+            logger.warning(
+                f"Gemini transient error on {model} ({error}); "
+                f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "throttled_seconds": round(self._stats["throttled_seconds"], 2),
+            "in_flight": self._in_flight,
+            "waiting": self._slots.waiting,
+            "max_concurrency": self.max_concurrency,
+            "models": {
+                name: {
+                    "rpm": limits.rpm,
+                    "tpm": limits.tpm,
+                    "requests_available": int(limits.requests.tokens),
+                    "tokens_available": int(limits.tokens.tokens),
+                }
+                for name, limits in self._models.items()
+            },
+        }
+
+
+# Singleton
+_scheduler: GeminiScheduler | None = None
+
+
+def get_gemini_scheduler() -> GeminiScheduler:
+    """Get or create Gemini scheduler singleton."""
+    global _scheduler
+    if _scheduler is None:
+        try:
+            model_limits = json.loads(settings.GEMINI_MODEL_LIMITS or "{}")
+        except json.JSONDecodeError:
+            logger.error("GEMINI_MODEL_LIMITS is not valid JSON, using defaults")
+            model_limits = {}
+        _scheduler = GeminiScheduler(
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            default_rpm=settings.GEMINI_RPM,
+            default_tpm=settings.GEMINI_TPM,
+            model_limits=model_limits,
+            max_retries=settings.GEMINI_MAX_RETRIES,
+            base_delay=settings.GEMINI_RETRY_BASE_DELAY,
+            max_delay=settings.GEMINI_RETRY_MAX_DELAY,
+        )
+    return _scheduler
@@ -0,0 +1,418 @@
+"""
+Cola de análisis de RFPs en background.
+
+El upload solo guarda el archivo y encola un job; un pool acotado de workers
+ejecuta el análisis con Gemini y la generación de preguntas, y publica eventos
+de progreso que los clientes consumen por SSE (GET /rfp/{id}/events).
+"""
+import asyncio
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import select
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = {JOB_COMPLETED, JOB_FAILED}
+
+
+class QueueFullError(Exception):
+    """La cola de análisis alcanzó su capacidad máxima."""
+
+
+@dataclass
+class AnalysisJob:
+    """Job de análisis de un RFP."""
+    rfp_id: str
+    file_name: str
+    analysis_mode: str = "balanced"
+    content: bytes | None = field(default=None, repr=False)
+    file_uri: str | None = None
+    force: bool = False
+    user_id: str | None = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JOB_QUEUED
+    stage: str = "en_cola"
+    progress: int = 0
+    error: str | None = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = None
+    events: list[dict[str, Any]] = field(default_factory=list, repr=False)
+    subscribers: list[asyncio.Queue] = field(default_factory=list, repr=False)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "rfp_id": self.rfp_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class AnalysisJobQueue:
+    """
+    Cola en memoria con un pool acotado de workers.
+
+    - `max_concurrency` análisis simultáneos como máximo (llamadas a Gemini)
+    - `max_pending` jobs esperando; por encima se rechaza el upload
+    - Cada job guarda su historial de eventos para suscriptores tardíos
+    """
+
+    def __init__(self, max_concurrency: int = 2, max_pending: int = 100):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._queue: asyncio.Queue[AnalysisJob] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._jobs: dict[str, AnalysisJob] = {}
+        self._jobs_by_rfp: dict[str, str] = {}
+
+    # ---------- ciclo de vida ----------
+
+    async def start(self):
+        """Arranca los workers (lifespan de la app)."""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"analysis-worker-{i}")
+            for i in range(self.max_concurrency)
+        ]
+        logger.info(f"Analysis queue started with {self.max_concurrency} workers")
+        if settings.ANALYSIS_RECOVER_ON_STARTUP:
+            await self._recover_pending()
+
+    async def stop(self):
+        """Detiene los workers; los jobs en curso se re-encolan al próximo arranque."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Analysis queue stopped")
+
+    async def _recover_pending(self):
+        """
+        Re-encola RFPs que quedaron en ANALYZING (p.ej. reinicio del proceso),
+        descargando el archivo desde storage.
+        """
+        from core.database import AsyncSessionLocal
+        from models.rfp import RFPSubmission, RFPStatus
+
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(RFPSubmission).where(RFPSubmission.status == RFPStatus.ANALYZING.value)
+                )
+                pending = result.scalars().all()
+        except Exception as e:
+            logger.warning(f"Could not recover pending analyses: {e}")
+            return
+
+        for rfp in pending:
+            try:
+                self.submit(str(rfp.id), rfp.file_name, file_uri=rfp.file_gcs_path)
+                logger.info(f"Re-queued pending analysis for RFP {rfp.id}")
+            except QueueFullError:
+                logger.warning("Analysis queue full while recovering pending RFPs")
+                break
+
+    # ---------- API ----------
+
+    def submit(
+        self,
+        rfp_id: str,
+        file_name: str,
+        content: bytes | None = None,
+        file_uri: str | None = None,
+        analysis_mode: str = "balanced",
+        force: bool = False,
+        user_id: str | None = None,
+    ) -> AnalysisJob:
+        """
+        Encola el análisis de un RFP.
+        
+        Con `force=False` se reutiliza el análisis de un RFP idéntico
+        (mismo archivo, prompt, modo y catálogo de certificaciones).
+
+        Raises:
+            QueueFullError: Si hay `max_pending` jobs esperando
+        """
+        if self._queue is None:
+            raise RuntimeError("Analysis queue not started")
+
+        job = AnalysisJob(
+            rfp_id=str(rfp_id),
+            file_name=file_name,
+            analysis_mode=analysis_mode,
+            content=content,
+            file_uri=file_uri,
+            force=force,
+            user_id=user_id,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError("Cola de análisis llena, intente más tarde")
+
+        self._jobs[job.id] = job
+        self._jobs_by_rfp[job.rfp_id] = job.id
+        self._publish(job, "queued", "en_cola", 0, position=self._queue.qsize())
+        self._prune()
+        return job
+
+    def get_job(self, job_id: str) -> AnalysisJob | None:
+        return self._jobs.get(job_id)
+
+    def job_for_rfp(self, rfp_id: str | UUID) -> AnalysisJob | None:
+        """Último job del RFP (si sigue en memoria)."""
+        job_id = self._jobs_by_rfp.get(str(rfp_id))
+        return self._jobs.get(job_id) if job_id else None
+
+    async def subscribe(
+        self, job: AnalysisJob, heartbeat: float | None = None
+    ) -> AsyncIterator[dict[str, Any] | None]:
+        """
+        Eventos del job: primero el historial, luego los nuevos hasta que
+        el job termina. Con `heartbeat`, emite None tras esos segundos sin eventos.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(queue)
+        try:
+            for event in list(job.events):
+                yield event
+            if job.status in TERMINAL_STATUSES:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            job.subscribers.remove(queue)
+
+    def stats(self) -> dict[str, Any]:
+        running = sum(1 for j in self._jobs.values() if j.status == JOB_RUNNING)
+        return {
+            "workers": len(self._workers),
+            "max_concurrency": self.max_concurrency,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "running": running,
+        }
+
+    # ---------- internos ----------
+
+    async def _download(self, job: AnalysisJob) -> bytes:
+        from core.storage import get_storage_service
+        self._publish(job, JOB_RUNNING, "descargando", 5)
+        return await asyncio.to_thread(get_storage_service().download_file, job.file_uri)
+
+    def _publish(self, job: AnalysisJob, status: str, stage: str, progress: int, **extra):
+        job.status = status
+        job.stage = stage
+        job.progress = progress
+        event = {
+            "job_id": job.id,
+            "rfp_id": job.rfp_id,
+            "status": status,
+            "stage": stage,
+            "progress": progress,
+            "timestamp": datetime.utcnow().isoformat(),
+            **extra,
+        }
+        job.events.append(event)
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    def _prune(self, keep: int = 500):
+        """Descarta los jobs terminados más antiguos."""
+        if len(self._jobs) <= keep:
+            return
+        finished = sorted(
+            (j for j in self._jobs.values() if j.status in TERMINAL_STATUSES),
+            key=lambda j: j.created_at,
+        )
+        for job in finished[: len(self._jobs) - keep]:
+            del self._jobs[job.id]
+            if self._jobs_by_rfp.get(job.rfp_id) == job.id:
+                del self._jobs_by_rfp[job.rfp_id]
+
+    async def _worker(self, index: int):
+        from core.gcp.gemini_client import consumption_user
+        from core.gcp.rate_limiter import gemini_priority, BACKGROUND
+
+        while True:
+            job = await self._queue.get()
+            try:
+                # Las llamadas a Gemini del análisis ceden ante las interactivas
+                # y se atribuyen al usuario que subió el RFP
+                with gemini_priority(BACKGROUND), consumption_user(job.user_id):
+                    await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analysis job {job.id} failed: {e}")
+            finally:
+                job.content = None
+                self._queue.task_done()
+
+    async def _run(self, job: AnalysisJob):
+        """Análisis + preguntas de un RFP, publicando el progreso."""
+        from core.database import AsyncSessionLocal
+        from core.services.analyzer import get_analyzer_service, compute_content_hash
+        from models.rfp import RFPSubmission, RFPQuestion, RFPStatus
+
+        async with AsyncSessionLocal() as db:
+            rfp = None
+            try:
+                result = await db.execute(
+                    select(RFPSubmission).where(RFPSubmission.id == UUID(job.rfp_id))
+                )
+                rfp = result.scalar_one_or_none()
+                if not rfp:
+                    raise ValueError(f"RFP no encontrado: {job.rfp_id}")
+
+                analyzer = get_analyzer_service()
+                content = job.content
+                if content is None and not rfp.content_hash:
+                    content = await self._download(job)
+                if not rfp.content_hash:
+                    rfp.content_hash = compute_content_hash(content)
+
+                # Reutilizar el análisis de un archivo idéntico
+                certifications_block = await analyzer.certifications_block(db)
+                analysis_key = analyzer.analysis_cache_key(
+                    rfp.content_hash, job.analysis_mode, certifications_block
+                )
+                source = None
+                if not job.force:
+                    source = await analyzer.find_cached_analysis(db, analysis_key, exclude_id=rfp.id)
+
+                if source is not None:
+                    logger.info(f"Reusing analysis of RFP {source.id} for RFP {job.rfp_id}")
+                    extracted_data = analyzer.reusable_analysis(source.extracted_data)
+                else:
+                    if content is None:
+                        content = await self._download(job)
+                    self._publish(job, JOB_RUNNING, "analizando", 10)
+                    extracted_data = await analyzer.analyze_rfp_from_content(
+                        content,
+                        job.file_name,
+                        analysis_mode=job.analysis_mode,
+                        db=db,
+                        certifications_block=certifications_block,
+                        context_key=analysis_key,
+                    )
+                    if extracted_data.get("error") and len(extracted_data) == 1:
+                        raise ValueError(extracted_data["error"])
+
+                apply_analysis_result(rfp, analyzer, extracted_data)
+                rfp.analysis_key = analysis_key
+                await db.commit()
+                self._publish(job, JOB_RUNNING, "analizado", 70,
+                              reused_from=str(source.id) if source else None)
+
+                # Preguntas para el cliente (no bloquean el resultado del análisis)
+                self._publish(job, JOB_RUNNING, "generando_preguntas", 75)
+                try:
+                    if source is not None and source.questions:
+                        questions = [
+                            {
+                                "question": q.question,
+                                "category": q.category,
+                                "priority": q.priority,
+                                "context": q.context,
+                                "why_important": q.why_important,
+                            }
+                            for q in source.questions
+                        ]
+                    else:
+                        questions = await analyzer.generate_questions(
+                            extracted_data, context_key=analysis_key
+                        )
+                    for q in questions:
+                        db.add(RFPQuestion(
+                            rfp_id=rfp.id,
+                            question=q.get("question", ""),
+                            category=q.get("category"),
+                            priority=q.get("priority"),
+                            context=q.get("context"),
+                            why_important=q.get("why_important"),
+                        ))
+                    await db.commit()
+                    n_questions = len(questions)
+                except Exception as e:
+                    await db.rollback()
+                    logger.warning(f"Question generation failed for RFP {job.rfp_id}: {e}")
+                    n_questions = 0
+
+                job.finished_at = datetime.utcnow()
+                self._publish(
+                    job, JOB_COMPLETED, "completado", 100,
+                    rfp_status=RFPStatus.ANALYZED.value,
+                    questions=n_questions,
+                    reused_from=str(source.id) if source else None,
+                )
+                logger.info(f"RFP analysis completed: {job.rfp_id}")
+
+            except Exception as e:
+                logger.error(f"Error analyzing RFP {job.rfp_id}: {e}")
+                await db.rollback()
+                if rfp is not None:
+                    rfp.status = RFPStatus.ERROR.value
+                    await db.commit()
+                job.error = str(e)
+                job.finished_at = datetime.utcnow()
+                self._publish(job, JOB_FAILED, "error", job.progress, error=str(e),
+                              rfp_status=RFPStatus.ERROR.value)
+
+
+def apply_analysis_result(rfp, analyzer, extracted_data: dict[str, Any]):
+    """Copia el resultado del análisis y sus campos indexados al RFP."""
+    from models.rfp import RFPStatus
+
+    indexed_fields = analyzer.extract_indexed_fields(extracted_data)
+
+    rfp.extracted_data = extracted_data
+    rfp.status = RFPStatus.ANALYZED.value
+    rfp.analyzed_at = datetime.utcnow()
+
+    for field_name, value in indexed_fields.items():
+        setattr(rfp, field_name, value)
+
+    # Guardar recommended_isos en su columna específica
+    if "recommended_isos" in extracted_data:
+        rfp.recommended_isos = extracted_data["recommended_isos"]
+
+
+# Singleton
+_analysis_queue: AnalysisJobQueue | None = None
+
+
+def get_analysis_queue() -> AnalysisJobQueue:
+    """Get or create analysis queue singleton."""
+    global _analysis_queue
+    if _analysis_queue is None:
+        _analysis_queue = AnalysisJobQueue(
+            max_concurrency=settings.ANALYSIS_MAX_CONCURRENCY,
+            max_pending=settings.ANALYSIS_QUEUE_MAX_PENDING,
+        )
+    return _analysis_queue
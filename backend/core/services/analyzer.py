@@ -3,16 +3,20 @@ Servicio de análisis de RFPs usando Gemini via Google AI API.
 Trabaja con archivos locales extrayendo texto primero.
 Soporta grounding para obtener tarifas de mercado actuales.
 """
+import asyncio
+import copy
+import hashlib
+import json
 import logging
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Literal
 
-from pypdf import PdfReader
-from docx import Document
-import io
-
+from core.config import settings
 from core.gcp.gemini_client import get_gemini_client
+from core.services.document_extraction import get_document_extractor
+from core.services.embeddings import get_embedding_index
+from core.services.rfp_sections import split_sections, merge_section_results
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from models.certification import Certification
@@ -38,6 +42,23 @@ def load_prompt(name: str) -> str:
     raise FileNotFoundError(f"Prompt not found: {prompt_path}")
 
 
+def compute_content_hash(content: bytes) -> str:
+    """SHA-256 (hex) del contenido de un archivo."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+# Claves de extracted_data que se agregan después del análisis y no se reutilizan
+POST_ANALYSIS_KEYS = ("suggested_team",)
+
+# Scopes del cache persistente de respuestas (se invalidan al modificar el catálogo)
+EXPERIENCES_CACHE_SCOPE = "experiences"
+CHAPTERS_CACHE_SCOPE = "chapters"
+
+
 DEFAULT_ANALYSIS_PROMPT = """
 Eres un experto analista de RFPs (Request for Proposals) para TIVIT, una empresa líder en tecnología y servicios digitales en Latinoamérica.
 
@@ -123,6 +144,11 @@ class RFPAnalyzerService:
         except FileNotFoundError:
             self.questions_prompt = DEFAULT_QUESTIONS_PROMPT
         
+        try:
+            self.section_prompt = load_prompt("rfp_section_analysis")
+        except FileNotFoundError:
+            self.section_prompt = "Extrae en JSON los datos del RFP presentes en esta sección (fragmento {{section_index}} de {{section_count}}). Usa null si no aparecen."
+        
         try:
             self.certification_prompt = load_prompt("certification_analysis")
         except FileNotFoundError:
@@ -139,7 +165,7 @@ class RFPAnalyzerService:
         Analiza un documento de certificación.
         """
         logger.info(f"Analyzing certification: {filename}")
-        document_text = self.extract_text(content, filename)
+        document_text = await self.extract_text(content, filename)
         
         if not document_text.strip():
             return {"name": filename, "description": "No text extracted"}
@@ -156,7 +182,7 @@ class RFPAnalyzerService:
         Analiza un documento de capítulo.
         """
         logger.info(f"Analyzing chapter: {filename}")
-        document_text = self.extract_text(content, filename)
+        document_text = await self.extract_text(content, filename)
         
         if not document_text.strip():
             return {"name": filename, "description": "No text extracted"}
@@ -175,52 +201,9 @@ class RFPAnalyzerService:
             self._gemini = get_gemini_client()
         return self._gemini
     
-    def extract_text_from_pdf(self, content: bytes) -> str:
-        """Extrae texto de un PDF."""
-        try:
-            reader = PdfReader(io.BytesIO(content))
-            text_parts = []
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    text_parts.append(text)
-            return "\n\n".join(text_parts)
-        except Exception as e:
-            logger.error(f"Error extracting PDF text: {e}")
-            raise
-    
-    def extract_text_from_docx(self, content: bytes) -> str:
-        """Extrae texto de un DOCX."""
-        try:
-            doc = Document(io.BytesIO(content))
-            text_parts = []
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    text_parts.append(para.text)
-            
-            # También extraer de tablas
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
-                    if row_text:
-                        text_parts.append(row_text)
-            
-            return "\n\n".join(text_parts)
-        except Exception as e:
-            logger.error(f"Error extracting DOCX text: {e}")
-            raise
-    
-    def extract_text(self, content: bytes, filename: str) -> str:
-        """Extrae texto de un archivo según su extensión."""
-        filename_lower = filename.lower()
-        
-        if filename_lower.endswith(".pdf"):
-            return self.extract_text_from_pdf(content)
-        elif filename_lower.endswith(".docx"):
-            return self.extract_text_from_docx(content)
-        else:
-            # Asumir texto plano
-            return content.decode("utf-8", errors="ignore")
+    async def extract_text(self, content: bytes, filename: str) -> str:
+        """Extrae texto de un archivo según su extensión (en el pool de procesos)."""
+        return await get_document_extractor().extract_text(content, filename)
     
     async def analyze_rfp_from_content(
         self, 
@@ -229,6 +212,8 @@ class RFPAnalyzerService:
         analysis_mode: Literal["fast", "balanced", "deep"] = "balanced",
         use_grounding: bool = True,
         db: AsyncSession | None = None,
+        certifications_block: str | None = None,
+        context_key: str | None = None,
     ) -> dict[str, Any]:
         """
         Analiza un RFP desde su contenido en bytes.
@@ -239,6 +224,12 @@ class RFPAnalyzerService:
             analysis_mode: Modo de análisis (fast/balanced/deep)
             use_grounding: Si True, usa Google Search para tarifas de mercado
             db: Sesión de base de datos para obtener certificaciones
+            certifications_block: Catálogo de certificaciones ya formateado
+                (evita consultarlo de nuevo si el llamador ya lo tiene; se
+                reemplaza por la preselección si el catálogo es grande)
+            context_key: Si se indica (analysis_key del RFP), el documento
+                completo y su análisis se cachean en Gemini para las llamadas
+                posteriores, reemplazando un cache previo con la misma clave
             
         Returns:
             Datos extraídos del RFP incluyendo team_estimation y cost_estimation
@@ -247,7 +238,7 @@ class RFPAnalyzerService:
         logger.info(f"Analysis mode: {analysis_mode}, Grounding: {use_grounding}")
         
         # Extraer texto del documento
-        document_text = self.extract_text(content, filename)
+        document_text = await self.extract_text(content, filename)
         
         if not document_text.strip():
             logger.error("No text extracted from document")
@@ -255,25 +246,20 @@ class RFPAnalyzerService:
         
         logger.info(f"Extracted {len(document_text)} characters from document")
         
-        # Preparar prompt con certificaciones si hay DB
-        prompt_to_use = self.analysis_prompt
+        # RFPs muy grandes: análisis por secciones y consolidación
+        # Texto original: es el que se cachea para las llamadas posteriores
+        source_text = document_text
+        map_reduce_meta = None
+        if len(document_text) > settings.ANALYSIS_MAP_REDUCE_MIN_CHARS:
+            document_text, map_reduce_meta = await self._map_sections(document_text)
         
-        if db:
-            try:
-                # Obtener certificaciones activas
-                result = await db.execute(select(Certification).where(Certification.is_active == True))
-                certs = result.scalars().all()
-                if certs:
-                    cert_list_str = "\n".join([f"- {c.name} (ID: {c.id}): {c.description[:100]}..." for c in certs])
-                    prompt_to_use = prompt_to_use.replace("{{available_certifications}}", cert_list_str)
-                    logger.info(f"Injected {len(certs)} certifications into prompt")
-                else:
-                    prompt_to_use = prompt_to_use.replace("{{available_certifications}}", "No hay certificaciones disponibles.")
-            except Exception as e:
-                logger.error(f"Error fetching certifications for prompt: {e}")
-                prompt_to_use = prompt_to_use.replace("{{available_certifications}}", "Error al recuperar certificaciones.")
-        else:
-            prompt_to_use = prompt_to_use.replace("{{available_certifications}}", "No disponible (sin conexión a DB).")
+        # Preparar prompt con certificaciones (catálogos grandes: preselección por embeddings)
+        shortlisted = await self.shortlisted_certifications_block(db, document_text)
+        if shortlisted is not None:
+            certifications_block = shortlisted
+        elif certifications_block is None:
+            certifications_block = await self.certifications_block(db)
+        prompt_to_use = self.analysis_prompt.replace("{{available_certifications}}", certifications_block)
 
         # Analizar con Gemini - usar grounding si está habilitado
         if use_grounding:
@@ -291,9 +277,207 @@ class RFPAnalyzerService:
                 analysis_mode=analysis_mode,
             )
         
+        if map_reduce_meta and isinstance(result, dict):
+            result["_map_reduce"] = map_reduce_meta
+        
+        if context_key and isinstance(result, dict) and not result.get("error"):
+            await self.cache_rfp_context(context_key, source_text, result)
+        
         logger.info(f"RFP analysis completed: {result}")
         return result
     
+    async def cache_rfp_context(
+        self,
+        context_key: str,
+        document_text: str,
+        extracted_data: dict[str, Any],
+    ) -> str | None:
+        """
+        Cachea en Gemini el documento y su análisis para que preguntas,
+        relevancia de experiencias/capítulos y regeneraciones no los reenvíen.
+        
+        Un análisis nuevo (p.ej. `force_reanalysis`) reemplaza el cache previo
+        de la misma clave para no seguir sirviendo el análisis anterior.
+        """
+        analysis = {
+            k: v for k, v in self.reusable_analysis(extracted_data).items()
+            if not k.startswith("_")
+        }
+        content = (
+            f"DOCUMENTO RFP:\n---\n{document_text}\n---\n\n"
+            f"ANÁLISIS DEL RFP (JSON):\n{json.dumps(analysis, ensure_ascii=False)}"
+        )
+        return await self.gemini.create_context_cache(context_key, content, replace=True)
+    
+    async def _map_sections(self, document_text: str) -> tuple[str, dict[str, Any]]:
+        """
+        Etapa map del análisis de RFPs grandes.
+        
+        Divide el documento por secciones, extrae los datos de cada una en
+        paralelo (acotado por ANALYSIS_MAP_CONCURRENCY) y los consolida.
+        
+        Returns:
+            (contenido consolidado para el análisis final, metadata del map-reduce)
+        """
+        sections = split_sections(document_text, settings.ANALYSIS_SECTION_MAX_CHARS)
+        logger.info(f"Large RFP ({len(document_text)} chars): analyzing {len(sections)} sections")
+        semaphore = asyncio.Semaphore(settings.ANALYSIS_MAP_CONCURRENCY)
+        
+        async def analyze_section(index: int, section: str) -> dict[str, Any] | None:
+            prompt = (
+                self.section_prompt
+                .replace("{{section_index}}", str(index + 1))
+                .replace("{{section_count}}", str(len(sections)))
+            )
+            async with semaphore:
+                try:
+                    result = await self.gemini.analyze_document(
+                        document_content=section,
+                        prompt=prompt,
+                        analysis_mode="fast",
+                    )
+                except Exception as e:
+                    logger.warning(f"Section {index + 1}/{len(sections)} failed: {e}")
+                    return None
+            if not isinstance(result, dict) or result.get("error"):
+                logger.warning(f"Section {index + 1}/{len(sections)} returned no usable data")
+                return None
+            return result
+        
+        results = await asyncio.gather(*[
+            analyze_section(i, section) for i, section in enumerate(sections)
+        ])
+        partials = [r for r in results if r]
+        if not partials:
+            raise ValueError("No se pudo analizar ninguna sección del RFP")
+        
+        merged = merge_section_results(partials)
+        digest = (
+            f"NOTA: El RFP original tiene {len(document_text)} caracteres y se analizó en "
+            f"{len(sections)} secciones. A continuación se entrega la información consolidada "
+            f"de todas las secciones en JSON; úsala como el contenido del documento.\n\n"
+            + json.dumps(merged, ensure_ascii=False, indent=1)
+        )
+        meta = {
+            "source_chars": len(document_text),
+            "sections": len(sections),
+            "sections_failed": len(sections) - len(partials),
+        }
+        return digest, meta
+    
+    async def certifications_block(self, db: AsyncSession | None) -> str:
+        """Catálogo de certificaciones activas formateado para el prompt de análisis."""
+        if not db:
+            return "No disponible (sin conexión a DB)."
+        try:
+            result = await db.execute(
+                select(Certification)
+                .where(Certification.is_active == True)
+                .order_by(Certification.id)
+            )
+            certs = result.scalars().all()
+        except Exception as e:
+            logger.error(f"Error fetching certifications for prompt: {e}")
+            return "Error al recuperar certificaciones."
+        
+        if not certs:
+            return "No hay certificaciones disponibles."
+        logger.info(f"Injected {len(certs)} certifications into prompt")
+        return self._format_certifications(certs)
+    
+    @staticmethod
+    def _format_certifications(certs: list[Certification]) -> str:
+        return "\n".join([f"- {c.name} (ID: {c.id}): {(c.description or '')[:100]}..." for c in certs])
+    
+    async def shortlisted_certifications_block(
+        self, db: AsyncSession | None, document_text: str
+    ) -> str | None:
+        """
+        Solo las certificaciones más similares al documento, si el catálogo
+        activo supera RECOMMENDATION_SHORTLIST_SIZE. None si no aplica.
+        """
+        index = get_embedding_index()
+        if not db or not index.enabled:
+            return None
+        active = Certification.is_active == True
+        try:
+            if await index.count(db, Certification, active) <= index.shortlist_size:
+                return None
+        except Exception as e:
+            logger.warning(f"Error counting certifications: {e}")
+            return None
+        
+        ranked = await index.shortlist(db, Certification, document_text, active)
+        if not ranked:
+            return None
+        logger.info(f"Injected {len(ranked)} shortlisted certifications into prompt")
+        return self._format_certifications([c for c, _ in ranked])
+    
+    def analysis_cache_key(
+        self,
+        content_hash: str,
+        analysis_mode: str,
+        certifications_block: str,
+        use_grounding: bool = True,
+    ) -> str:
+        """
+        Clave de reutilización de un análisis.
+        
+        Combina el hash del archivo con la versión del prompt, el modo de análisis
+        y la versión del catálogo de certificaciones: si cualquiera cambia,
+        el análisis anterior deja de ser válido.
+        """
+        parts = [
+            content_hash,
+            _short_hash(self.analysis_prompt),
+            analysis_mode,
+            "grounding" if use_grounding else "plain",
+            _short_hash(certifications_block),
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+    
+    async def find_cached_analysis(
+        self,
+        db: AsyncSession,
+        cache_key: str,
+        exclude_id: Any = None,
+    ) -> Any:
+        """
+        Busca un RFP ya analizado con la misma clave de análisis.
+        
+        Returns:
+            El RFPSubmission más reciente (con preguntas cargadas) o None
+        """
+        from sqlalchemy.orm import selectinload
+        from models.rfp import RFPSubmission, RFPStatus
+        
+        query = (
+            select(RFPSubmission)
+            .options(selectinload(RFPSubmission.questions))
+            .where(
+                RFPSubmission.analysis_key == cache_key,
+                RFPSubmission.extracted_data.is_not(None),
+                RFPSubmission.status.in_([
+                    RFPStatus.ANALYZED.value, RFPStatus.GO.value, RFPStatus.NO_GO.value
+                ]),
+            )
+            .order_by(RFPSubmission.analyzed_at.desc())
+            .limit(1)
+        )
+        if exclude_id is not None:
+            query = query.where(RFPSubmission.id != exclude_id)
+        
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+    
+    @staticmethod
+    def reusable_analysis(extracted_data: dict[str, Any]) -> dict[str, Any]:
+        """Copia del análisis sin los datos agregados después (p.ej. equipo sugerido)."""
+        data = copy.deepcopy(extracted_data)
+        for key in POST_ANALYSIS_KEYS:
+            data.pop(key, None)
+        return data
+    
     async def analyze_rfp(self, gcs_uri: str, use_grounding: bool = True, db: AsyncSession | None = None) -> dict[str, Any]:
         """
         Analiza un RFP desde GCS o local.
@@ -333,12 +517,17 @@ class RFPAnalyzerService:
             db=db
         )
     
-    async def generate_questions(self, rfp_data: dict[str, Any]) -> list[dict[str, Any]]:
+    async def generate_questions(
+        self,
+        rfp_data: dict[str, Any],
+        context_key: str | None = None,
+    ) -> list[dict[str, Any]]:
         """
         Genera preguntas basadas en el análisis del RFP.
         
         Args:
             rfp_data: Datos extraídos del análisis
+            context_key: analysis_key del RFP (usa el contexto cacheado si existe)
             
         Returns:
             Lista de preguntas generadas
@@ -349,6 +538,7 @@ class RFPAnalyzerService:
             rfp_data=rfp_data,
             prompt=self.questions_prompt,
             temperature=0.3,
+            cache_key=context_key,
         )
         
         logger.info(f"Generated {len(questions)} questions")
@@ -413,10 +603,17 @@ class RFPAnalyzerService:
         }
 
 
+    def _with_cached_context(self, prompt: str, context_key: str | None) -> str:
+        """Indica al modelo que el RFP completo está en el contexto cacheado."""
+        if self.gemini.get_context_cache(context_key):
+            return "El documento RFP completo y su análisis están en el contexto cacheado.\n" + prompt
+        return prompt
+    
     async def analyze_experience_relevance(
         self, 
         rfp_summary: str,
-        experiences: list[dict[str, Any]]
+        experiences: list[dict[str, Any]],
+        context_key: str | None = None,
     ) -> list[dict[str, Any]]:
         """
         Analiza la relevancia de las experiencias para un RFP.
@@ -453,7 +650,11 @@ class RFPAnalyzerService:
 
         try:
             # Use the new helper method directly
-            recommendations = await self.gemini.generate_json(prompt)
+            recommendations = await self.gemini.generate_json(
+                self._with_cached_context(prompt, context_key),
+                cache_key=context_key,
+                cache_scope=EXPERIENCES_CACHE_SCOPE,
+            )
             
             # Ensure it's a list
             if isinstance(recommendations, dict):
@@ -473,7 +674,8 @@ class RFPAnalyzerService:
     async def analyze_chapter_relevance(
         self, 
         rfp_summary: str,
-        chapters: list[dict[str, Any]]
+        chapters: list[dict[str, Any]],
+        context_key: str | None = None,
     ) -> list[dict[str, Any]]:
         """
         Analiza la relevancia de los capítulos para un RFP.
@@ -508,7 +710,11 @@ class RFPAnalyzerService:
         """
 
         try:
-            recommendations = await self.gemini.generate_json(prompt)
+            recommendations = await self.gemini.generate_json(
+                self._with_cached_context(prompt, context_key),
+                cache_key=context_key,
+                cache_scope=CHAPTERS_CACHE_SCOPE,
+            )
             
             if isinstance(recommendations, dict):
                 recommendations = [recommendations]
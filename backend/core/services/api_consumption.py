@@ -0,0 +1,257 @@
+"""
+Historial persistente del consumo de la API de Gemini.
+
+El `ConsumptionTracker` del cliente mantiene en memoria solo los últimos
+registros; cada llamada se encola aquí y se escribe en la tabla
+`api_consumption` en lotes (por tamaño o cada `flush_interval` segundos).
+Las agregaciones por ventana de tiempo se calculan en Postgres.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, func, insert, select
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.api_consumption import APIConsumptionRecord
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL_SECONDS = 24 * 3600
+
+
+class ConsumptionRecorder:
+    """
+    Escritura en lotes del consumo de Gemini.
+
+    - `record()` es síncrono y no toca la base de datos
+    - Si la base de datos no responde los registros se reintentan en el
+      siguiente lote; por encima de `max_pending` se descartan los más antiguos
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_pending: int = 10000,
+        retention_days: int = 180,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self._pending: deque[dict[str, Any]] = deque(maxlen=max_pending)
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._last_purge = 0.0
+        self._stats = {"written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def record(self, log) -> None:
+        """Encola un `APIConsumptionLog` para escribirlo en el próximo lote."""
+        if len(self._pending) == self._pending.maxlen:
+            self._stats["dropped"] += 1
+        self._pending.append({
+            # Los timestamps del cliente son hora local naive
+            "timestamp": log.timestamp.astimezone(timezone.utc),
+            "model": log.model,
+            "operation": log.operation,
+            "user_id": log.user_id,
+            "input_tokens": log.input_tokens,
+            "output_tokens": log.output_tokens,
+            "thinking_tokens": log.thinking_tokens,
+            "total_tokens": log.total_tokens,
+            "latency_ms": log.latency_ms,
+            "cost_usd": log.cost_usd,
+            "success": log.success,
+            "error": (log.error or "")[:2000] or None,
+        })
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(
+            f"API consumption recorder started (batch={self.batch_size}, "
+            f"interval={self.flush_interval}s)"
+        )
+
+    async def stop(self):
+        """Detiene el loop y escribe lo pendiente."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL_SECONDS:
+                self._last_purge = time.monotonic()
+                await self.purge()
+
+    async def flush(self) -> int:
+        """Escribe los registros pendientes. Retorna cuántos se escribieron."""
+        async with self._flush_lock:
+            written = 0
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await db.execute(insert(APIConsumptionRecord), batch)
+                        await db.commit()
+                except Exception as e:
+                    # Devolver el lote a la cola (respetando max_pending) y reintentar después
+                    self._stats["failed_flushes"] += 1
+                    self._pending.extendleft(reversed(batch))
+                    logger.warning(f"API consumption flush failed ({len(batch)} records): {e}")
+                    break
+                written += len(batch)
+            self._stats["written"] += written
+            return written
+
+    async def purge(self) -> int:
+        """Elimina los registros más antiguos que `retention_days`."""
+        if not self.retention_days:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(APIConsumptionRecord).where(APIConsumptionRecord.timestamp < cutoff)
+                )
+                await db.commit()
+                if result.rowcount:
+                    logger.info(f"API consumption: purged {result.rowcount} records older than {cutoff.date()}")
+                return result.rowcount or 0
+        except Exception as e:
+            logger.warning(f"API consumption purge failed: {e}")
+            return 0
+
+    @staticmethod
+    def _totals_columns():
+        table = APIConsumptionRecord
+        return (
+            func.count(table.id).label("requests"),
+            func.count(table.id).filter(table.success.is_(False)).label("failed"),
+            func.coalesce(func.sum(table.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(table.output_tokens), 0).label("output_tokens"),
+            func.coalesce(func.sum(table.total_tokens), 0).label("total_tokens"),
+            func.coalesce(func.sum(table.cost_usd), 0.0).label("cost_usd"),
+            func.percentile_cont(0.5).within_group(table.latency_ms).label("p50_latency_ms"),
+            func.percentile_cont(0.95).within_group(table.latency_ms).label("p95_latency_ms"),
+        )
+
+    @staticmethod
+    def _row_to_dict(row) -> dict[str, Any]:
+        return {
+            "requests": row.requests,
+            "failed": row.failed,
+            "input_tokens": int(row.input_tokens),
+            "output_tokens": int(row.output_tokens),
+            "total_tokens": int(row.total_tokens),
+            "cost_usd": round(float(row.cost_usd), 6),
+            "p50_latency_ms": round(row.p50_latency_ms or 0.0, 2),
+            "p95_latency_ms": round(row.p95_latency_ms or 0.0, 2),
+        }
+
+    async def summary(self, hours: int = 24) -> dict[str, Any]:
+        """
+        Agregaciones de las últimas `hours` horas: totales, por modelo, por
+        operación, por usuario (con latencias p50/p95) y costo por día.
+        """
+        await self.flush()
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        table = APIConsumptionRecord
+        window = table.timestamp >= since
+        result: dict[str, Any] = {
+            "window_hours": hours,
+            "since": since.isoformat(),
+            "recorder": self.stats(),
+        }
+
+        try:
+            async with AsyncSessionLocal() as db:
+                totals = (await db.execute(select(*self._totals_columns()).where(window))).one()
+                result["totals"] = self._row_to_dict(totals)
+
+                for key, column in (
+                    ("by_model", table.model),
+                    ("by_operation", table.operation),
+                    ("by_user", table.user_id),
+                ):
+                    rows = await db.execute(
+                        select(column.label("key"), *self._totals_columns())
+                        .where(window)
+                        .group_by(column)
+                        .order_by(func.sum(table.cost_usd).desc())
+                    )
+                    result[key] = {
+                        str(row.key) if row.key is not None else "system": self._row_to_dict(row)
+                        for row in rows.all()
+                    }
+
+                day = func.date_trunc("day", table.timestamp)
+                rows = await db.execute(
+                    select(
+                        day.label("day"),
+                        func.count(table.id).label("requests"),
+                        func.coalesce(func.sum(table.total_tokens), 0).label("total_tokens"),
+                        func.coalesce(func.sum(table.cost_usd), 0.0).label("cost_usd"),
+                    )
+                    .where(window)
+                    .group_by(day)
+                    .order_by(day)
+                )
+                result["cost_per_day"] = [
+                    {
+                        "day": row.day.date().isoformat(),
+                        "requests": row.requests,
+                        "total_tokens": int(row.total_tokens),
+                        "cost_usd": round(float(row.cost_usd), 6),
+                    }
+                    for row in rows.all()
+                ]
+        except Exception as e:
+            logger.warning(f"API consumption summary failed: {e}")
+            result["error"] = str(e)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "running": self._task is not None,
+        }
+
+
+# Singleton
+_consumption_recorder: ConsumptionRecorder | None = None
+
+
+def get_consumption_recorder() -> ConsumptionRecorder:
+    """Get or create API consumption recorder singleton."""
+    global _consumption_recorder
+    if _consumption_recorder is None:
+        _consumption_recorder = ConsumptionRecorder(
+            batch_size=settings.CONSUMPTION_BATCH_SIZE,
+            flush_interval=settings.CONSUMPTION_FLUSH_INTERVAL_SECONDS,
+            max_pending=settings.CONSUMPTION_MAX_PENDING,
+            retention_days=settings.CONSUMPTION_RETENTION_DAYS,
+        )
+    return _consumption_recorder
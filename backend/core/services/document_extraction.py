@@ -0,0 +1,272 @@
+"""
+Extracción de texto de documentos fuera del event loop.
+
+pypdf y python-docx son CPU-bound: en licitaciones de cientos de páginas
+bloquean el loop varios segundos. La extracción corre en un pool de procesos;
+los PDFs grandes se dividen en rangos de páginas que se extraen en paralelo.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from pypdf import PdfReader
+from docx import Document
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionTimeoutError(TimeoutError):
+    """La extracción de texto superó el timeout configurado."""
+
+
+# ============ FUNCIONES DEL WORKER (deben ser picklables) ============
+
+def pdf_page_count(content: bytes) -> int:
+    """Número de páginas de un PDF."""
+    return len(PdfReader(io.BytesIO(content)).pages)
+
+
+def extract_pdf_pages(content: bytes, start: int = 0, end: int | None = None) -> list[str]:
+    """Texto de las páginas [start, end) de un PDF (páginas vacías omitidas)."""
+    reader = PdfReader(io.BytesIO(content))
+    pages = reader.pages[start:end]
+    text_parts = []
+    for page in pages:
+        text = page.extract_text()
+        if text:
+            text_parts.append(text)
+    return text_parts
+
+
+def extract_docx(content: bytes) -> str:
+    """Texto de un DOCX: párrafos y luego tablas."""
+    doc = Document(io.BytesIO(content))
+    text_parts = []
+    for para in doc.paragraphs:
+        if para.text.strip():
+            text_parts.append(para.text)
+
+    # También extraer de tablas
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = " | ".join(cell.text.strip() for cell in row.cells if cell.text.strip())
+            if row_text:
+                text_parts.append(row_text)
+
+    return "\n\n".join(text_parts)
+
+
+# ============ EXTRACTOR ============
+
+class DocumentExtractor:
+    """
+    Extrae texto en un ProcessPoolExecutor.
+
+    - PDFs con más de `parallel_min_pages` páginas se reparten en rangos de
+      `pages_per_chunk` páginas entre los procesos del pool
+    - Solo se extraen las primeras `max_pages` páginas
+    - Cada extracción tiene un timeout total de `timeout` segundos. Si lo
+      supera, el pool se retira: las extracciones nuevas usan uno nuevo y los
+      procesos del anterior se matan cuando terminan las demás extracciones
+      que estaban corriendo en él (o tras otros `timeout` segundos)
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        max_pages: int = 500,
+        timeout: float = 60.0,
+        pages_per_chunk: int = 25,
+        parallel_min_pages: int = 50,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.pages_per_chunk = pages_per_chunk
+        self.parallel_min_pages = parallel_min_pages
+        self._pool: ProcessPoolExecutor | None = None
+        # Futures en curso por pool (para retirar un pool sin cortar a los demás)
+        self._inflight: dict[ProcessPoolExecutor, set[Future]] = {}
+        self._retiring: set[asyncio.Task] = set()
+        self._stats: dict[str, Any] = {
+            "documents": 0,
+            "pages": 0,
+            "total_seconds": 0.0,
+            "timeouts": 0,
+            "last": None,
+        }
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: el proceso principal tiene threads (uvicorn, clientes HTTP)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Document extraction pool started with {self.max_workers} processes")
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._inflight.pop(self._pool, None)
+            self._pool = None
+
+    @staticmethod
+    def _kill_processes(processes: list) -> None:
+        """Termina (o mata) procesos del pool; bloqueante, corre en un thread."""
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+
+    async def _retire_pool(self, pool: ProcessPoolExecutor, stuck: list[Future]):
+        """
+        Espera a que terminen las demás extracciones del pool retirado y
+        luego mata sus procesos. Cancelar el future no detiene a pypdf dentro
+        del worker: sin esto, un PDF patológico seguiría ocupando el proceso.
+        """
+        others = [f for f in list(self._inflight.get(pool, ())) if f not in stuck and not f.done()]
+        if others:
+            await asyncio.wait(
+                [asyncio.wrap_future(f) for f in others], timeout=self.timeout
+            )
+        processes = list((pool._processes or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        self._inflight.pop(pool, None)
+        await asyncio.to_thread(self._kill_processes, processes)
+        logger.warning(f"Retired document extraction pool terminated ({len(processes)} processes)")
+
+    def _retire(self, jobs: list[Future]):
+        """Saca el pool actual de servicio tras un timeout (ver `_retire_pool`)."""
+        pool = self._pool
+        if pool is None:
+            return
+        self._pool = None
+        stuck = [f for f in jobs if not f.done()]
+        task = asyncio.create_task(self._retire_pool(pool, stuck))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    async def _run(self, jobs: list[Future], fn, *args):
+        pool = self.pool
+        future = pool.submit(fn, *args)
+        jobs.append(future)
+        inflight = self._inflight.setdefault(pool, set())
+        inflight.add(future)
+        future.add_done_callback(inflight.discard)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            # Un worker murió (p.ej. OOM): se recrea el pool en la próxima llamada
+            if self._pool is pool:
+                logger.error("Document extraction pool broken, recreating")
+                self.shutdown()
+            raise
+
+    async def _extract_pdf(self, jobs: list[Future], content: bytes, filename: str) -> tuple[str, int]:
+        total_pages = await self._run(jobs, pdf_page_count, content)
+        pages = min(total_pages, self.max_pages)
+        if total_pages > self.max_pages:
+            logger.warning(
+                f"{filename}: {total_pages} pages, extracting only the first {self.max_pages}"
+            )
+
+        if pages < self.parallel_min_pages:
+            parts = await self._run(jobs, extract_pdf_pages, content, 0, pages)
+        else:
+            ranges = [
+                (start, min(start + self.pages_per_chunk, pages))
+                for start in range(0, pages, self.pages_per_chunk)
+            ]
+            chunks = await asyncio.gather(*[
+                self._run(jobs, extract_pdf_pages, content, start, end) for start, end in ranges
+            ])
+            parts = [text for chunk in chunks for text in chunk]
+        return "\n\n".join(parts), pages
+
+    async def _extract(self, jobs: list[Future], content: bytes, filename: str) -> tuple[str, int]:
+        filename_lower = filename.lower()
+        if filename_lower.endswith(".pdf"):
+            return await self._extract_pdf(jobs, content, filename)
+        if filename_lower.endswith(".docx"):
+            return await self._run(jobs, extract_docx, content), 0
+        # Asumir texto plano
+        return content.decode("utf-8", errors="ignore"), 0
+
+    async def extract_text(self, content: bytes, filename: str) -> str:
+        """
+        Extrae el texto de un archivo según su extensión.
+
+        Raises:
+            ExtractionTimeoutError: Si supera `timeout` segundos
+        """
+        started = time.perf_counter()
+        jobs: list[Future] = []
+        try:
+            text, pages = await asyncio.wait_for(self._extract(jobs, content, filename), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            logger.error(f"Text extraction timed out after {self.timeout}s: {filename}")
+            # Los workers de este documento siguen extrayendo: retirar el pool
+            self._retire(jobs)
+            raise ExtractionTimeoutError(
+                f"La extracción de texto de {filename} superó {self.timeout}s"
+            )
+
+        elapsed = time.perf_counter() - started
+        self._stats["documents"] += 1
+        self._stats["pages"] += pages
+        self._stats["total_seconds"] += elapsed
+        self._stats["last"] = {
+            "file_name": filename,
+            "pages": pages,
+            "chars": len(text),
+            "seconds": round(elapsed, 3),
+        }
+        logger.info(f"Extracted {len(text)} chars ({pages} pages) from {filename} in {elapsed:.2f}s")
+        return text
+
+    def stats(self) -> dict[str, Any]:
+        documents = self._stats["documents"]
+        return {
+            **self._stats,
+            "total_seconds": round(self._stats["total_seconds"], 3),
+            "avg_seconds": round(self._stats["total_seconds"] / documents, 3) if documents else 0.0,
+            "max_workers": self.max_workers,
+        }
+
+
+# Singleton
+_document_extractor: DocumentExtractor | None = None
+
+
+def get_document_extractor() -> DocumentExtractor:
+    """Get or create document extractor singleton."""
+    global _document_extractor
+    if _document_extractor is None:
+        from core.config import settings
+        _document_extractor = DocumentExtractor(
+            max_workers=settings.EXTRACTION_MAX_WORKERS or None,
+            max_pages=settings.EXTRACTION_MAX_PAGES,
+            timeout=settings.EXTRACTION_TIMEOUT_SECONDS,
+            pages_per_chunk=settings.EXTRACTION_PAGES_PER_CHUNK,
+            parallel_min_pages=settings.EXTRACTION_PARALLEL_MIN_PAGES,
+        )
+    return _document_extractor
+
+
+def shutdown_document_extractor():
+    """Libera el pool de procesos (shutdown de la app)."""
+    if _document_extractor is not None:
+        _document_extractor.shutdown()
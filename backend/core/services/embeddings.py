@@ -0,0 +1,232 @@
+"""
+Índice de embeddings (pgvector) sobre el catálogo: experiencias, capítulos
+y certificaciones.
+
+Cada elemento guarda el embedding de su texto descriptivo al crearse o
+actualizarse. Para un RFP se calcula el embedding de la consulta y se
+preseleccionan los `shortlist_size` elementos más cercanos (distancia
+coseno); solo esos pasan al ranking del LLM, que es opcional.
+"""
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from core.gcp.gemini_client import get_gemini_client
+from models.certification import Certification
+from models.chapter import Chapter
+from models.experience import Experience
+
+logger = logging.getLogger(__name__)
+
+
+# ============ TEXTO INDEXADO ============
+
+def experience_text(experience: Experience) -> str:
+    return (
+        f"Cliente: {experience.propietario_servicio}\n"
+        f"Ubicación: {experience.ubicacion}\n"
+        f"Servicio: {experience.descripcion_servicio}"
+    )
+
+
+def catalog_item_text(item: Chapter | Certification) -> str:
+    return f"{item.name}\n{item.description or ''}".strip()
+
+
+INDEXED_MODELS = {
+    Experience: experience_text,
+    Chapter: catalog_item_text,
+    Certification: catalog_item_text,
+}
+
+
+def rfp_query_text(rfp) -> str:
+    """Consulta de similitud a partir del análisis de un RFP."""
+    data = rfp.extracted_data or {}
+    parts = [
+        f"Título: {rfp.title or rfp.file_name}",
+        f"Cliente: {rfp.client_name or ''}",
+        f"Categoría: {rfp.category or data.get('category') or ''}",
+        f"Resumen: {rfp.summary or data.get('summary') or ''}",
+    ]
+    tech_stack = data.get("tech_stack")
+    if isinstance(tech_stack, list) and tech_stack:
+        parts.append("Tecnologías: " + ", ".join(str(t) for t in tech_stack))
+    return "\n".join(parts)
+
+
+# ============ ÍNDICE ============
+
+class EmbeddingIndex:
+    """
+    Cálculo de embeddings y preselección por similitud.
+
+    Los errores de Gemini o de la base de datos nunca interrumpen el flujo:
+    un elemento sin embedding queda para el backfill y una preselección
+    fallida retorna None (el llamador usa el catálogo completo).
+    """
+
+    def __init__(self, shortlist_size: int = 30, query_max_chars: int = 8000):
+        self.shortlist_size = shortlist_size
+        self.query_max_chars = query_max_chars
+        self._backfill_task: asyncio.Task | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return settings.EMBEDDINGS_ENABLED
+
+    async def index(self, *items: Any) -> int:
+        """
+        Calcula y asigna el embedding de los elementos (sin commit).
+        Retorna cuántos se indexaron.
+        """
+        if not self.enabled or not items:
+            return 0
+        texts = [INDEXED_MODELS[type(item)](item) for item in items]
+        try:
+            vectors = await get_gemini_client().embed_texts(texts, task_type="RETRIEVAL_DOCUMENT")
+        except Exception as e:
+            logger.warning(f"Embedding indexing failed for {len(items)} items: {e}")
+            return 0
+        for item, vector in zip(items, vectors):
+            item.embedding = vector
+        return len(vectors)
+
+    async def embed_query(self, text: str) -> list[float] | None:
+        try:
+            vectors = await get_gemini_client().embed_texts(
+                [text[:self.query_max_chars]], task_type="RETRIEVAL_QUERY"
+            )
+            return vectors[0]
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            return None
+
+    async def count(self, db: AsyncSession, model: type, *filters) -> int:
+        result = await db.execute(select(func.count()).select_from(model).where(*filters))
+        return result.scalar_one()
+
+    async def shortlist(
+        self,
+        db: AsyncSession,
+        model: type,
+        query_text: str,
+        *filters,
+        k: int | None = None,
+    ) -> list[tuple[Any, float | None]] | None:
+        """
+        Los `k` elementos más similares a `query_text`, con su similitud coseno.
+
+        Los elementos aún sin embedding (pendientes de backfill) se agregan al
+        final con similitud None para que no queden fuera de la recomendación.
+
+        Returns:
+            Lista [(elemento, similitud)], o None si el índice no está disponible
+        """
+        if not self.enabled:
+            return None
+        k = k or self.shortlist_size
+        vector = await self.embed_query(query_text)
+        if vector is None:
+            return None
+
+        try:
+            # Savepoint: un error (p.ej. extensión vector ausente) no aborta la transacción del llamador
+            async with db.begin_nested():
+                distance = model.embedding.cosine_distance(vector)
+                result = await db.execute(
+                    select(model, distance.label("distance"))
+                    .where(model.embedding.is_not(None), *filters)
+                    .order_by(distance)
+                    .limit(k)
+                )
+                ranked = [(item, round(1 - dist, 4)) for item, dist in result.all()]
+
+                result = await db.execute(
+                    select(model).where(model.embedding.is_(None), *filters).limit(k)
+                )
+                pending = result.scalars().all()
+        except Exception as e:
+            logger.warning(f"Embedding shortlist failed for {model.__tablename__}: {e}")
+            return None
+
+        if pending:
+            logger.info(f"{len(pending)} {model.__tablename__} without embedding added to shortlist")
+        return ranked + [(item, None) for item in pending]
+
+    async def backfill(self, batch_size: int = 100) -> int:
+        """Indexa los elementos existentes que no tienen embedding."""
+        total = 0
+        for model in INDEXED_MODELS:
+            while True:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(model).where(model.embedding.is_(None)).limit(batch_size)
+                    )
+                    items = result.scalars().all()
+                    if not items:
+                        break
+                    indexed = await self.index(*items)
+                    if not indexed:
+                        # Gemini no disponible: reintentar en el próximo arranque
+                        return total
+                    await db.commit()
+                    total += indexed
+        if total:
+            logger.info(f"Embedding backfill indexed {total} catalog items")
+        return total
+
+    def start_backfill(self):
+        """Lanza el backfill en background (arranque de la app)."""
+        if not self.enabled or self._backfill_task is not None:
+            return
+
+        async def run():
+            try:
+                await self.backfill()
+            except Exception as e:
+                logger.error(f"Embedding backfill failed: {e}")
+
+        self._backfill_task = asyncio.create_task(run())
+
+    async def stop(self):
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+            await asyncio.gather(self._backfill_task, return_exceptions=True)
+            self._backfill_task = None
+
+
+def similarity_recommendations(
+    ranked: list[tuple[Any, float | None]],
+    id_field: str,
+) -> list[dict[str, Any]]:
+    """Recomendaciones solo por similitud (sin ranking del LLM)."""
+    return [
+        {
+            id_field: str(item.id),
+            "score": similarity,
+            "reason": f"Similitud semántica con el RFP: {similarity:.2f}",
+        }
+        for item, similarity in ranked
+        if similarity is not None
+    ]
+
+
+# Singleton
+_embedding_index: EmbeddingIndex | None = None
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Get or create embedding index singleton."""
+    global _embedding_index
+    if _embedding_index is None:
+        _embedding_index = EmbeddingIndex(
+            shortlist_size=settings.RECOMMENDATION_SHORTLIST_SIZE,
+            query_max_chars=settings.EMBEDDING_QUERY_MAX_CHARS,
+        )
+    return _embedding_index
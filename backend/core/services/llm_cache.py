@@ -0,0 +1,183 @@
+"""
+Cache persistente (Postgres) de respuestas de Gemini.
+
+Para prompts deterministas (p.ej. relevancia de experiencias y capítulos) la
+respuesta se reutiliza entre requests y reinicios. La clave combina modelo,
+hash del prompt y configuración de generación; cada entrada pertenece a un
+`scope` que se invalida cuando cambian los datos de origen.
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from core.config import settings
+from core.database import AsyncSessionLocal
+from models.llm_cache import LLMResponseCacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    Cache de respuestas en la tabla `llm_response_cache`.
+
+    Los errores de base de datos nunca interrumpen la llamada a Gemini:
+    se registran y la consulta se trata como miss.
+    """
+
+    def __init__(self, ttl_seconds: float = 604800):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, config: dict[str, Any]) -> str:
+        """Clave del cache: modelo + hash del prompt + configuración de generación."""
+        payload = json.dumps(
+            {
+                "model": model,
+                "prompt": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+                "config": config,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Any | None:
+        """Respuesta vigente para `key`, o None."""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(LLMResponseCacheEntry.response).where(
+                        LLMResponseCacheEntry.cache_key == key,
+                        LLMResponseCacheEntry.expires_at > func.now(),
+                    )
+                )
+                row = result.first()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                await db.execute(
+                    update(LLMResponseCacheEntry)
+                    .where(LLMResponseCacheEntry.cache_key == key)
+                    .values(hits=LLMResponseCacheEntry.hits + 1, last_hit_at=func.now())
+                )
+                await db.commit()
+                self.hits += 1
+                return row.response
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM response cache lookup failed: {e}")
+            return None
+
+    async def set(
+        self,
+        key: str,
+        response: Any,
+        *,
+        model: str,
+        operation: str,
+        scope: str | None = None,
+        ttl_seconds: float | None = None,
+    ):
+        """Guarda (o reemplaza) la respuesta de `key`."""
+        ttl = ttl_seconds or self.ttl_seconds
+        values = {
+            "cache_key": key,
+            "model": model,
+            "operation": operation,
+            "scope": scope,
+            "response": response,
+            "hits": 0,
+            "created_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(seconds=ttl),
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                stmt = insert(LLMResponseCacheEntry).values(**values)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[LLMResponseCacheEntry.cache_key],
+                    set_={k: stmt.excluded[k] for k in values if k != "cache_key"},
+                )
+                await db.execute(stmt)
+                await db.commit()
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM response cache store failed: {e}")
+
+    async def invalidate(self, scope: str) -> int:
+        """Elimina las respuestas de un scope (p.ej. al modificar experiencias)."""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.scope == scope)
+                )
+                await db.commit()
+                if result.rowcount:
+                    logger.info(f"LLM response cache: invalidated {result.rowcount} entries ({scope})")
+                return result.rowcount or 0
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"LLM response cache invalidation failed ({scope}): {e}")
+            return 0
+
+    async def purge_expired(self) -> int:
+        """Elimina las entradas vencidas."""
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    delete(LLMResponseCacheEntry).where(LLMResponseCacheEntry.expires_at <= func.now())
+                )
+                await db.commit()
+                return result.rowcount or 0
+        except Exception as e:
+            logger.warning(f"LLM response cache purge failed: {e}")
+            return 0
+
+    async def stats(self) -> dict[str, Any]:
+        """Hit rate del proceso y tamaño/hits persistidos por scope."""
+        total = self.hits + self.misses
+        summary: dict[str, Any] = {
+            "enabled": settings.LLM_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / total * 100, 2) if total else 0,
+            "scopes": {},
+        }
+        try:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(
+                        LLMResponseCacheEntry.scope,
+                        func.count(LLMResponseCacheEntry.cache_key),
+                        func.coalesce(func.sum(LLMResponseCacheEntry.hits), 0),
+                    )
+                    .where(LLMResponseCacheEntry.expires_at > func.now())
+                    .group_by(LLMResponseCacheEntry.scope)
+                )
+                for scope, entries, hits in result.all():
+                    summary["scopes"][scope or "default"] = {"entries": entries, "total_hits": int(hits)}
+        except Exception as e:
+            logger.warning(f"LLM response cache stats failed: {e}")
+        return summary
+
+
+# Singleton
+_llm_response_cache: LLMResponseCache | None = None
+
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Get or create LLM response cache singleton."""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache(ttl_seconds=settings.LLM_CACHE_TTL_SECONDS)
+    return _llm_response_cache
@@ -2,7 +2,9 @@
 Cliente para conectar con MCP Talent Search Server.
 Permite buscar candidatos reales de TIVIT basado en roles requeridos.
 """
+import json
 import logging
+from collections.abc import AsyncIterator
 from typing import Any
 
 import httpx
@@ -99,6 +101,67 @@ class MCPTalentClient:
                 "total_candidatos": 0
             }
     
+    async def search_team_stream(
+        self, roles: list[dict[str, Any]]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Busca candidatos para multiples roles consumiendo /batch-search/stream.
+        
+        El servidor emite un registro NDJSON por rol apenas lo resuelve, asi
+        que el timeout aplica entre registros (por rol) y no a la respuesta
+        completa. Nunca lanza excepciones: si la conexion falla se emite un
+        registro final de resumen con exito=False, igual que search_team.
+        
+        Args:
+            roles: Lista de roles (mismo formato que search_team)
+        
+        Yields:
+            Registros con clave "tipo":
+            - "rol": {"rol_id", "descripcion", "candidatos", "total"}
+            - "error": {"rol_id", "error"} (fallo de un rol, el stream continua)
+            - "resumen": {"exito", "mensaje", "total_roles", "total_candidatos", ...}
+        """
+        logger.info(f"Streaming team search for {len(roles)} roles via MCP")
+        
+        error: str | None = None
+        try:
+            timeout = httpx.Timeout(self.timeout, connect=10.0)
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                async with client.stream(
+                    "POST",
+                    f"{self.base_url}/batch-search/stream",
+                    json={"roles": roles},
+                    # Sin compresion para que cada registro llegue apenas se emite
+                    headers={"Accept-Encoding": "identity"},
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        record = json.loads(line)
+                        if record.get("tipo") == "resumen":
+                            logger.info(
+                                f"MCP stream completed: {record.get('total_candidatos', 0)} candidates found"
+                            )
+                        yield record
+                        if record.get("tipo") == "resumen":
+                            return
+            error = "Stream MCP terminado sin resumen"
+        except httpx.TimeoutException:
+            error = "Timeout al buscar candidatos"
+        except httpx.HTTPStatusError as e:
+            error = f"Error HTTP: {e.response.status_code}"
+        except Exception as e:
+            error = str(e)
+        
+        logger.error(f"MCP stream failed: {error}")
+        yield {
+            "tipo": "resumen",
+            "exito": False,
+            "error": error,
+            "total_roles": len(roles),
+        }
+    
     async def search_single(
         self, 
         query: str, 
@@ -199,7 +262,10 @@ def convert_team_estimation_to_mcp_roles(
             "rol_id": role.get("role_id", f"Role_{len(mcp_roles) + 1}"),
             "descripcion": descripcion,
             "pais": country,
-            "cantidad": cantidad_buscar
+            "cantidad": cantidad_buscar,
+            # Nombres exactos para el indice invertido del MCP
+            "skills": role.get("required_skills") or [],
+            "certificaciones": role.get("required_certifications") or []
         })
     
     return mcp_roles
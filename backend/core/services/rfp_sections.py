@@ -0,0 +1,143 @@
+"""
+División por secciones y consolidación para el análisis map-reduce de RFPs grandes.
+
+- `split_sections`: corta el texto en encabezados (capítulos, anexos, numeración)
+  y agrupa secciones contiguas hasta un tamaño máximo por fragmento
+- `merge_section_results`: combina los `extracted_data` parciales de cada
+  fragmento en un único resultado con el schema del análisis
+"""
+import re
+from typing import Any
+
+# Encabezados típicos de licitaciones: CAPÍTULO I, ANEXO N° 3, SECCIÓN 2,
+# TÍTULO, BASES TÉCNICAS, numeración "1.", "2.3", "IV." al inicio de línea
+HEADING_RE = re.compile(
+    r"^\s*("
+    r"(cap[ií]tulo|anexo|secci[oó]n|t[ií]tulo|ap[eé]ndice|parte|bases)\b"
+    r"|\d{1,2}(\.\d{1,2}){0,2}\.?\s+[A-ZÁÉÍÓÚÑ]"
+    r"|[IVXL]{1,5}\.\s+[A-ZÁÉÍÓÚÑ]"
+    r")",
+    re.IGNORECASE,
+)
+
+SCALAR_FIELDS = (
+    "title", "client_name", "client_acronym", "country", "category",
+    "proposal_deadline", "questions_deadline", "project_duration",
+)
+LIST_FIELDS = ("sla", "penalties", "risks", "requested_roles")
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and len(stripped) <= 120 and bool(HEADING_RE.match(stripped))
+
+
+def _split_long(text: str, max_chars: int) -> list[str]:
+    """Corta una sección demasiado larga en párrafos (o a la fuerza si no hay)."""
+    parts: list[str] = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        while len(paragraph) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            parts.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_sections(text: str, max_chars: int) -> list[str]:
+    """
+    Divide un documento en fragmentos de hasta `max_chars` caracteres
+    respetando los límites de sección cuando es posible.
+    """
+    sections: list[str] = []
+    current: list[str] = []
+    for line in text.splitlines():
+        if _is_heading(line) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+
+    chunks: list[str] = []
+    buffer = ""
+    for section in sections:
+        if len(section) > max_chars:
+            if buffer:
+                chunks.append(buffer)
+                buffer = ""
+            chunks.extend(_split_long(section, max_chars))
+        elif buffer and len(buffer) + len(section) + 1 > max_chars:
+            chunks.append(buffer)
+            buffer = section
+        else:
+            buffer = f"{buffer}\n{section}" if buffer else section
+    if buffer:
+        chunks.append(buffer)
+    return [c for c in chunks if c.strip()]
+
+
+def _key(item: Any) -> str:
+    if isinstance(item, dict):
+        value = item.get("description") or item.get("title") or item.get("role") or item
+        return str(value).strip().lower()
+    return str(item).strip().lower()
+
+
+def _dedup(items: list[Any]) -> list[Any]:
+    seen: set[str] = set()
+    result = []
+    for item in items:
+        key = _key(item)
+        if key and key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
+def merge_section_results(partials: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Consolida los resultados parciales (en orden del documento).
+
+    - Campos escalares: primer valor no nulo (la portada suele estar al inicio)
+    - Presupuesto: el primero que esté especificado
+    - Listas: concatenadas sin duplicados
+    - Resúmenes y requisitos de experiencia: concatenados
+    """
+    merged: dict[str, Any] = {}
+
+    for field in SCALAR_FIELDS:
+        merged[field] = next((p[field] for p in partials if p.get(field)), None)
+
+    budgets = [p.get("budget") for p in partials if isinstance(p.get("budget"), dict)]
+    merged["budget"] = next(
+        (b for b in budgets if b.get("is_specified") or b.get("amount_min") or b.get("amount_max")),
+        budgets[0] if budgets else None,
+    )
+
+    merged["tech_stack"] = _dedup([t for p in partials for t in (p.get("tech_stack") or [])])
+    merged["required_certifications"] = _dedup(
+        [c for p in partials for c in (p.get("required_certifications") or [])]
+    )
+    for field in LIST_FIELDS:
+        merged[field] = _dedup([item for p in partials for item in (p.get(field) or [])])
+
+    experiences = [p["experience_required"] for p in partials if isinstance(p.get("experience_required"), dict)]
+    required = [e for e in experiences if e.get("required")]
+    merged["experience_required"] = {
+        "required": bool(required),
+        "details": " | ".join(e["details"] for e in required if e.get("details")) or None,
+        "is_mandatory": any(e.get("is_mandatory") for e in required),
+    }
+
+    merged["section_summaries"] = [p["summary"] for p in partials if p.get("summary")]
+    return merged
@@ -4,6 +4,8 @@
 -- Extensiones útiles
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+-- pgvector: columnas embedding del catálogo (experiencias, capítulos, certificaciones)
+CREATE EXTENSION IF NOT EXISTS vector;
 
 -- Añadir columna preferences si no existe (para migración)
 DO $$
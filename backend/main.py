@@ -6,9 +6,15 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
 
 from core.config import settings
 from core.database import engine, Base
+from core.services.analysis_jobs import get_analysis_queue
+from core.services.document_extraction import shutdown_document_extractor
+from core.services.api_consumption import get_consumption_recorder
+from core.services.embeddings import get_embedding_index
+from core.gcp.gemini_client import close_context_caches
 from api.routes import rfp_router, dashboard_router, auth_router, proposal_router, certifications_router, experiences_router, chapters_router
 
 # Configurar logging
@@ -28,12 +34,31 @@ async def lifespan(app: FastAPI):
     # Crear tablas si no existen (solo en desarrollo)
     if settings.DEBUG:
         async with engine.begin() as conn:
+            # El tipo vector (pgvector) debe existir antes de crear las tablas del catálogo
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created/verified")
     
+    # Escritura en lotes del consumo de Gemini
+    consumption_recorder = get_consumption_recorder()
+    await consumption_recorder.start()
+    
+    # Workers de análisis de RFPs
+    analysis_queue = get_analysis_queue()
+    await analysis_queue.start()
+    
+    # Embeddings del catálogo que aún no se indexaron
+    embedding_index = get_embedding_index()
+    embedding_index.start_backfill()
+    
     yield
     
     logger.info("Shutting down application")
+    await analysis_queue.stop()
+    await embedding_index.stop()
+    shutdown_document_extractor()
+    await close_context_caches()
+    await consumption_recorder.stop()
     await engine.dispose()
 
 
@@ -3,5 +3,7 @@ from .rfp import RFPSubmission, RFPQuestion, RFPStatus, RFPCategory, Recommendat
 from .user import User
 from .certification import Certification
 from .experience import Experience
+from .llm_cache import LLMResponseCacheEntry
+from .api_consumption import APIConsumptionRecord
 
-__all__ = ["RFPSubmission", "RFPQuestion", "RFPStatus", "RFPCategory", "Recommendation", "User", "Certification", "Experience"]
+__all__ = ["RFPSubmission", "RFPQuestion", "RFPStatus", "RFPCategory", "Recommendation", "User", "Certification", "Experience", "LLMResponseCacheEntry", "APIConsumptionRecord"]
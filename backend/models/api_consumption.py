@@ -0,0 +1,41 @@
+"""
+Modelo del historial de consumo de la API de Gemini.
+"""
+from datetime import datetime
+from sqlalchemy import String, Integer, Float, Boolean, Text, DateTime, BigInteger, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from core.database import Base
+
+
+class APIConsumptionRecord(Base):
+    """Una llamada a Gemini: tokens, latencia, costo y usuario que la originó."""
+    
+    __tablename__ = "api_consumption"
+    
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    
+    timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    operation: Mapped[str] = mapped_column(String(50), nullable=False)
+    
+    # Sin FK: el historial de costos se conserva aunque se elimine el usuario
+    user_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
+    
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    thinking_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    total_tokens: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_ms: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    
+    success: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    
+    __table_args__ = (
+        Index("idx_api_consumption_timestamp", "timestamp"),
+        Index("idx_api_consumption_user", "user_id", "timestamp"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<APIConsumptionRecord {self.operation} - {self.model}>"
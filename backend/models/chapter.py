@@ -6,7 +6,9 @@ from datetime import datetime
 from sqlalchemy import String, Boolean, DateTime, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import Vector
 
+from core.config import settings
 from core.database import Base
 
 class Chapter(Base):
@@ -29,6 +31,13 @@ class Chapter(Base):
     
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     
+    # Embedding de nombre + descripción (prefiltro por similitud)
+    embedding: Mapped[list[float] | None] = mapped_column(
+        Vector(settings.EMBEDDING_DIMENSIONS),
+        nullable=True,
+        deferred=True  # Los listados no cargan el vector de cada fila
+    )
+    
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), 
         default=datetime.utcnow,
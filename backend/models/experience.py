@@ -3,7 +3,9 @@ from datetime import datetime, date
 from sqlalchemy import String, Text, Date, Numeric, DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import UUID
+from pgvector.sqlalchemy import Vector
 
+from core.config import settings
 from core.database import Base
 
 class Experience(Base):
@@ -18,6 +20,11 @@ class Experience(Base):
     fecha_fin: Mapped[date] = mapped_column(Date, nullable=True)
     monto_final: Mapped[float] = mapped_column(Numeric(15, 2), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Embedding de cliente + descripción (prefiltro de recomendaciones).
+    # Diferido: los listados no cargan el vector de cada fila
+    embedding: Mapped[list[float] | None] = mapped_column(
+        Vector(settings.EMBEDDING_DIMENSIONS), nullable=True, deferred=True
+    )
 
     def __repr__(self):
         return f"<Experience {self.propietario_servicio} - {self.descripcion_servicio[:30]}>"
@@ -0,0 +1,42 @@
+"""
+Modelo del cache persistente de respuestas de Gemini.
+"""
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB
+
+from core.database import Base
+
+
+class LLMResponseCacheEntry(Base):
+    """Respuesta de Gemini reutilizable (clave: modelo + hash del prompt + configuración)."""
+    
+    __tablename__ = "llm_response_cache"
+    
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    operation: Mapped[str] = mapped_column(String(50), nullable=False)
+    
+    # Grupo de invalidación (p.ej. "experiences", "chapters")
+    scope: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    
+    response: Mapped[dict | list | str | None] = mapped_column(JSONB, nullable=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), 
+        default=datetime.utcnow,
+        nullable=False
+    )
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_hit_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        Index("idx_llm_cache_scope", "scope"),
+        Index("idx_llm_cache_expires", "expires_at"),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<LLMResponseCacheEntry {self.cache_key[:12]} - {self.operation}>"
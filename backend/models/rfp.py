@@ -79,6 +79,7 @@ class RFPSubmission(Base):
     file_name: Mapped[str] = mapped_column(String(255), nullable=False)
     file_gcs_path: Mapped[str] = mapped_column(String(500), nullable=False)
     file_size_bytes: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)  # sha256 del archivo
     
     # Status
     status: Mapped[str] = mapped_column(
@@ -113,6 +114,8 @@ class RFPSubmission(Base):
     confidence_score: Mapped[int | None] = mapped_column(Integer, nullable=True)
     recommendation: Mapped[str | None] = mapped_column(String(20), nullable=True)
     recommended_isos: Mapped[list | None] = mapped_column(JSONB, nullable=True)
+    # Hash de archivo + prompt + modo + catálogo de certificaciones (reutilización de análisis)
+    analysis_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
     
     # Decisión del BDM
     decision: Mapped[str | None] = mapped_column(String(10), nullable=True)  # go, no_go
@@ -147,6 +150,8 @@ class RFPSubmission(Base):
         Index("idx_rfp_client", "client_name"),
         Index("idx_rfp_category", "category"),
         Index("idx_rfp_deadline", "proposal_deadline"),
+        Index("idx_rfp_content_hash", "content_hash"),
+        Index("idx_rfp_analysis_key", "analysis_key"),
     )
     
     def __repr__(self) -> str:
@@ -24,6 +24,8 @@ class Chapter(ChapterBase):
 
 class ChapterRecommendationRequest(BaseModel):
     rfp_id: UUID
+    # None: usar RECOMMENDATION_LLM_RERANK; False: solo similitud de embeddings
+    use_llm: Optional[bool] = None
 
 class ChapterRecommendation(BaseModel):
     chapter_id: UUID
@@ -31,3 +31,5 @@ class ExperienceRecommendation(BaseModel):
 
 class ExperienceRecommendationRequest(BaseModel):
     rfp_id: UUID
+    # None: usar RECOMMENDATION_LLM_RERANK; False: solo similitud de embeddings
+    use_llm: Optional[bool] = None
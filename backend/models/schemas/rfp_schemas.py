@@ -256,6 +256,7 @@ class UploadResponse(BaseModel):
     file_name: str
     status: RFPStatusEnum
     message: str = "RFP uploaded successfully. Analysis in progress."
+    job_id: str | None = None
 
 
 # ============ TEAM & COST ESTIMATION SCHEMAS ============
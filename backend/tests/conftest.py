@@ -0,0 +1,9 @@
+"""
+Configuración común de los tests unitarios del backend.
+Se ejecutan desde backend/: `python -m pytest tests`.
+"""
+import sys
+from pathlib import Path
+
+# Importar los paquetes del backend (core, models, ...) como en la app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
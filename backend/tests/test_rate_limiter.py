@@ -0,0 +1,172 @@
+"""
+Tests del scheduler de Gemini: orden y cancelación del PrioritySemaphore
+y recarga/espera del TokenBucket.
+"""
+import asyncio
+
+import pytest
+
+from core.gcp import rate_limiter
+from core.gcp.rate_limiter import BACKGROUND, INTERACTIVE, PrioritySemaphore, TokenBucket
+
+
+class FakeClock:
+    """Reloj manual: `time.monotonic` y `asyncio.sleep` avanzan el mismo tiempo."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps: list[float] = []
+        self._real_sleep = asyncio.sleep
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        self.sleeps.append(delay)
+        self.now += delay
+        await self._real_sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake.sleep)
+    return fake
+
+
+async def _settle():
+    """Deja correr a las tareas listas."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+# ============ PrioritySemaphore ============
+
+@pytest.mark.asyncio
+async def test_semaphore_wakes_interactive_before_background():
+    sem = PrioritySemaphore(1)
+    await sem.acquire(INTERACTIVE)
+    order = []
+
+    async def waiter(name: str, priority: int):
+        await sem.acquire(priority)
+        order.append(name)
+        sem.release()
+
+    tasks = [
+        asyncio.create_task(waiter("bg-1", BACKGROUND)),
+        asyncio.create_task(waiter("bg-2", BACKGROUND)),
+        asyncio.create_task(waiter("int-1", INTERACTIVE)),
+        asyncio.create_task(waiter("int-2", INTERACTIVE)),
+    ]
+    await _settle()
+    assert sem.waiting == 4
+
+    sem.release()
+    await asyncio.gather(*tasks)
+    # Primero las interactivas; FIFO dentro de cada prioridad
+    assert order == ["int-1", "int-2", "bg-1", "bg-2"]
+    assert sem._value == 1
+
+
+@pytest.mark.asyncio
+async def test_semaphore_skips_cancelled_waiter():
+    sem = PrioritySemaphore(1)
+    await sem.acquire(INTERACTIVE)
+
+    cancelled = asyncio.create_task(sem.acquire(INTERACTIVE))
+    second = asyncio.create_task(sem.acquire(BACKGROUND))
+    await _settle()
+
+    cancelled.cancel()
+    await _settle()
+    assert sem.waiting == 1
+
+    sem.release()
+    await asyncio.wait_for(second, timeout=1)
+    assert cancelled.cancelled()
+    assert sem._value == 0
+
+
+@pytest.mark.asyncio
+async def test_semaphore_returns_slot_granted_to_cancelled_waiter():
+    sem = PrioritySemaphore(1)
+    await sem.acquire(INTERACTIVE)
+
+    waiter = asyncio.create_task(sem.acquire(INTERACTIVE))
+    await _settle()
+
+    # El slot se asigna y la tarea se cancela antes de reanudarse
+    sem.release()
+    waiter.cancel()
+    await _settle()
+
+    assert waiter.cancelled()
+    assert sem._value == 1
+    assert sem.waiting == 0
+
+
+# ============ TokenBucket ============
+
+@pytest.mark.asyncio
+async def test_bucket_refills_continuously_up_to_capacity(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+
+    assert await bucket.acquire(10) == 0
+    assert bucket.tokens == 0
+
+    clock.now += 1
+    bucket._refill()
+    assert bucket.tokens == pytest.approx(5)
+
+    clock.now += 60
+    bucket._refill()
+    assert bucket.tokens == 10
+
+
+@pytest.mark.asyncio
+async def test_bucket_waits_for_missing_tokens(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=2)
+    await bucket.acquire(10)
+
+    waited = await bucket.acquire(4)
+    assert waited == pytest.approx(2)
+    assert bucket.tokens == pytest.approx(0)
+
+
+@pytest.mark.asyncio
+async def test_bucket_caps_request_at_capacity(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=10)
+
+    assert await bucket.acquire(1_000) == 0
+    assert bucket.tokens == 0
+
+
+@pytest.mark.asyncio
+async def test_bucket_adjust_allows_negative_balance(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    await bucket.acquire(10)
+
+    bucket.adjust(5)
+    assert bucket.tokens == -5
+    assert await bucket.acquire(1) == pytest.approx(6)
+
+
+@pytest.mark.asyncio
+async def test_bucket_background_yields_to_waiting_interactive(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=1)
+    await bucket.acquire(10)
+    order = []
+
+    async def take(name: str, amount: float, priority: int):
+        await bucket.acquire(amount, priority)
+        order.append(name)
+
+    interactive = asyncio.create_task(take("interactive", 5, INTERACTIVE))
+    await _settle()
+    background = asyncio.create_task(take("background", 1, BACKGROUND))
+    await asyncio.gather(interactive, background)
+
+    # La de background tendría saldo antes, pero espera a la interactiva
+    assert order == ["interactive", "background"]
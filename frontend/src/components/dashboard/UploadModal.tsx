@@ -1,11 +1,12 @@
 /**
  * Modal para subir RFPs
  */
-import React, { useState } from 'react';
-import { Modal, Upload, message, Typography, Spin, Steps } from 'antd';
+import React, { useEffect, useRef, useState } from 'react';
+import { Modal, Upload, message, Typography, Spin, Steps, Progress } from 'antd';
 import { InboxOutlined, LoadingOutlined, CheckCircleOutlined, FileSearchOutlined, CloudUploadOutlined } from '@ant-design/icons';
 import type { UploadProps } from 'antd';
 import { rfpApi } from '../../lib/api';
+import type { UploadResponse } from '../../types';
 
 const { Dragger } = Upload;
 const { Text, Title } = Typography;
@@ -18,21 +19,79 @@ interface UploadModalProps {
 
 type UploadStep = 'idle' | 'uploading' | 'analyzing' | 'complete' | 'error';
 
+// El análisis corre en background: se consulta el estado del job periódicamente
+const POLL_INTERVAL_MS = 2000;
+
+const STAGE_LABELS: Record<string, string> = {
+  en_cola: 'En cola, esperando turno...',
+  descargando: 'Preparando documento...',
+  analizando: 'Analizando documento con Gemini...',
+  analizado: 'Análisis listo, procesando resultados...',
+  generando_preguntas: 'Generando preguntas para el cliente...',
+};
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 const UploadModal: React.FC<UploadModalProps> = ({ open, onCancel, onSuccess }) => {
   const [step, setStep] = useState<UploadStep>('idle');
   const [fileName, setFileName] = useState<string>('');
   const [errorMessage, setErrorMessage] = useState<string>('');
+  const [stage, setStage] = useState<string>('en_cola');
+  const [progress, setProgress] = useState<number>(0);
+  const pollingRef = useRef(false);
+
+  useEffect(() => () => {
+    pollingRef.current = false;
+  }, []);
 
   const resetState = () => {
+    pollingRef.current = false;
     setStep('idle');
     setFileName('');
     setErrorMessage('');
+    setStage('en_cola');
+    setProgress(0);
+  };
+
+  /**
+   * Espera a que termine el análisis. Retorna el error o null si fue exitoso.
+   * Si el job ya no está en memoria (p.ej. reinicio del servidor), se
+   * consulta el estado del RFP.
+   */
+  const waitForAnalysis = async (upload: UploadResponse): Promise<string | null> => {
+    while (pollingRef.current) {
+      if (upload.job_id) {
+        try {
+          const job = await rfpApi.getJob(upload.job_id);
+          setStage(job.stage);
+          setProgress(job.progress);
+          if (job.status === 'completed') return null;
+          if (job.status === 'failed') return job.error || 'El análisis falló';
+          await sleep(POLL_INTERVAL_MS);
+          continue;
+        } catch (error: any) {
+          if (error?.response?.status !== 404) throw error;
+          upload = { ...upload, job_id: null };
+        }
+      }
+      const rfp = await rfpApi.get(upload.id);
+      if (rfp.status === 'error') return 'El análisis falló';
+      if (rfp.status !== 'analyzing') return null;
+      await sleep(POLL_INTERVAL_MS);
+    }
+    return null;
   };
 
   const handleCancel = () => {
-    if (step === 'uploading' || step === 'analyzing') {
-      // No permitir cerrar durante el proceso
-      message.warning('Por favor espera a que termine el análisis');
+    if (step === 'uploading') {
+      // No permitir cerrar durante la subida
+      message.warning('Por favor espera a que termine la subida');
+      return;
+    }
+    if (step === 'analyzing') {
+      message.info('El análisis continúa en segundo plano');
+      resetState();
+      onSuccess();
       return;
     }
     resetState();
@@ -58,11 +117,22 @@ const UploadModal: React.FC<UploadModalProps> = ({ open, onCancel, onSuccess })
       setErrorMessage('');
 
       try {
-        // Cambiar a analyzing después de un momento
-        setTimeout(() => setStep('analyzing'), 1000);
+        // La subida retorna de inmediato con el RFP en cola (status ANALYZING)
+        const upload = await rfpApi.upload(file);
+        pollingRef.current = true;
+        setStep('analyzing');
+
+        const analysisError = await waitForAnalysis(upload);
+        if (!pollingRef.current) return false; // Modal cerrado: el análisis sigue en background
+        pollingRef.current = false;
 
-        // El endpoint ahora es síncrono - espera al análisis
-        await rfpApi.upload(file);
+        if (analysisError) {
+          setStep('error');
+          setErrorMessage(analysisError);
+          message.error(analysisError);
+          onSuccess();
+          return false;
+        }
         
         setStep('complete');
         message.success('RFP analizado exitosamente');
@@ -74,6 +144,7 @@ const UploadModal: React.FC<UploadModalProps> = ({ open, onCancel, onSuccess })
         }, 1500);
         
       } catch (error: any) {
+        pollingRef.current = false;
         setStep('error');
         const errorMsg = error?.response?.data?.detail || error?.message || 'Error al procesar el archivo';
         setErrorMessage(errorMsg);
@@ -172,12 +243,13 @@ const UploadModal: React.FC<UploadModalProps> = ({ open, onCancel, onSuccess })
                 indicator={<LoadingOutlined style={{ fontSize: 48 }} spin />} 
               />
               <div style={{ marginTop: 16 }}>
+                <Progress percent={progress} size="small" showInfo={false} />
                 <Text type="secondary">
-                  Analizando documento con Gemini...
+                  {STAGE_LABELS[stage] || 'Analizando documento con Gemini...'}
                 </Text>
                 <br />
                 <Text type="secondary" style={{ fontSize: 12 }}>
-                  Esto puede tomar entre 30 segundos y 2 minutos
+                  Puedes cerrar esta ventana: el análisis continúa en segundo plano
                 </Text>
               </div>
             </>
@@ -203,7 +275,7 @@ const UploadModal: React.FC<UploadModalProps> = ({ open, onCancel, onSuccess })
       onCancel={handleCancel}
       footer={null}
       width={500}
-      closable={step === 'idle' || step === 'error' || step === 'complete'}
+      closable={step !== 'uploading'}
       maskClosable={step === 'idle' || step === 'error'}
     >
       {renderContent()}
@@ -14,6 +14,7 @@ import type {
   RFPDecision,
   RFPUpdate,
   UploadResponse,
+  AnalysisJob,
   TeamSuggestionResponse,
   TeamEstimation,
   CostEstimation,
@@ -147,6 +148,11 @@ export const rfpApi = {
     return data;
   },
 
+  getJob: async (jobId: string): Promise<AnalysisJob> => {
+    const { data } = await api.get<AnalysisJob>(`/rfp/jobs/${jobId}`);
+    return data;
+  },
+
   makeDecision: async (id: string, decision: RFPDecision): Promise<RFPDetail> => {
     const { data } = await api.post<RFPDetail>(`/rfp/${id}/decision`, decision);
     return data;
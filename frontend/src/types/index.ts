@@ -184,6 +184,20 @@ export interface UploadResponse {
   file_name: string;
   status: RFPStatus;
   message: string;
+  job_id?: string | null;
+}
+
+export type AnalysisJobStatus = 'queued' | 'running' | 'completed' | 'failed';
+
+export interface AnalysisJob {
+  job_id: string;
+  rfp_id: string;
+  status: AnalysisJobStatus;
+  stage: string;
+  progress: number;
+  error: string | null;
+  created_at: string;
+  finished_at: string | null;
 }
 
 // ============ TEAM & COST ESTIMATION ============
@@ -0,0 +1,285 @@
+"""
+CV Dedup - Elimina chunks redundantes de CVs antes de generar embeddings.
+
+Proceso:
+1. Normaliza el texto de cada chunk (minusculas, sin acentos, espacios)
+2. Elimina duplicados exactos dentro de cada CV (hash del texto normalizado)
+3. Elimina casi-duplicados dentro de cada CV (SimHash de 64 bits)
+4. Detecta boilerplate de corpus: fragmentos (casi) identicos que aparecen
+   en muchos CVs distintos (plantillas de empresa, encabezados repetidos).
+   Un CV nunca queda vacio: si todo su texto es boilerplate se conserva su
+   chunk mas distintivo
+5. Retorna los chunks sobrevivientes y un reporte de ahorro
+"""
+
+import re
+import hashlib
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Dict, Set, Tuple
+import logging
+
+from cv_processor import CVChunk
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+# Con 4 bandas de 16 bits, dos firmas a distancia <= 3 comparten al menos
+# una banda exacta (principio del palomar), asi que basta comparar dentro
+# de cada bucket en lugar de todos contra todos.
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+
+
+@dataclass
+class DedupReport:
+    """
+    Resumen de la deduplicacion.
+
+    Attributes:
+        total_chunks: Chunks recibidos
+        exact_duplicates: Duplicados exactos eliminados (mismo CV)
+        near_duplicates: Casi-duplicados eliminados (mismo CV)
+        boilerplate: Chunks eliminados por ser boilerplate del corpus
+        kept_chunks: Chunks que se van a indexar
+        chars_saved: Caracteres que no se van a embeber
+    """
+    total_chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    boilerplate: int = 0
+    kept_chunks: int = 0
+    chars_saved: int = 0
+
+    @property
+    def removed_chunks(self) -> int:
+        return self.exact_duplicates + self.near_duplicates + self.boilerplate
+
+    @property
+    def savings_pct(self) -> float:
+        if not self.total_chunks:
+            return 0.0
+        return round(100 * self.removed_chunks / self.total_chunks, 1)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "total_chunks": self.total_chunks,
+            "duplicados_exactos": self.exact_duplicates,
+            "casi_duplicados": self.near_duplicates,
+            "boilerplate": self.boilerplate,
+            "chunks_indexados": self.kept_chunks,
+            "caracteres_ahorrados": self.chars_saved,
+            "ahorro_pct": self.savings_pct
+        }
+
+
+@dataclass
+class _Signature:
+    """Firmas precalculadas de un chunk."""
+    index: int
+    exact: str
+    simhash: int
+    bands: Tuple[int, ...] = field(default_factory=tuple)
+
+
+class CVDeduplicator:
+    """
+    Elimina chunks redundantes de CVs.
+
+    Caracteristicas:
+    - Hash exacto sobre texto normalizado (sha1)
+    - SimHash de 64 bits sobre shingles de palabras para casi-duplicados
+    - Deteccion de boilerplate por numero de CVs distintos que lo contienen
+    """
+
+    def __init__(
+        self,
+        hamming_threshold: int = 3,
+        boilerplate_min_cvs: int = 5,
+        shingle_size: int = 3
+    ):
+        """
+        Inicializa el deduplicador.
+
+        Args:
+            hamming_threshold: Distancia maxima (bits) entre SimHash para
+                considerar dos chunks casi-duplicados (max 3 por el banding)
+            boilerplate_min_cvs: Numero minimo de CVs distintos en los que debe
+                aparecer un fragmento para tratarlo como boilerplate
+            shingle_size: Palabras por shingle para el SimHash
+        """
+        if hamming_threshold >= SIMHASH_BANDS:
+            raise ValueError(f"hamming_threshold debe ser < {SIMHASH_BANDS}")
+        self.hamming_threshold = hamming_threshold
+        self.boilerplate_min_cvs = boilerplate_min_cvs
+        self.shingle_size = shingle_size
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minusculas, sin acentos, solo alfanumericos y espacios simples."""
+        text = unicodedata.normalize('NFD', text.lower())
+        text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+        text = re.sub(r'[^a-z0-9]+', ' ', text)
+        return text.strip()
+
+    def _shingles(self, normalized: str) -> List[str]:
+        words = normalized.split()
+        if len(words) <= self.shingle_size:
+            return [' '.join(words)] if words else []
+        return [
+            ' '.join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        ]
+
+    def simhash(self, normalized: str) -> int:
+        """Calcula el SimHash de 64 bits de un texto normalizado."""
+        weights = [0] * SIMHASH_BITS
+        for shingle in self._shingles(normalized):
+            h = int.from_bytes(
+                hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'
+            )
+            for bit in range(SIMHASH_BITS):
+                weights[bit] += 1 if (h >> bit) & 1 else -1
+
+        value = 0
+        for bit, weight in enumerate(weights):
+            if weight > 0:
+                value |= 1 << bit
+        return value
+
+    @staticmethod
+    def _bands(value: int) -> Tuple[int, ...]:
+        mask = (1 << SIMHASH_BAND_BITS) - 1
+        return tuple((value >> (i * SIMHASH_BAND_BITS)) & mask for i in range(SIMHASH_BANDS))
+
+    def _is_near(self, a: int, b: int) -> bool:
+        return bin(a ^ b).count('1') <= self.hamming_threshold
+
+    def _signature(self, index: int, chunk: CVChunk) -> _Signature:
+        normalized = self.normalize(chunk.text)
+        value = self.simhash(normalized)
+        return _Signature(
+            index=index,
+            exact=hashlib.sha1(normalized.encode('utf-8')).hexdigest(),
+            simhash=value,
+            bands=self._bands(value)
+        )
+
+    def _find_boilerplate(
+        self, chunks: List[CVChunk], signatures: List[_Signature]
+    ) -> Dict[int, int]:
+        """
+        Retorna los indices de chunks cuyo cluster de casi-duplicados
+        aparece en al menos `boilerplate_min_cvs` CVs distintos, con el
+        numero de CVs de su cluster.
+        """
+        if self.boilerplate_min_cvs <= 1:
+            return {}
+
+        # Union-find sobre los chunks que comparten alguna banda y son cercanos
+        parent = list(range(len(signatures)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for sig in signatures:
+            for band_idx, band in enumerate(sig.bands):
+                buckets.setdefault((band_idx, band), []).append(sig.index)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    if chunks[i].cv_filename == chunks[j].cv_filename:
+                        continue
+                    if self._is_near(signatures[i].simhash, signatures[j].simhash):
+                        root_i, root_j = find(i), find(j)
+                        if root_i != root_j:
+                            parent[root_j] = root_i
+
+        cvs_by_cluster: Dict[int, Set[str]] = {}
+        for sig in signatures:
+            cvs_by_cluster.setdefault(find(sig.index), set()).add(chunks[sig.index].cv_filename)
+
+        spread = {sig.index: len(cvs_by_cluster[find(sig.index)]) for sig in signatures}
+        return {i: n for i, n in spread.items() if n >= self.boilerplate_min_cvs}
+
+    @staticmethod
+    def _keep_one_per_cv(chunks: List[CVChunk], boilerplate: Dict[int, int]) -> None:
+        """
+        Saca del boilerplate el chunk mas distintivo (cluster en menos CVs,
+        luego el mas largo) de cada CV que quedaria sin ningun chunk.
+        """
+        indices_by_cv: Dict[str, List[int]] = {}
+        for i, chunk in enumerate(chunks):
+            indices_by_cv.setdefault(chunk.cv_filename, []).append(i)
+
+        for indices in indices_by_cv.values():
+            if all(i in boilerplate for i in indices):
+                keep = min(indices, key=lambda i: (boilerplate[i], -len(chunks[i].text), i))
+                del boilerplate[keep]
+
+    def deduplicate(self, chunks: List[CVChunk]) -> Tuple[List[CVChunk], DedupReport]:
+        """
+        Elimina chunks redundantes manteniendo el orden original.
+
+        Args:
+            chunks: Chunks generados por CVProcessor.process_all
+
+        Returns:
+            Tupla (chunks_a_indexar, reporte)
+        """
+        report = DedupReport(total_chunks=len(chunks))
+        if not chunks:
+            return [], report
+
+        signatures = [self._signature(i, c) for i, c in enumerate(chunks)]
+
+        # Boilerplate primero: se elimina en todos los CVs que lo contienen,
+        # salvo el chunk que cada CV necesita para seguir apareciendo en busquedas
+        boilerplate = self._find_boilerplate(chunks, signatures)
+        self._keep_one_per_cv(chunks, boilerplate)
+
+        kept: List[CVChunk] = []
+        seen_exact: Dict[str, Set[str]] = {}       # cv_filename -> hashes exactos
+        seen_simhash: Dict[str, List[int]] = {}    # cv_filename -> simhashes
+
+        for sig in signatures:
+            chunk = chunks[sig.index]
+            cv = chunk.cv_filename
+
+            if sig.index in boilerplate:
+                report.boilerplate += 1
+                report.chars_saved += len(chunk.text)
+                continue
+
+            exact_hashes = seen_exact.setdefault(cv, set())
+            if sig.exact in exact_hashes:
+                report.exact_duplicates += 1
+                report.chars_saved += len(chunk.text)
+                continue
+
+            simhashes = seen_simhash.setdefault(cv, [])
+            if any(self._is_near(sig.simhash, other) for other in simhashes):
+                report.near_duplicates += 1
+                report.chars_saved += len(chunk.text)
+                continue
+
+            exact_hashes.add(sig.exact)
+            simhashes.append(sig.simhash)
+            kept.append(chunk)
+
+        report.kept_chunks = len(kept)
+
+        logger.info(
+            f"Dedup CVs: {report.total_chunks} -> {report.kept_chunks} chunks "
+            f"(exactos: {report.exact_duplicates}, casi: {report.near_duplicates}, "
+            f"boilerplate: {report.boilerplate}, ahorro: {report.savings_pct}%)"
+        )
+
+        return kept, report
@@ -69,8 +69,9 @@ class CVMatcher:
     
     def _prepare_census_data(self):
         """Prepara datos del Census para matching."""
-        colaborador_col = self._find_column(["Colaborador", "Nome"])
-        matricula_col = self._find_column(["Matrícula", "Matricula"])
+        # Acepta tanto el Census crudo como el esquema canonico del server
+        colaborador_col = self._find_column(["nombre", "Colaborador", "Nome"])
+        matricula_col = self._find_column(["matricula", "Matrícula", "Matricula"])
         
         if not colaborador_col or not matricula_col:
             raise ValueError("No se encontraron columnas de nombre/matricula en Census")
@@ -3,14 +3,18 @@ CV Processor - Extrae texto de CVs (PDF/DOCX) y los prepara para indexacion.
 
 Proceso:
 1. Lee el archivo (PDF o DOCX)
-2. Extrae el texto por pagina
+2. Extrae el texto por pagina (o lo lee del cache Parquet por hash del archivo)
 3. Divide el texto en chunks con overlap para busqueda semantica
+   - modo "chars": ventanas de caracteres (chunk_size / overlap)
+   - modo "tokens": oraciones empaquetadas hasta el limite de secuencia
+     del modelo de embeddings, con overlap en tokens
 4. Retorna lista de chunks listos para vectorizar
 """
 
 import re
+import hashlib
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict
+from typing import List, Optional, Tuple, Dict, Any
 from dataclasses import dataclass
 import logging
 
@@ -51,6 +55,123 @@ class CVChunk:
     cv_filename: str
 
 
+class CVTextCache:
+    """
+    Cache persistente del texto crudo extraido por pagina.
+    
+    Se guarda en Parquet con clave sha256 del archivo, antes de clean_text y
+    del chunking, asi cambiar esos parametros no obliga a re-parsear PDFs.
+    
+    Columnas: sha256, extractor, page_num, text
+    """
+    
+    # Subir si cambia la forma de extraer texto (invalida el cache)
+    EXTRACTOR_VERSION = "pymupdf-text-v1|docx-paragraphs-tables-v1"
+    
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Archivo Parquet del cache (se crea si no existe)
+        """
+        self.path = Path(path)
+        self.pages: Dict[str, List[Tuple[int, str]]] = {}
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+    
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            import pandas as pd
+            df = pd.read_parquet(self.path)
+        except Exception as e:
+            logger.warning(f"No se pudo leer cache de texto {self.path}: {e}")
+            return
+        
+        df = df[df["extractor"] == self.EXTRACTOR_VERSION]
+        for sha, page_num, text in zip(df["sha256"], df["page_num"], df["text"]):
+            self.pages.setdefault(sha, []).append((int(page_num), text))
+        for pages in self.pages.values():
+            pages.sort()
+        logger.info(f"Cache de texto: {len(self.pages)} CVs en {self.path.name}")
+    
+    @staticmethod
+    def file_hash(filepath: Path) -> str:
+        digest = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def get(self, sha: str) -> Optional[List[Tuple[int, str]]]:
+        pages = self.pages.get(sha)
+        if pages is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return pages
+    
+    def put(self, sha: str, pages: List[Tuple[int, str]]):
+        self.pages[sha] = list(pages)
+        self.dirty = True
+    
+    def save(self):
+        """Escribe el cache si hubo cambios."""
+        if not self.dirty:
+            return
+        import pandas as pd
+        rows = [
+            {"sha256": sha, "extractor": self.EXTRACTOR_VERSION, "page_num": page_num, "text": text}
+            for sha, pages in self.pages.items()
+            for page_num, text in pages
+        ]
+        df = pd.DataFrame(rows, columns=["sha256", "extractor", "page_num", "text"])
+        tmp = self.path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        tmp.replace(self.path)
+        self.dirty = False
+        logger.info(f"Cache de texto guardado: {len(self.pages)} CVs ({self.hits} hits, {self.misses} misses)")
+
+
+@dataclass
+class TruncationStats:
+    """
+    Chunks que exceden el limite de secuencia del modelo (se truncan al embeber).
+    
+    Attributes:
+        chunks: Chunks evaluados
+        truncated: Chunks con mas tokens que el limite
+        tokens: Tokens totales (sin especiales)
+        tokens_lost: Tokens que el modelo descarta por truncamiento
+    """
+    chunks: int = 0
+    truncated: int = 0
+    tokens: int = 0
+    tokens_lost: int = 0
+    
+    def add(self, n_tokens: int, limit: int):
+        self.chunks += 1
+        self.tokens += n_tokens
+        if n_tokens > limit:
+            self.truncated += 1
+            self.tokens_lost += n_tokens - limit
+    
+    @property
+    def rate(self) -> float:
+        return round(100 * self.truncated / self.chunks, 1) if self.chunks else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "chunks": self.chunks,
+            "truncados": self.truncated,
+            "tasa_truncamiento_pct": self.rate,
+            "tokens": self.tokens,
+            "tokens_perdidos": self.tokens_lost
+        }
+
+
 class CVProcessor:
     """
     Procesa CVs y los prepara para busqueda semantica.
@@ -58,26 +179,68 @@ class CVProcessor:
     Caracteristicas:
     - Soporta PDF y DOCX
     - Chunkeriza con overlap para mejor contexto
+    - Modo por tokens alineado al limite de secuencia del modelo
     - Limpia y normaliza el texto
     """
     
+    # Cortes de oracion/seccion para el modo por tokens
+    SENTENCE_SPLIT = re.compile(r'(?<=[.!?;:])\s+|\n+')
+    
     def __init__(
         self, 
         cvs_folder: Path, 
         chunk_size: int = 500, 
-        overlap: int = 100
+        overlap: int = 100,
+        tokenizer=None,
+        max_tokens: Optional[int] = None,
+        token_overlap: int = 32,
+        report_truncation: bool = False,
+        truncation_sample_pages: int = 200,
+        text_cache: Optional[CVTextCache] = None
     ):
         """
         Inicializa el procesador.
         
         Args:
             cvs_folder: Carpeta donde estan los CVs
-            chunk_size: Tamano maximo de cada chunk en caracteres
-            overlap: Caracteres de overlap entre chunks consecutivos
+            chunk_size: Tamano maximo de cada chunk en caracteres (modo "chars")
+            overlap: Caracteres de overlap entre chunks consecutivos (modo "chars")
+            tokenizer: Tokenizer del modelo de embeddings; si se pasa junto con
+                max_tokens se usa el modo "tokens"
+            max_tokens: Limite de secuencia del modelo (incluye tokens especiales)
+            token_overlap: Tokens de overlap entre chunks consecutivos (modo "tokens")
+            report_truncation: Medir truncamiento del modo "chars" vs el usado
+                (re-chunkea y tokeniza de nuevo las paginas medidas)
+            truncation_sample_pages: Maximo de paginas medidas para el reporte
+            text_cache: Cache de texto extraido; process_cv lo usa si esta presente
         """
         self.cvs_folder = cvs_folder
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.token_overlap = token_overlap
+        self.report_truncation = report_truncation and tokenizer is not None and bool(max_tokens)
+        self.truncation_sample_pages = truncation_sample_pages
+        self.truncation_pages = 0
+        self.truncation_before = TruncationStats()
+        self.truncation_after = TruncationStats()
+        self.text_cache = text_cache
+    
+    @property
+    def mode(self) -> str:
+        return "tokens" if self.tokenizer is not None and self.max_tokens else "chars"
+    
+    @property
+    def token_budget(self) -> int:
+        """Tokens de contenido por chunk ([CLS]/[SEP] u otros especiales aparte)."""
+        special = self.tokenizer.num_special_tokens_to_add() if hasattr(
+            self.tokenizer, "num_special_tokens_to_add"
+        ) else 2
+        return max(1, self.max_tokens - special)
+    
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer.tokenize(text))
     
     def extract_text_from_pdf(self, filepath: Path) -> List[Tuple[int, str]]:
         """
@@ -242,27 +405,134 @@ class CVProcessor:
         
         return chunks
     
-    def process_cv(self, filepath: Path, matricula: str) -> List[CVChunk]:
+    def chunk_text_tokens(self, text: str) -> List[str]:
         """
-        Procesa un CV completo y retorna sus chunks.
+        Divide el texto en chunks que caben exactamente en el limite de
+        secuencia del modelo.
+        
+        Empaqueta oraciones/lineas completas hasta el presupuesto de tokens.
+        Una oracion mas larga que el presupuesto se parte por palabras. Cada
+        chunk nuevo arranca con las ultimas oraciones del anterior que sumen
+        a lo sumo `token_overlap` tokens.
+        
+        Args:
+            text: Texto limpio (conserva saltos de linea como limites de seccion)
+            
+        Returns:
+            Lista de chunks
+        """
+        budget = self.token_budget
+        
+        # Unidades: oraciones/lineas; las que exceden el presupuesto se parten por palabras
+        units: List[Tuple[str, int]] = []
+        for sentence in self.SENTENCE_SPLIT.split(text):
+            sentence = re.sub(r'\s+', ' ', sentence).strip()
+            if not sentence:
+                continue
+            n_tokens = self.count_tokens(sentence)
+            if n_tokens <= budget:
+                units.append((sentence, n_tokens))
+                continue
+            
+            piece: List[str] = []
+            piece_tokens = 0
+            for word in sentence.split(' '):
+                word_tokens = self.count_tokens(' ' + word) if piece else self.count_tokens(word)
+                if piece and piece_tokens + word_tokens > budget:
+                    units.append((' '.join(piece), piece_tokens))
+                    piece, piece_tokens = [], 0
+                    word_tokens = self.count_tokens(word)
+                piece.append(word)
+                piece_tokens += word_tokens
+            if piece:
+                units.append((' '.join(piece), piece_tokens))
+        
+        chunks: List[str] = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        
+        for unit, n_tokens in units:
+            if current and current_tokens + n_tokens > budget:
+                chunks.append(' '.join(u for u, _ in current))
+                
+                # Overlap: ultimas unidades que quepan en token_overlap
+                carry: List[Tuple[str, int]] = []
+                carry_tokens = 0
+                for prev in reversed(current):
+                    if carry_tokens + prev[1] > self.token_overlap:
+                        break
+                    carry.insert(0, prev)
+                    carry_tokens += prev[1]
+                if carry_tokens + n_tokens > budget:
+                    carry, carry_tokens = [], 0
+                current, current_tokens = carry, carry_tokens
+            
+            current.append((unit, n_tokens))
+            current_tokens += n_tokens
+        
+        if current:
+            chunks.append(' '.join(u for u, _ in current))
+        
+        return chunks
+    
+    def truncation_report(self) -> Dict[str, Any]:
+        """Truncamiento por el limite del modelo: chunks por caracteres vs modo usado."""
+        if not self.report_truncation:
+            return {}
+        return {
+            "modo": self.mode,
+            "max_tokens": self.max_tokens,
+            "paginas_muestreadas": self.truncation_pages,
+            "antes_chars": self.truncation_before.to_dict(),
+            "despues": self.truncation_after.to_dict()
+        }
+    
+    def extract_pages(self, filepath: Path) -> List[Tuple[int, str]]:
+        """
+        Texto crudo por pagina, desde el cache si el archivo no cambio.
         
         Args:
             filepath: Ruta al archivo CV
-            matricula: Matricula del colaborador
             
         Returns:
-            Lista de CVChunk listos para indexar
+            Lista de tuplas (numero_pagina, texto)
         """
         ext = filepath.suffix.lower()
+        if ext not in ['.pdf', '.docx', '.doc']:
+            logger.warning(f"Formato no soportado: {filepath}")
+            return []
+        
+        sha = None
+        if self.text_cache is not None:
+            sha = self.text_cache.file_hash(filepath)
+            cached = self.text_cache.get(sha)
+            if cached is not None:
+                return cached
         
         # Extraer texto segun formato
         if ext == '.pdf':
             pages = self.extract_text_from_pdf(filepath)
-        elif ext in ['.docx', '.doc']:
-            pages = self.extract_text_from_docx(filepath)
         else:
-            logger.warning(f"Formato no soportado: {filepath}")
-            return []
+            pages = self.extract_text_from_docx(filepath)
+        
+        # No cachear fallos de extraccion (ej: dependencia no instalada)
+        if self.text_cache is not None and pages:
+            self.text_cache.put(sha, pages)
+        
+        return pages
+    
+    def process_cv(self, filepath: Path, matricula: str) -> List[CVChunk]:
+        """
+        Procesa un CV completo y retorna sus chunks.
+        
+        Args:
+            filepath: Ruta al archivo CV
+            matricula: Matricula del colaborador
+            
+        Returns:
+            Lista de CVChunk listos para indexar
+        """
+        pages = self.extract_pages(filepath)
         
         if not pages:
             logger.warning(f"No se extrajo texto de: {filepath}")
@@ -279,7 +549,20 @@ class CVProcessor:
                 continue
             
             # Dividir en chunks
-            for chunk_text in self.chunk_text(cleaned_text):
+            if self.mode == "tokens":
+                page_chunks = self.chunk_text_tokens(cleaned_text)
+            else:
+                page_chunks = self.chunk_text(cleaned_text)
+            
+            if self.report_truncation and self.truncation_pages < self.truncation_sample_pages:
+                self.truncation_pages += 1
+                budget = self.token_budget
+                for baseline in self.chunk_text(cleaned_text):
+                    self.truncation_before.add(self.count_tokens(baseline), budget)
+                for used in page_chunks:
+                    self.truncation_after.add(self.count_tokens(used), budget)
+            
+            for chunk_text in page_chunks:
                 if len(chunk_text) < 20:  # Ignorar chunks muy pequenos
                     continue
                     
@@ -338,6 +621,15 @@ class CVProcessor:
         
         logger.info(f"Procesados: {processed}, Omitidos: {skipped}, Total chunks: {len(all_chunks)}")
         
+        if self.text_cache is not None:
+            self.text_cache.save()
+        
+        if self.report_truncation:
+            logger.info(
+                f"Truncamiento (limite {self.max_tokens} tokens, {self.truncation_pages} paginas): "
+                f"chars {self.truncation_before.rate}% -> {self.mode} {self.truncation_after.rate}%"
+            )
+        
         return all_chunks
     
     def get_cv_path(self, filename: str) -> Optional[Path]:
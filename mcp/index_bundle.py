@@ -0,0 +1,286 @@
+"""
+Index Bundle - Empaqueta los indices construidos para arrancar contenedores rapido.
+
+Un bundle es un directorio versionado (opcionalmente comprimido en .tar.gz)
+que contiene todo lo necesario para servir busquedas sin reconstruir nada:
+
+    bundle/
+    ├── manifest.json          # version, modelo, checksums sha256 de cada archivo
+    ├── lancedb/               # tablas LanceDB (certs, skills, cvs, candidatos)
+    ├── hr/                    # snapshot columnar (Parquet) del esquema canonico
+    │   ├── certificaciones.parquet
+    │   └── census.parquet
+    ├── cvs/
+    │   ├── manifest.json      # archivos CV indexados (nombre, tamano, sha256, matricula)
+    │   └── mapping.json       # filename -> matricula
+    └── model/                 # modelo de embeddings (SentenceTransformer.save)
+
+El servidor lo usa en modo solo-lectura con INDEX_BUNDLE_PATH=/ruta/al/bundle.
+
+Uso:
+    python index_bundle.py export --out bundles/2024-06-01 [--archive]
+    python index_bundle.py import bundle.tar.gz --dest /srv/index_bundle
+    python index_bundle.py verify /srv/index_bundle
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+import tarfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+LANCEDB_DIR = "lancedb"
+HR_DIR = "hr"
+CVS_DIR = "cvs"
+MODEL_DIR = "model"
+
+HR_CERTS_FILE = f"{HR_DIR}/certificaciones.parquet"
+HR_CENSUS_FILE = f"{HR_DIR}/census.parquet"
+CV_MANIFEST_FILE = f"{CVS_DIR}/manifest.json"
+CV_MAPPING_FILE = f"{CVS_DIR}/mapping.json"
+
+
+class BundleError(Exception):
+    """Bundle invalido, incompleto o corrupto."""
+
+
+def sha256_file(path: Path, block_size: int = 1 << 20) -> str:
+    """Checksum sha256 de un archivo leido por bloques."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_cv_manifest(cv_folder: Path, mapping: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Lista los CVs indexados con su tamano y checksum.
+
+    Args:
+        cv_folder: Carpeta de CVs
+        mapping: Dict {filename: matricula}
+    """
+    entries = []
+    for filename, matricula in sorted(mapping.items()):
+        path = cv_folder / filename
+        if not path.exists():
+            continue
+        entries.append({
+            "archivo": filename,
+            "matricula": matricula,
+            "bytes": path.stat().st_size,
+            "sha256": sha256_file(path)
+        })
+    return entries
+
+
+def _checksums(root: Path) -> Dict[str, Dict[str, Any]]:
+    files = {}
+    for path in sorted(root.rglob("*")):
+        # Todo archivo excepto el propio manifest raiz
+        if path.is_file() and path != root / MANIFEST_FILE:
+            rel = path.relative_to(root).as_posix()
+            files[rel] = {"bytes": path.stat().st_size, "sha256": sha256_file(path)}
+    return files
+
+
+def write_bundle(
+    out_dir: Path,
+    lancedb_path: Path,
+    frames: Dict[str, Any],
+    cv_mapping: Dict[str, str],
+    cv_manifest: List[Dict[str, Any]],
+    model,
+    embedding_model: str,
+    extra: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Escribe un bundle completo en `out_dir`.
+
+    Args:
+        out_dir: Directorio destino (no debe existir o debe estar vacio)
+        lancedb_path: Directorio de LanceDB ya construido
+        frames: {"certificaciones": DataFrame, "census": DataFrame} en esquema canonico
+        cv_mapping: Dict {filename: matricula}
+        cv_manifest: Salida de build_cv_manifest
+        model: Instancia de SentenceTransformer cargada
+        embedding_model: Nombre del modelo (para validar compatibilidad)
+        extra: Metadatos adicionales para el manifest
+
+    Returns:
+        Manifest escrito
+    """
+    out_dir = Path(out_dir)
+    if out_dir.exists() and any(out_dir.iterdir()):
+        raise BundleError(f"El destino no esta vacio: {out_dir}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Copiando LanceDB: {lancedb_path}")
+    shutil.copytree(lancedb_path, out_dir / LANCEDB_DIR)
+
+    (out_dir / HR_DIR).mkdir()
+    frames["certificaciones"].to_parquet(out_dir / HR_CERTS_FILE, index=False)
+    frames["census"].to_parquet(out_dir / HR_CENSUS_FILE, index=False)
+
+    (out_dir / CVS_DIR).mkdir()
+    (out_dir / CV_MAPPING_FILE).write_text(
+        json.dumps(cv_mapping, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    (out_dir / CV_MANIFEST_FILE).write_text(
+        json.dumps(cv_manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    logger.info("Guardando modelo de embeddings")
+    model.save(str(out_dir / MODEL_DIR))
+
+    files = _checksums(out_dir)
+    fingerprint = hashlib.sha256(
+        "".join(f"{k}:{v['sha256']}" for k, v in files.items()).encode("utf-8")
+    ).hexdigest()[:12]
+    created_at = datetime.now(timezone.utc)
+
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": f"{created_at.strftime('%Y%m%d%H%M%S')}-{fingerprint}",
+        "created_at": created_at.isoformat(),
+        "embedding_model": embedding_model,
+        "files": files,
+        **(extra or {})
+    }
+    (out_dir / MANIFEST_FILE).write_text(
+        json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+    logger.info(f"Bundle {manifest['version']} escrito en {out_dir} ({len(files)} archivos)")
+    return manifest
+
+
+def read_manifest(bundle_dir: Path) -> Dict[str, Any]:
+    """Lee y valida el formato del manifest de un bundle."""
+    manifest_path = Path(bundle_dir) / MANIFEST_FILE
+    if not manifest_path.exists():
+        raise BundleError(f"No existe {manifest_path}")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise BundleError(
+            f"Formato de bundle {manifest.get('format_version')} no soportado "
+            f"(esperado {BUNDLE_FORMAT_VERSION})"
+        )
+    return manifest
+
+
+def verify_bundle(bundle_dir: Path, check_hashes: bool = True) -> Dict[str, Any]:
+    """
+    Verifica que todos los archivos del manifest existan con el tamano y
+    checksum esperados.
+
+    Returns:
+        Manifest del bundle
+
+    Raises:
+        BundleError: Si falta algun archivo o no coincide
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+
+    for rel, meta in manifest.get("files", {}).items():
+        path = bundle_dir / rel
+        if not path.is_file():
+            raise BundleError(f"Falta archivo del bundle: {rel}")
+        if path.stat().st_size != meta["bytes"]:
+            raise BundleError(f"Tamano incorrecto: {rel}")
+        if check_hashes and sha256_file(path) != meta["sha256"]:
+            raise BundleError(f"Checksum incorrecto: {rel}")
+
+    return manifest
+
+
+def archive_bundle(bundle_dir: Path, archive_path: Path) -> Path:
+    """Comprime un bundle en .tar.gz."""
+    bundle_dir = Path(bundle_dir)
+    with tarfile.open(archive_path, "w:gz") as tar:
+        tar.add(bundle_dir, arcname=".")
+    return Path(archive_path)
+
+
+def import_bundle(archive_path: Path, dest_dir: Path) -> Dict[str, Any]:
+    """
+    Extrae un bundle .tar.gz y lo verifica.
+
+    Args:
+        archive_path: Archivo .tar.gz generado por export --archive
+        dest_dir: Directorio destino (no debe existir o debe estar vacio)
+
+    Returns:
+        Manifest del bundle importado
+    """
+    dest_dir = Path(dest_dir)
+    if dest_dir.exists() and any(dest_dir.iterdir()):
+        raise BundleError(f"El destino no esta vacio: {dest_dir}")
+    dest_dir.mkdir(parents=True, exist_ok=True)
+
+    root = dest_dir.resolve()
+    with tarfile.open(archive_path, "r:gz") as tar:
+        for member in tar.getmembers():
+            target = (dest_dir / member.name).resolve()
+            if not target.is_relative_to(root):
+                raise BundleError(f"Ruta invalida en el archivo: {member.name}")
+            # Solo archivos regulares y directorios (sin links, dispositivos ni FIFOs)
+            if not (member.isfile() or member.isdir()):
+                raise BundleError(f"Tipo de entrada no permitido en el bundle: {member.name}")
+        tar.extractall(dest_dir, filter="data")
+
+    manifest = verify_bundle(dest_dir)
+    logger.info(f"Bundle {manifest['version']} importado en {dest_dir}")
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export/import de bundles de indices MCP")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="Construye indices y exporta un bundle")
+    p_export.add_argument("--out", required=True, type=Path, help="Directorio destino")
+    p_export.add_argument("--archive", action="store_true", help="Generar tambien <out>.tar.gz")
+
+    p_import = sub.add_parser("import", help="Extrae y verifica un bundle .tar.gz")
+    p_import.add_argument("archive", type=Path)
+    p_import.add_argument("--dest", required=True, type=Path)
+
+    p_verify = sub.add_parser("verify", help="Verifica checksums de un bundle")
+    p_verify.add_argument("bundle", type=Path)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    try:
+        if args.command == "export":
+            import server
+            manifest = server.export_index_bundle(args.out)
+            if args.archive:
+                archive = archive_bundle(args.out, args.out.with_name(args.out.name + ".tar.gz"))
+                logger.info(f"Archivo: {archive}")
+        elif args.command == "import":
+            manifest = import_bundle(args.archive, args.dest)
+        else:
+            manifest = verify_bundle(args.bundle)
+    except BundleError as e:
+        logger.error(str(e))
+        return 1
+
+    print(json.dumps({k: v for k, v in manifest.items() if k != "files"}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+"""
+Query Parser - Interprete local por reglas de consultas de talento en lenguaje natural.
+
+Proceso:
+1. Normaliza la consulta (minusculas, sin acentos) y la tokeniza
+2. Reconoce, por n-grama mas largo, cantidades (digitos o numerales ES/PT),
+   seniority, roles, tecnologias, paises y palabras de relleno
+3. Separa la consulta en segmentos de rol ("3 devs Java y 1 PM")
+4. Arma la misma estructura que produce Gemini (roles + resumen)
+5. Calcula una confianza = fraccion de tokens reconocidos
+
+El servidor usa el resultado si la confianza supera el umbral y deriva a
+Gemini en caso contrario.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple, Any
+import logging
+
+from term_index import TermIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANTIDAD = 3
+# Mismo rango que RequerimientoRol.cantidad en el servidor
+MIN_CANTIDAD = 1
+MAX_CANTIDAD = 20
+
+NUMERALES: Dict[str, int] = {
+    "un": 1, "uno": 1, "una": 1, "um": 1, "uma": 1, "dos": 2, "dois": 2, "duas": 2,
+    "tres": 3, "cuatro": 4, "quatro": 4, "cinco": 5, "seis": 6, "siete": 7, "sete": 7,
+    "ocho": 8, "oito": 8, "nueve": 9, "nove": 9, "diez": 10, "dez": 10,
+    "once": 11, "onze": 11, "doce": 12, "doze": 12, "quince": 15, "quinze": 15,
+    "veinte": 20, "vinte": 20
+}
+
+SENIORIDAD: Dict[str, str] = {
+    "junior": "Junior", "juniors": "Junior", "jr": "Junior", "trainee": "Junior",
+    "semi senior": "Semi Senior", "semisenior": "Semi Senior", "ssr": "Semi Senior", "pleno": "Semi Senior",
+    "senior": "Senior", "seniors": "Senior", "sr": "Senior",
+    "lead": "Lead", "tech lead": "Lead", "lider tecnico": "Lead", "principal": "Lead"
+}
+
+# rol_id -> (sinonimos ES/PT/EN, descripcion expandida para la busqueda)
+ROLES: Dict[str, Tuple[List[str], str]] = {
+    "Dev": (["desarrollador", "desarrolladores", "developer", "developers", "dev", "devs",
+             "programador", "programadores", "desenvolvedor", "desenvolvedores",
+             "ingeniero de software", "ingenieros de software", "engenheiro de software",
+             "engenheiros de software"], "Developer"),
+    "Backend": (["backend", "back end"], "Backend Developer API REST Microservicios"),
+    "Frontend": (["frontend", "front end"], "Frontend Developer JavaScript React Angular"),
+    "Fullstack": (["fullstack", "full stack"], "Full Stack Developer Backend Frontend"),
+    "Mobile": (["mobile", "movil", "moviles", "android", "ios"], "Mobile Developer Android iOS"),
+    "PM": (["pm", "pms", "project manager", "project managers", "jefe de proyecto",
+            "jefes de proyecto", "gerente de proyecto", "gerentes de proyecto",
+            "gerente de projeto", "gerentes de projeto", "lider de proyecto"],
+           "Project Manager PMP Scrum Agile"),
+    "Scrum_Master": (["scrum master", "scrum masters"], "Scrum Master Agile Scrum PSM"),
+    "PO": (["product owner", "product owners", "po"], "Product Owner Agile Scrum"),
+    "Arquitecto": (["arquitecto", "arquitectos", "arquiteto", "arquitetos", "architect",
+                    "architects"], "Arquitecto de Soluciones Architecture"),
+    "DBA": (["dba", "dbas", "administrador de base de datos", "administradores de base de datos",
+             "administrador de banco de dados"], "DBA Database Administrator SQL"),
+    "QA": (["qa", "qas", "tester", "testers", "analista de pruebas", "analistas de pruebas",
+            "analista de testes", "analistas de testes"], "QA Testing Automation Selenium"),
+    "DevOps": (["devops", "sre"], "DevOps CI CD Docker Kubernetes"),
+    "Data_Engineer": (["ingeniero de datos", "ingenieros de datos", "engenheiro de dados",
+                       "engenheiros de dados", "data engineer", "data engineers"],
+                      "Data Engineer ETL Spark SQL"),
+    "Data_Scientist": (["cientifico de datos", "cientificos de datos", "cientista de dados",
+                        "cientistas de dados", "data scientist", "data scientists"],
+                       "Data Scientist Machine Learning Python"),
+    "Analista": (["analista funcional", "analistas funcionales", "business analyst",
+                  "analista de negocio", "analista de negocios"],
+                 "Analista Funcional Business Analyst Requerimientos"),
+    "UX": (["ux", "ui", "disenador", "disenadores", "designer", "designers"], "UX UI Designer Figma"),
+    "Soporte": (["soporte", "suporte", "mesa de ayuda", "service desk"], "Soporte Tecnico Service Desk ITIL"),
+    "Consultor": (["consultor", "consultores", "consultora"], "Consultor"),
+}
+
+# Roles que por si solos no describen el perfil: necesitan una tecnologia
+ROLES_GENERICOS = {"Dev", "Consultor", "Arquitecto"}
+
+# tecnologia -> (sinonimos, descripcion expandida)
+TECNOLOGIAS: Dict[str, Tuple[List[str], str]] = {
+    "Java": (["java"], "Java Spring Boot"),
+    "Spring": (["spring", "spring boot"], "Java Spring Boot"),
+    "Python": (["python"], "Python"),
+    "NET": (["net", "dotnet", "c#"], ".NET C#"),
+    "JavaScript": (["javascript", "js"], "JavaScript"),
+    "TypeScript": (["typescript", "ts"], "TypeScript"),
+    "React": (["react", "reactjs"], "React JavaScript"),
+    "Angular": (["angular"], "Angular TypeScript"),
+    "Vue": (["vue", "vuejs"], "Vue JavaScript"),
+    "Node": (["node", "nodejs", "node js"], "Node.js JavaScript"),
+    "PHP": (["php"], "PHP"),
+    "Go": (["golang"], "Go Golang"),
+    "Kotlin": (["kotlin"], "Kotlin Android"),
+    "Swift": (["swift"], "Swift iOS"),
+    "Flutter": (["flutter"], "Flutter Dart"),
+    "SQL": (["sql"], "SQL"),
+    "Oracle": (["oracle"], "Oracle Database PL SQL"),
+    "SQL_Server": (["sql server"], "SQL Server Microsoft"),
+    "PostgreSQL": (["postgres", "postgresql"], "PostgreSQL"),
+    "MongoDB": (["mongodb", "mongo"], "MongoDB NoSQL"),
+    "AWS": (["aws", "amazon web services"], "AWS Amazon Web Services Cloud"),
+    "Azure": (["azure"], "Microsoft Azure Cloud"),
+    "GCP": (["gcp", "google cloud"], "Google Cloud Platform GCP"),
+    "Cloud": (["cloud", "nube", "nuvem"], "Cloud AWS Azure GCP"),
+    "SAP": (["sap"], "SAP"),
+    "Salesforce": (["salesforce"], "Salesforce CRM"),
+    "ServiceNow": (["servicenow"], "ServiceNow ITSM"),
+    "Kubernetes": (["kubernetes", "k8s"], "Kubernetes Docker Containers"),
+    "Docker": (["docker"], "Docker Containers"),
+    "Terraform": (["terraform"], "Terraform Infrastructure as Code"),
+    "Linux": (["linux"], "Linux"),
+    "Spark": (["spark"], "Apache Spark Big Data"),
+    "Power_BI": (["power bi", "powerbi"], "Power BI Business Intelligence"),
+    "Cobol": (["cobol", "mainframe"], "COBOL Mainframe"),
+    "Microservicios": (["microservicios", "microsservicos", "microservices"], "Microservicios API REST"),
+    "Selenium": (["selenium"], "Selenium Testing Automation"),
+    "PMP": (["pmp"], "PMP Project Management"),
+    "ITIL": (["itil"], "ITIL"),
+    "Scrum": (["scrum", "agile", "agil"], "Scrum Agile"),
+}
+
+# Relleno frecuente en ES/PT (reconocido, no aporta al perfil)
+STOPWORDS = set("""
+necesito necesitamos busco buscamos requiero requerimos quiero queremos dame denme
+preciso precisamos procuro procuramos quero gostaria solicito
+de del da do das para en em con com y e o ou a al el la los las os as que
+sepa sepan saiba saibam tenga tengan tenha tenham sea sean seja sejam
+experiencia experiencias conocimiento conocimientos conhecimento conhecimentos
+perfil perfiles perfis persona personas pessoa pessoas profesional profesionales
+profissional profissionais recurso recursos colaborador colaboradores
+proyecto projeto equipo equipe time nivel tipo por favor porfavor hola ola
+mas mais menos algun alguna alguno algunos algunas cerca na nas ao pelo pela
+certificacion certificaciones certificado certificados certificada certificacao certificacoes
+""".split())
+
+
+@dataclass
+class _Segmento:
+    cantidad: Optional[int] = None
+    seniority: Optional[str] = None
+    roles: List[str] = field(default_factory=list)
+    tecnologias: List[str] = field(default_factory=list)
+
+    @property
+    def util(self) -> bool:
+        return bool(self.roles or self.tecnologias)
+
+
+class RuleBasedInterpreter:
+    """
+    Interprete deterministico de consultas de talento.
+
+    Caracteristicas:
+    - Vocabularios de roles, tecnologias y seniority en ES/PT/EN
+    - Numerales en palabras ("tres", "dois") ademas de digitos
+    - Paises resueltos contra la lista de paises disponibles
+    - Metricas de aceptacion / derivacion a Gemini
+    """
+
+    def __init__(self, min_confidence: float = 0.8):
+        """
+        Inicializa el interprete.
+
+        Args:
+            min_confidence: Confianza minima (0-1) para no derivar a Gemini
+        """
+        self.min_confidence = min_confidence
+        self.vocab: Dict[str, Tuple[str, Any]] = {}
+        for palabra, valor in NUMERALES.items():
+            self._add(palabra, "numero", valor)
+        for palabra, valor in SENIORIDAD.items():
+            self._add(palabra, "seniority", valor)
+        for rol_id, (sinonimos, _) in ROLES.items():
+            for s in sinonimos:
+                self._add(s, "rol", rol_id)
+        for tech_id, (sinonimos, _) in TECNOLOGIAS.items():
+            for s in sinonimos:
+                self._add(s, "tech", tech_id)
+        for palabra in STOPWORDS:
+            self.vocab.setdefault(palabra, ("stop", None))
+        self.max_words = max(len(k.split()) for k in self.vocab)
+
+        self._lock = threading.Lock()
+        self.metricas: Dict[str, int] = {"reglas": 0, "gemini": 0, "fallback": 0}
+
+    def _add(self, frase: str, tipo: str, valor: Any):
+        # El primer vocabulario que registra una frase gana ("dos" es numeral)
+        self.vocab.setdefault(TermIndex.normalize(frase), (tipo, valor))
+
+    @staticmethod
+    def _paises(countries: List[str]) -> Dict[str, str]:
+        return {TermIndex.normalize(c): c for c in countries if TermIndex.normalize(c)}
+
+    def signals(
+        self, mensaje: str, countries: List[str]
+    ) -> Tuple[List[int], List[str], List[str], List[str]]:
+        """
+        Cantidades, seniority, paises y perfiles (roles y tecnologias
+        reconocidos) mencionados, sin armar segmentos.
+        """
+        _, tagged = self._tag(mensaje, countries)
+        numeros = sorted({v for t, v in tagged if t == "numero"})
+        seniority = sorted({v for t, v in tagged if t == "seniority"})
+        paises = sorted({v for t, v in tagged if t == "pais"})
+        perfiles = sorted({f"{t}:{v}" for t, v in tagged if t in ("rol", "tech")})
+        return numeros, seniority, paises, perfiles
+
+    def _tag(self, mensaje: str, countries: List[str]) -> Tuple[int, List[Tuple[str, Any]]]:
+        """
+        Etiqueta la consulta por n-grama mas largo.
+
+        Returns:
+            (total_tokens, [(tipo, valor), ...]) con tipo "desconocido" para
+            tokens sin vocabulario
+        """
+        tokens = TermIndex.normalize(mensaje).split()
+        paises = self._paises(countries)
+        max_words = max([self.max_words] + [len(p.split()) for p in paises])
+
+        tagged: List[Tuple[str, Any]] = []
+        i = 0
+        while i < len(tokens):
+            for size in range(min(max_words, len(tokens) - i), 0, -1):
+                frase = " ".join(tokens[i:i + size])
+                if frase in paises:
+                    tagged.append(("pais", paises[frase]))
+                elif frase in self.vocab:
+                    tagged.append(self.vocab[frase])
+                elif size == 1 and frase.isdigit():
+                    tagged.append(("numero", int(frase)))
+                else:
+                    continue
+                tagged.extend([("cont", None)] * (size - 1))
+                i += size
+                break
+            else:
+                tagged.append(("desconocido", tokens[i]))
+                i += 1
+        return len(tokens), tagged
+
+    def interpret(self, mensaje: str, countries: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Interpreta la consulta.
+
+        Returns:
+            Dict con la forma de la interpretacion de Gemini mas "confianza"
+            y "fuente": "reglas", o None si no se reconocio ningun rol
+        """
+        total, tagged = self._tag(mensaje, countries)
+        if not total:
+            return None
+
+        segmentos: List[_Segmento] = [_Segmento()]
+        paises: List[str] = []
+        desconocidos = 0
+
+        previo = None
+        for tipo, valor in tagged:
+            if tipo == "cont":
+                continue
+            actual = segmentos[-1]
+            if tipo == "numero":
+                # Una cantidad despues de un rol abre un nuevo segmento
+                if actual.util or actual.cantidad is not None:
+                    segmentos.append(_Segmento(cantidad=valor))
+                else:
+                    actual.cantidad = valor
+            elif tipo == "seniority":
+                actual.seniority = valor
+            elif tipo == "rol":
+                # Roles contiguos describen un mismo perfil ("frontend developer");
+                # separados por relleno ("pm y arquitecto") son perfiles distintos
+                if actual.roles and previo not in ("rol", "tech", "seniority"):
+                    segmentos.append(_Segmento(roles=[valor]))
+                elif valor not in actual.roles:
+                    actual.roles.append(valor)
+            elif tipo == "tech":
+                if valor not in actual.tecnologias:
+                    actual.tecnologias.append(valor)
+            elif tipo == "pais":
+                if valor not in paises:
+                    paises.append(valor)
+            elif tipo == "desconocido":
+                desconocidos += 1
+            previo = tipo
+
+        segmentos = [s for s in segmentos if s.util]
+        if not segmentos:
+            return None
+
+        confianza = (total - desconocidos) / total
+        if len(paises) > 1:
+            confianza *= 0.8
+        # Un rol generico sin tecnologia ("necesito 3 devs") es ambiguo
+        if any(not s.tecnologias and set(s.roles) <= ROLES_GENERICOS for s in segmentos):
+            confianza *= 0.7
+
+        pais = paises[0] if paises else None
+        roles = []
+        usados: Dict[str, int] = {}
+        for seg in segmentos:
+            partes = [ROLES[r][1] for r in seg.roles] + [TECNOLOGIAS[t][1] for t in seg.tecnologias]
+            if seg.seniority:
+                partes.append(seg.seniority)
+            descripcion = " ".join(dict.fromkeys(" ".join(partes).split()))
+
+            rol_id = "_".join(seg.roles[:1] + seg.tecnologias[:2] + ([seg.seniority.replace(" ", "_")] if seg.seniority else []))
+            usados[rol_id] = usados.get(rol_id, 0) + 1
+            if usados[rol_id] > 1:
+                rol_id = f"{rol_id}_{usados[rol_id]}"
+
+            cantidad = DEFAULT_CANTIDAD if seg.cantidad is None else seg.cantidad
+            roles.append({
+                "rol_id": rol_id,
+                "descripcion": descripcion,
+                "pais": pais,
+                "cantidad": max(MIN_CANTIDAD, min(MAX_CANTIDAD, cantidad))
+            })
+
+        resumen = ", ".join(f"{r['cantidad']} x {r['descripcion']}" for r in roles)
+        if pais:
+            resumen += f" en {pais}"
+
+        return {
+            "roles": roles,
+            "resumen": resumen,
+            "confianza": round(confianza, 2),
+            "fuente": "reglas"
+        }
+
+    def aceptable(self, interpretacion: Optional[Dict[str, Any]]) -> bool:
+        return bool(interpretacion) and interpretacion["confianza"] >= self.min_confidence
+
+    def record(self, fuente: str):
+        """Registra que interprete resolvio una consulta (reglas/gemini/fallback)."""
+        with self._lock:
+            self.metricas[fuente] = self.metricas.get(fuente, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.metricas.values())
+        return {
+            **self.metricas,
+            "total": total,
+            "derivacion_pct": round(100 * (total - self.metricas["reglas"]) / total, 1) if total else 0.0,
+            "confianza_minima": self.min_confidence
+        }
@@ -0,0 +1,121 @@
+"""
+Semantic Cache - Cache por similitud de embeddings para consultas en lenguaje natural.
+
+Proceso:
+1. La consulta se embebe con el modelo ya cargado (vector normalizado)
+2. Se busca la entrada vigente (TTL) mas similar con el mismo `guard`
+3. Si la similitud coseno supera el umbral, se reutiliza su valor
+4. Si no, el llamador calcula el valor y lo guarda con `put`
+
+El `guard` es una clave exacta que debe coincidir ademas de la similitud:
+dos frases casi identicas ("3 devs Java en Chile" / "5 devs Java en Peru")
+tienen embeddings muy parecidos pero no deben compartir resultado.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    guard: str
+    value: Any
+    created: float
+
+
+class SemanticCache:
+    """
+    Cache LRU con busqueda por similitud coseno.
+
+    Caracteristicas:
+    - Umbral de similitud y TTL configurables
+    - Busqueda exhaustiva vectorizada (el tamano maximo es acotado)
+    - Thread-safe (los endpoints sincronos corren en el threadpool)
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 3600, max_entries: int = 1000):
+        """
+        Inicializa el cache.
+
+        Args:
+            threshold: Similitud coseno minima (0-1) para considerar un hit
+            ttl_seconds: Vigencia de cada entrada
+            max_entries: Entradas maximas (se descartan las menos usadas)
+        """
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, e in self._entries.items() if now - e.created > self.ttl_seconds]
+        for k in expired:
+            del self._entries[k]
+
+    def get(self, vector, guard: str = "") -> Optional[Tuple[Any, float]]:
+        """
+        Busca la entrada mas similar.
+
+        Returns:
+            (valor, similitud) si hay hit, None si no
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            keys = [k for k, e in self._entries.items() if e.guard == guard]
+            if keys:
+                matrix = np.stack([self._entries[k].vector for k in keys])
+                sims = matrix @ query
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    key = keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key].value, float(sims[best])
+            self.misses += 1
+            return None
+
+    def put(self, vector, value: Any, guard: str = ""):
+        """Guarda un valor asociado al embedding de la consulta."""
+        with self._lock:
+            self._entries[self._next_id] = _Entry(
+                vector=self._normalize(vector), guard=guard, value=value, created=time.monotonic()
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vacia el cache (p.ej. al reindexar)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entradas": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_pct": round(100 * self.hits / total, 1) if total else 0.0,
+            "umbral": self.threshold,
+            "ttl_segundos": self.ttl_seconds
+        }
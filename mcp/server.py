@@ -14,6 +14,7 @@ Endpoints:
 - GET  /docs             - Documentacion Swagger
 - POST /search           - Busqueda simple (certs + skills + CVs)
 - POST /batch-search     - Busqueda por roles
+- POST /batch-search/stream - Busqueda por roles (NDJSON, un registro por rol)
 - POST /chat             - Consulta en lenguaje natural (Gemini)
 - GET  /countries        - Paises disponibles
 - GET  /stats            - Estadisticas
@@ -32,21 +33,43 @@ import json
 import logging
 import re
 import math
+import copy
+import time
+import uuid
+import base64
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Literal, Set
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+import numpy as np
 import pandas as pd
 import lancedb
 from sentence_transformers import SentenceTransformer
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.openapi.utils import get_openapi
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import uvicorn
 import httpx
 
+# Serializacion rapida (opcional): orjson y compresion brotli
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from brotli_asgi import BrotliMiddleware
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
 # Cargar variables de entorno
 load_dotenv()
 # Tambien buscar en directorio padre
@@ -66,6 +89,16 @@ RRHH_FILE = BASE_DIR / "Census.xlsx"
 LANCEDB_PATH = BASE_DIR / "lancedb_data"
 TABLE_CERTS = "certificaciones"
 TABLE_SKILLS = "skills"
+TABLE_CANDIDATES = "candidatos"
+
+# Shortlist por candidato (tabla agregada) antes de buscar evidencia por fila
+CANDIDATE_SHORTLIST_ENABLED = os.getenv("CANDIDATE_SHORTLIST_ENABLED", "true").lower() == "true"
+CANDIDATE_SHORTLIST_FACTOR = int(os.getenv("CANDIDATE_SHORTLIST_FACTOR", "10"))
+CANDIDATE_SHORTLIST_MIN = int(os.getenv("CANDIDATE_SHORTLIST_MIN", "200"))
+
+# Indice invertido de nombres exactos de skills/certificaciones
+EXACT_FAST_PATH_ENABLED = os.getenv("EXACT_FAST_PATH_ENABLED", "true").lower() == "true"
+EXACT_MATCH_BOOST = float(os.getenv("EXACT_MATCH_BOOST", "20"))
 
 # ============================================
 # CONFIGURACION CVs (v4.0)
@@ -74,6 +107,48 @@ CV_FOLDER = BASE_DIR / "cvs"
 CV_MAPPING_FILE = BASE_DIR / "cv_mapping.xlsx"
 CV_MAPPING_REVIEW_FILE = BASE_DIR / "cv_mapping_review.xlsx"
 TABLE_CVS = "cvs"
+# Texto crudo extraido de CVs (Parquet por sha256), independiente del chunking
+CV_TEXT_CACHE_FILE = Path(os.getenv("CV_TEXT_CACHE_FILE", str(BASE_DIR / "cv_text_cache.parquet")))
+
+# Chunking de CVs: "tokens" (alineado al limite de secuencia del modelo) o "chars"
+CV_CHUNK_MODE = os.getenv("CV_CHUNK_MODE", "tokens").lower()
+CV_CHUNK_OVERLAP_TOKENS = int(os.getenv("CV_CHUNK_OVERLAP_TOKENS", "32"))
+# Reporte de truncamiento (chars vs tokens): re-chunkea una muestra de paginas
+CV_TRUNCATION_REPORT = os.getenv("CV_TRUNCATION_REPORT", "false").lower() == "true"
+CV_TRUNCATION_SAMPLE_PAGES = int(os.getenv("CV_TRUNCATION_SAMPLE_PAGES", "200"))
+
+# Deduplicacion de chunks de CVs antes de embeber
+CV_DEDUP_ENABLED = os.getenv("CV_DEDUP_ENABLED", "true").lower() == "true"
+CV_DEDUP_HAMMING_THRESHOLD = int(os.getenv("CV_DEDUP_HAMMING_THRESHOLD", "3"))
+CV_BOILERPLATE_MIN_CVS = int(os.getenv("CV_BOILERPLATE_MIN_CVS", "5"))
+
+# Paginacion por cursor en /search: ranking completo cacheado por consulta
+SEARCH_CURSOR_POOL = int(os.getenv("SEARCH_CURSOR_POOL", "200"))
+SEARCH_CURSOR_TTL = float(os.getenv("SEARCH_CURSOR_TTL", "600"))
+SEARCH_CURSOR_MAX_ENTRIES = int(os.getenv("SEARCH_CURSOR_MAX_ENTRIES", "200"))
+
+# Cache semantico de /chat: reutiliza la interpretacion (y la respuesta) de
+# una consulta reciente suficientemente similar
+CHAT_CACHE_ENABLED = os.getenv("CHAT_CACHE_ENABLED", "true").lower() == "true"
+CHAT_CACHE_THRESHOLD = float(os.getenv("CHAT_CACHE_THRESHOLD", "0.92"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "1000"))
+CHAT_CACHE_RESPONSES = os.getenv("CHAT_CACHE_RESPONSES", "true").lower() == "true"
+
+# Interprete local por reglas de /chat: si su confianza alcanza el umbral no
+# se llama a Gemini para interpretar (sin GOOGLE_API_KEY se usa siempre)
+CHAT_RULES_ENABLED = os.getenv("CHAT_RULES_ENABLED", "true").lower() == "true"
+CHAT_RULES_MIN_CONFIDENCE = float(os.getenv("CHAT_RULES_MIN_CONFIDENCE", "0.8"))
+
+# Salida de las tools MCP (stdio): "compacto" (evidencia rankeada dentro de
+# un presupuesto de tokens) o "completo" (perfiles completos)
+MCP_TOOL_DETALLE = os.getenv("MCP_TOOL_DETALLE", "compacto").lower()
+MCP_TOOL_TOKEN_BUDGET = int(os.getenv("MCP_TOOL_TOKEN_BUDGET", "1500"))
+
+# Bundle de indices prebuilt (solo lectura). Si se define, el servidor no
+# reconstruye nada al arrancar: ver index_bundle.py
+INDEX_BUNDLE_PATH = os.getenv("INDEX_BUNDLE_PATH", "")
+INDEX_BUNDLE_VERIFY = os.getenv("INDEX_BUNDLE_VERIFY", "true").lower() == "true"
 
 # Modelo de embeddings multilingue
 EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
@@ -134,11 +209,51 @@ class PerfilCompleto(BaseModel):
     cv_filename: Optional[str] = Field(None, description="Nombre del archivo CV")
 
 
-class TalentSearchRequest(BaseModel):
+# Campos de PerfilCompleto que siempre se retornan (requeridos)
+PERFIL_CAMPOS_BASE = {"matricula", "nombre", "email", "cargo", "match_principal", "score"}
+# Campos proyectables (los pesados implican trabajo de enriquecimiento)
+PERFIL_CAMPOS_OPCIONALES = {"pais", "certificaciones", "skills", "lider", "cv_matches", "tiene_cv", "cv_filename"}
+PERFIL_VISTAS: Dict[str, Set[str]] = {
+    "full": PERFIL_CAMPOS_OPCIONALES,
+    "summary": {"pais", "tiene_cv"},
+}
+
+
+class ProyeccionPerfil(BaseModel):
+    """Opciones de proyeccion de los perfiles retornados."""
+    vista: Literal["full", "summary"] = Field(
+        "full", description="full: perfil completo | summary: solo datos basicos, match y score"
+    )
+    campos: Optional[List[str]] = Field(
+        None, description=f"Campos opcionales a incluir (reemplaza a vista): {sorted(PERFIL_CAMPOS_OPCIONALES)}"
+    )
+    max_certificaciones: Optional[int] = Field(None, ge=0, description="Maximo de certificaciones por candidato")
+    max_skills: Optional[int] = Field(None, ge=0, description="Maximo de skills por candidato")
+    
+    @field_validator("campos")
+    @classmethod
+    def validar_campos(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        if v is None:
+            return v
+        invalidos = set(v) - PERFIL_CAMPOS_OPCIONALES - PERFIL_CAMPOS_BASE
+        if invalidos:
+            raise ValueError(f"Campos no validos: {sorted(invalidos)}")
+        return v
+    
+    def campos_perfil(self) -> Set[str]:
+        """Campos opcionales de PerfilCompleto a poblar."""
+        if self.campos is not None:
+            return set(self.campos) & PERFIL_CAMPOS_OPCIONALES
+        return PERFIL_VISTAS[self.vista]
+
+
+class TalentSearchRequest(ProyeccionPerfil):
     """Request para busqueda de talento."""
     consulta: str = Field(..., description="Descripcion del perfil buscado")
-    limit: int = Field(10, ge=1, le=50, description="Maximo de resultados")
+    limit: int = Field(10, ge=1, le=50, description="Maximo de resultados (tamano de pagina si se pagina)")
     pais: Optional[str] = Field(None, description="Filtrar por pais")
+    paginar: bool = Field(False, description="Cachear el ranking completo y retornar siguiente_cursor")
+    cursor: Optional[str] = Field(None, description="Cursor opaco de una respuesta anterior (misma consulta y pais)")
 
 
 class TalentSearchResponse(BaseModel):
@@ -147,6 +262,8 @@ class TalentSearchResponse(BaseModel):
     mensaje: str
     candidatos: List[PerfilCompleto]
     total: int
+    siguiente_cursor: Optional[str] = Field(None, description="Cursor de la pagina siguiente (null si no hay mas)")
+    total_ranking: Optional[int] = Field(None, description="Candidatos en el ranking paginado")
 
 
 class RequerimientoRol(BaseModel):
@@ -155,9 +272,11 @@ class RequerimientoRol(BaseModel):
     descripcion: str = Field(..., description="Skills y certificaciones requeridas")
     pais: Optional[str] = Field(None, description="Filtro por pais")
     cantidad: int = Field(3, ge=1, le=20, description="Candidatos a retornar")
+    skills: List[str] = Field(default=[], description="Nombres exactos de skills requeridos")
+    certificaciones: List[str] = Field(default=[], description="Nombres exactos de certificaciones requeridas")
 
 
-class BatchSearchRequest(BaseModel):
+class BatchSearchRequest(ProyeccionPerfil):
     """Request para busqueda batch."""
     roles: List[RequerimientoRol]
 
@@ -179,7 +298,7 @@ class BatchSearchResponse(BaseModel):
     total_candidatos: int
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(ProyeccionPerfil):
     """Request para chat con lenguaje natural."""
     mensaje: str = Field(..., description="Consulta en lenguaje natural", 
                          examples=["Necesito 3 desarrolladores Java senior para Chile"])
@@ -194,6 +313,7 @@ class ChatResponse(BaseModel):
     candidatos: List[PerfilCompleto]
     total: int
     respuesta_natural: str  # Respuesta en lenguaje natural
+    cache: Optional[str] = None  # "interpretacion" o "respuesta" si se reutilizo del cache
 
 
 class HealthResponse(BaseModel):
@@ -208,6 +328,9 @@ class HealthResponse(BaseModel):
     # v4.0: Info de CVs
     total_cvs: int = 0
     total_cv_chunks: int = 0
+    # Estado de arranque: iniciando, cargando_bundle, construyendo, listo, error
+    readiness: str = "iniciando"
+    bundle_version: Optional[str] = None
 
 
 class CountriesResponse(BaseModel):
@@ -231,6 +354,9 @@ _model: SentenceTransformer = None
 _db: lancedb.DBConnection = None
 _table_certs = None
 _table_skills = None
+_table_candidates = None  # Vectores agregados por candidato (1 fila por matricula y fuente)
+_term_index = None        # Indice invertido termino -> matriculas
+_directory: Dict[str, Dict[str, str]] = {}  # matricula -> {nombre, email, cargo, pais}
 _df_certs_raw: pd.DataFrame = None  # Cache de certificaciones crudas
 _df_skills_raw: pd.DataFrame = None  # Cache de skills crudos
 _available_countries: List[str] = []
@@ -239,6 +365,20 @@ _available_countries: List[str] = []
 _table_cvs = None
 _cv_mapping: Dict[str, str] = {}          # matricula -> filename
 _cv_mapping_reverse: Dict[str, str] = {}  # filename -> matricula
+_cv_dedup_report: Dict[str, Any] = {}     # Ultimo reporte de deduplicacion
+_cv_chunking_report: Dict[str, Any] = {}  # Ultimo reporte de truncamiento
+
+# Cache semantico de /chat ("interpretacion" y "respuesta")
+_chat_caches: Dict[str, Any] = {}
+_query_interpreter = None  # Interprete local por reglas de /chat
+
+# Rankings cacheados para paginacion: ranking_id -> entrada
+_rankings: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_index_generation: int = 0  # Se incrementa cada vez que cambian los indices
+
+# Estado de arranque y bundle montado
+_readiness: str = "iniciando"
+_bundle_manifest: Dict[str, Any] = {}
 
 
 def get_model() -> SentenceTransformer:
@@ -251,25 +391,104 @@ def get_model() -> SentenceTransformer:
     return _model
 
 
-def find_column(df: pd.DataFrame, names: list) -> Optional[str]:
+def find_column(df: pd.DataFrame, names: list, exclude: Optional[set] = None) -> Optional[str]:
     """Encuentra columna por nombres posibles."""
+    exclude = exclude or set()
     for name in names:
-        if name in df.columns:
+        if name in df.columns and name not in exclude:
             return name
         for col in df.columns:
-            if name.lower() in col.lower():
+            if col not in exclude and name.lower() in str(col).lower():
                 return col
     return None
 
 
-def get_col_value(row, names: list, default: str = "") -> str:
-    """Obtiene valor de columna."""
-    for name in names:
-        if name in row.index:
-            val = row[name]
-            if pd.notna(val) and str(val).strip():
-                return str(val).strip()
-    return default
+# ============================================
+# ESQUEMA CANONICO
+# ============================================
+# Cada planilla se mapea una sola vez al cargarse a estas columnas canonicas.
+# Todo el codigo posterior accede directo por nombre canonico (sin probar
+# variantes con/sin acento por cada fila).
+
+CERT_COLUMNS: Dict[str, List[str]] = {
+    "matricula": ["[Colaborador] Matricula", "[Colaborador] Matrícula", "Matricula", "Matrícula"],
+    "nombre": ["[Colaborador] Nome", "Nome"],
+    "email": ["[Colaborador] Email", "Email"],
+    "cargo": ["[Colaborador] Cargo", "Cargo"],
+    "pais": ["[Colaborador] País", "[Colaborador] Pais", "País", "Pais"],
+    "certificacion": ["Certificação", "Certificacao"],
+    "institucion": ["Instituição", "Instituicao"],
+    "fecha_emision": ["Data de emissão", "Data de emissao"],
+    "fecha_expiracion": ["Data de expiração", "Data de expiracao"],
+    "status": ["Status"],
+    "expirado": ["Expirado"],
+}
+CERT_REQUIRED = {"matricula", "certificacion"}
+
+SKILL_COLUMNS: Dict[str, List[str]] = {
+    "matricula": ["Matrícula", "Matricula"],
+    "nombre": ["Colaborador", "Nome"],
+    "email": ["Email"],
+    "cargo": ["Cargo"],
+    "skill": ["Conhecimento", "Skill"],
+    "categoria": ["Categoria", "Grupo"],
+    "proficiencia": ["Nível de Proficiência", "Nivel de Proficiencia", "Proficiencia"],
+    "lider_nombre": ["Nome do Líder", "[Liderança] Nome", "Lider"],
+    "lider_email": ["Email do Líder", "[Liderança] Email"],
+    "status": ["Status Colaborador", "Status"],
+}
+SKILL_REQUIRED = {"matricula", "nombre"}
+
+
+def normalize_schema(df: pd.DataFrame, columns: Dict[str, List[str]],
+                     required: set, source: str) -> pd.DataFrame:
+    """
+    Proyecta una planilla sobre el esquema canonico.
+    
+    Resuelve cada columna canonica una sola vez: primero por nombre exacto
+    y luego por substring, sin reutilizar una columna ya asignada. Las
+    columnas opcionales ausentes quedan vacias; las requeridas ausentes
+    lanzan ValueError.
+    
+    Returns:
+        DataFrame solo con columnas canonicas, como texto sin espacios extremos
+    """
+    resolved: Dict[str, str] = {}
+    used: set = set()
+    
+    # Primera pasada: solo nombres exactos, para que un alias generico
+    # ("Email") no le robe por substring la columna a otro campo
+    for canonical, aliases in columns.items():
+        for alias in aliases:
+            if alias in df.columns and alias not in used:
+                resolved[canonical] = alias
+                used.add(alias)
+                break
+    
+    for canonical, aliases in columns.items():
+        if canonical in resolved:
+            continue
+        col = find_column(df, aliases, exclude=used)
+        if col is not None:
+            resolved[canonical] = col
+            used.add(col)
+    
+    missing = sorted(required - set(resolved))
+    if missing:
+        raise ValueError(
+            f"{source}: faltan columnas requeridas {missing}. "
+            f"Columnas disponibles: {list(df.columns)}"
+        )
+    
+    logger.info(f"{source}: esquema resuelto {resolved}")
+    
+    out = pd.DataFrame(index=df.index)
+    for canonical in columns:
+        if canonical in resolved:
+            out[canonical] = df[resolved[canonical]].astype(str).str.strip()
+        else:
+            out[canonical] = ""
+    return out
 
 
 # ============================================
@@ -285,27 +504,25 @@ def load_certifications_raw() -> pd.DataFrame:
     
     if not CERT_FILE.exists():
         logger.warning(f"Archivo no encontrado: {CERT_FILE}")
-        return pd.DataFrame()
+        return pd.DataFrame(columns=list(CERT_COLUMNS))
     
     logger.info(f"Cargando certificaciones: {CERT_FILE}")
     df = pd.read_excel(CERT_FILE, engine="openpyxl")
     df = df.fillna("")
+    df = normalize_schema(df, CERT_COLUMNS, CERT_REQUIRED, CERT_FILE.name)
     
-    # Filtros obligatorios
-    status_col = find_column(df, ["Status"])
-    if status_col:
-        df = df[df[status_col].astype(str).str.strip().str.lower() == "verificado"]
+    # Filtros obligatorios (solo si la planilla trae la columna)
+    if (df["status"] != "").any():
+        df = df[df["status"].str.lower() == "verificado"]
     
-    expirado_col = find_column(df, ["Expirado"])
-    if expirado_col:
-        df = df[df[expirado_col].astype(str).str.strip().str.lower().isin(["nao", "não", "no", "n"])]
+    if (df["expirado"] != "").any():
+        df = df[df["expirado"].str.lower().isin(["nao", "não", "no", "n"])]
     
+    df = df.reset_index(drop=True)
     logger.info(f"Certificaciones filtradas: {len(df)}")
     
     # Paises disponibles
-    pais_col = find_column(df, ["[Colaborador] País", "[Colaborador] Pais", "Pais"])
-    if pais_col:
-        _available_countries = sorted([p for p in df[pais_col].astype(str).str.strip().unique() if p])
+    _available_countries = sorted([p for p in df["pais"].unique() if p])
     
     _df_certs_raw = df
     return df
@@ -320,75 +537,75 @@ def load_skills_raw() -> pd.DataFrame:
     
     if not RRHH_FILE.exists():
         logger.warning(f"Archivo no encontrado: {RRHH_FILE}")
-        return pd.DataFrame()
+        return pd.DataFrame(columns=list(SKILL_COLUMNS))
     
     logger.info(f"Cargando skills/RRHH: {RRHH_FILE}")
     df = pd.read_excel(RRHH_FILE, engine="openpyxl")
     df = df.fillna("")
+    df = normalize_schema(df, SKILL_COLUMNS, SKILL_REQUIRED, RRHH_FILE.name)
     
     # Filtrar solo activos
-    status_col = find_column(df, ["Status Colaborador", "Status"])
-    if status_col:
-        df = df[df[status_col].astype(str).str.strip().str.lower() == "ativo"]
+    if (df["status"] != "").any():
+        df = df[df["status"].str.lower() == "ativo"]
     
+    df = df.reset_index(drop=True)
     logger.info(f"Skills/RRHH filtrados: {len(df)}")
     
     _df_skills_raw = df
     return df
 
 
-def get_all_certs_for_matricula(matricula: str) -> List[Certificacion]:
-    """Obtiene TODAS las certificaciones de un empleado."""
+def certs_for_matricula(matricula: str) -> List[Dict[str, Any]]:
+    """Certificaciones de un empleado como dicts planos (ruta de respuesta rapida)."""
     df = load_certifications_raw()
     if df.empty:
         return []
     
-    mat_col = find_column(df, ["[Colaborador] Matricula", "Matricula"])
-    if not mat_col:
-        return []
-    
-    employee_certs = df[df[mat_col].astype(str).str.strip() == str(matricula).strip()]
-    
-    certs = []
-    for _, row in employee_certs.iterrows():
-        certs.append(Certificacion(
-            nombre=get_col_value(row, ["Certificação", "Certificacao"]),
-            institucion=get_col_value(row, ["Instituição", "Instituicao"]),
-            fecha_emision=get_col_value(row, ["Data de emissão", "Data de emissao"]),
-            fecha_expiracion=get_col_value(row, ["Data de expiração", "Data de expiracao"])
-        ))
+    employee_certs = df[df["matricula"] == str(matricula).strip()]
     
-    return certs
+    return [
+        {
+            "nombre": nombre,
+            "institucion": institucion,
+            "fecha_emision": emision,
+            "fecha_expiracion": expiracion
+        }
+        for nombre, institucion, emision, expiracion in zip(
+            employee_certs["certificacion"], employee_certs["institucion"],
+            employee_certs["fecha_emision"], employee_certs["fecha_expiracion"]
+        )
+    ]
 
 
-def get_all_skills_for_matricula(matricula: str) -> List[Skill]:
-    """Obtiene TODOS los skills de un empleado."""
+def skills_for_matricula(matricula: str) -> List[Dict[str, Any]]:
+    """Skills de un empleado como dicts planos (ruta de respuesta rapida)."""
     df = load_skills_raw()
     if df.empty:
         return []
     
-    mat_col = find_column(df, ["Matrícula", "Matricula"])
-    if not mat_col:
-        return []
-    
-    employee_skills = df[df[mat_col].astype(str).str.strip() == str(matricula).strip()]
-    
-    skills = []
-    seen = set()
-    for _, row in employee_skills.iterrows():
-        skill_name = get_col_value(row, ["Conhecimento", "Skill"])
-        if skill_name and skill_name not in seen:
-            seen.add(skill_name)
-            prof_str = get_col_value(row, ["Nível de Proficiência", "Proficiencia"])
-            prof = int(prof_str) if prof_str.isdigit() else None
-            
-            skills.append(Skill(
-                nombre=skill_name,
-                categoria=get_col_value(row, ["Categoria", "Grupo"]),
-                proficiencia=prof
-            ))
+    employee_skills = df[(df["matricula"] == str(matricula).strip()) & (df["skill"] != "")]
+    employee_skills = employee_skills.drop_duplicates(subset=["skill"])
     
-    return skills
+    return [
+        {
+            "nombre": nombre,
+            "categoria": categoria,
+            "proficiencia": int(prof) if prof.isdigit() else None
+        }
+        for nombre, categoria, prof in zip(
+            employee_skills["skill"], employee_skills["categoria"], employee_skills["proficiencia"]
+        )
+    ]
+
+
+def get_all_certs_for_matricula(matricula: str) -> List[Certificacion]:
+    """Obtiene TODAS las certificaciones de un empleado."""
+    return [Certificacion(**c) for c in certs_for_matricula(matricula)]
+
+
+def get_all_skills_for_matricula(matricula: str) -> List[Skill]:
+    """Obtiene TODOS los skills de un empleado."""
+    return [Skill(**sk) for sk in skills_for_matricula(matricula)]
 
 
 def get_leader_info(row_or_matricula) -> Optional[Lider]:
@@ -398,24 +615,68 @@ def get_leader_info(row_or_matricula) -> Optional[Lider]:
         df = load_skills_raw()
         if df.empty:
             return None
-        mat_col = find_column(df, ["Matrícula", "Matricula"])
-        if not mat_col:
-            return None
-        matches = df[df[mat_col].astype(str).str.strip() == str(row_or_matricula).strip()]
+        matches = df[df["matricula"] == str(row_or_matricula).strip()]
         if matches.empty:
             return None
         row = matches.iloc[0]
     else:
         row = row_or_matricula
     
-    lider_nombre = get_col_value(row, ["Nome do Líder", "[Liderança] Nome", "Lider"])
-    lider_email = get_col_value(row, ["Email do Líder", "[Liderança] Email"])
+    lider_nombre = row["lider_nombre"]
+    lider_email = row["lider_email"]
     
     if lider_nombre or lider_email:
         return Lider(nombre=lider_nombre or None, email=lider_email or None)
     return None
 
 
+def leader_for_matricula(matricula: str) -> Optional[Dict[str, Optional[str]]]:
+    """Info del lider como dict plano (ruta de respuesta rapida)."""
+    lider = get_leader_info(str(matricula))
+    return {"nombre": lider.nombre, "email": lider.email} if lider else None
+
+
+# ============================================
+# DIRECTORIO DE EMPLEADOS
+# ============================================
+
+def initialize_directory():
+    """
+    Construye el directorio matricula -> info basica a partir de Census y
+    certificaciones. Census aporta nombre/email/cargo; el pais solo viene en
+    certificaciones (primera fila con pais informado).
+    """
+    global _directory
+    directory: Dict[str, Dict[str, str]] = {}
+    
+    for df in (load_skills_raw(), load_certifications_raw()):
+        if df.empty:
+            continue
+        unique = df.drop_duplicates(subset=["matricula"])
+        for mat, nombre, email, cargo in zip(
+            unique["matricula"], unique["nombre"], unique["email"], unique["cargo"]
+        ):
+            if not mat:
+                continue
+            prev = directory.get(mat)
+            if prev is None:
+                directory[mat] = {"nombre": nombre, "email": email, "cargo": cargo, "pais": ""}
+            else:
+                prev["nombre"] = prev["nombre"] or nombre
+                prev["email"] = prev["email"] or email
+                prev["cargo"] = prev["cargo"] or cargo
+    
+    df_certs = load_certifications_raw()
+    if not df_certs.empty:
+        with_pais = df_certs[df_certs["pais"] != ""].drop_duplicates(subset=["matricula"])
+        for mat, pais in zip(with_pais["matricula"], with_pais["pais"]):
+            if mat in directory:
+                directory[mat]["pais"] = pais
+    
+    _directory = directory
+    logger.info(f"Directorio: {len(_directory)} colaboradores")
+
+
 # ============================================
 # INICIALIZACION VECTOR DB
 # ============================================
@@ -438,33 +699,18 @@ def initialize_vector_db(force_rebuild: bool = False):
         if not df.empty:
             logger.info("Indexando certificaciones...")
             
-            mat_col = find_column(df, ["[Colaborador] Matricula", "Matricula"])
-            
             # Crear contexto de busqueda
-            contexts = []
-            records = []
-            for idx, (_, row) in enumerate(df.iterrows()):
-                cargo = get_col_value(row, ["[Colaborador] Cargo", "Cargo"])
-                cert = get_col_value(row, ["Certificação", "Certificacao"])
-                inst = get_col_value(row, ["Instituição", "Instituicao"])
-                pais = get_col_value(row, ["[Colaborador] País", "[Colaborador] Pais"])
-                
-                context = f"{cargo} {cert} {inst} {pais}".strip()
-                contexts.append(context)
-                
-                records.append({
-                    "id": idx,
-                    "matricula": str(row[mat_col]).strip() if mat_col else "",
-                    "nombre": get_col_value(row, ["[Colaborador] Nome", "Nome"]),
-                    "email": get_col_value(row, ["[Colaborador] Email", "Email"]),
-                    "cargo": cargo,
-                    "certificacion": cert,
-                    "institucion": inst,
-                    "pais": pais,
-                    "context": context
-                })
+            contexts = (
+                df["cargo"] + " " + df["certificacion"] + " " + df["institucion"] + " " + df["pais"]
+            ).str.strip()
+            
+            records_df = df[["matricula", "nombre", "email", "cargo", "certificacion",
+                             "institucion", "pais"]].copy()
+            records_df.insert(0, "id", range(len(records_df)))
+            records_df["context"] = contexts
+            records = records_df.to_dict(orient="records")
             
-            embeddings = model.encode(contexts, show_progress_bar=True)
+            embeddings = model.encode(contexts.tolist(), show_progress_bar=True)
             for i, rec in enumerate(records):
                 rec["vector"] = embeddings[i].tolist()
             
@@ -482,40 +728,21 @@ def initialize_vector_db(force_rebuild: bool = False):
         if not df.empty:
             logger.info("Indexando skills...")
             
-            mat_col = find_column(df, ["Matrícula", "Matricula"])
-            skill_col = find_column(df, ["Conhecimento", "Skill"])
-            
             # Filtrar filas con skill
-            df_with_skill = df[df[skill_col].astype(str).str.strip() != ""] if skill_col else df
+            df_with_skill = df[df["skill"] != ""]
             
-            contexts = []
-            records = []
-            for idx, (_, row) in enumerate(df_with_skill.iterrows()):
-                cargo = get_col_value(row, ["Cargo"])
-                skill = get_col_value(row, ["Conhecimento", "Skill"])
-                categoria = get_col_value(row, ["Categoria", "Grupo"])
-                
-                context = f"{cargo} {skill} {categoria}".strip()
-                contexts.append(context)
-                
-                prof_str = get_col_value(row, ["Nível de Proficiência", "Proficiencia"])
-                
-                records.append({
-                    "id": idx,
-                    "matricula": str(row[mat_col]).strip() if mat_col else "",
-                    "nombre": get_col_value(row, ["Colaborador", "Nome"]),
-                    "email": get_col_value(row, ["Email"]),
-                    "cargo": cargo,
-                    "skill": skill,
-                    "categoria": categoria,
-                    "proficiencia": prof_str,
-                    "lider_nombre": get_col_value(row, ["Nome do Líder"]),
-                    "lider_email": get_col_value(row, ["Email do Líder"]),
-                    "context": context
-                })
+            contexts = (
+                df_with_skill["cargo"] + " " + df_with_skill["skill"] + " " + df_with_skill["categoria"]
+            ).str.strip()
+            
+            records_df = df_with_skill[["matricula", "nombre", "email", "cargo", "skill", "categoria",
+                                        "proficiencia", "lider_nombre", "lider_email"]].copy()
+            records_df.insert(0, "id", range(len(records_df)))
+            records_df["context"] = contexts
+            records = records_df.to_dict(orient="records")
             
             if records:
-                embeddings = model.encode(contexts, show_progress_bar=True)
+                embeddings = model.encode(contexts.tolist(), show_progress_bar=True)
                 for i, rec in enumerate(records):
                     rec["vector"] = embeddings[i].tolist()
                 
@@ -536,12 +763,13 @@ def initialize_cv_index(force_rebuild: bool = False):
     Proceso:
     1. Carga mapping manual si existe, sino genera automatico con fuzzy matching
     2. Procesa CVs y extrae chunks de texto
-    3. Genera embeddings y los indexa en LanceDB
+    3. Elimina chunks duplicados, casi-duplicados y boilerplate
+    4. Genera embeddings y los indexa en LanceDB
     
     Args:
         force_rebuild: Si True, regenera indices aunque existan
     """
-    global _table_cvs, _cv_mapping, _cv_mapping_reverse
+    global _table_cvs, _cv_mapping, _cv_mapping_reverse, _cv_dedup_report, _cv_chunking_report
     
     if not CV_FOLDER.exists():
         logger.warning(f"Carpeta de CVs no existe: {CV_FOLDER}")
@@ -561,7 +789,8 @@ def initialize_cv_index(force_rebuild: bool = False):
     
     # === PASO 1: Obtener mapping filename -> matricula ===
     from cv_matcher import CVMatcher, create_mapping_from_folder
-    from cv_processor import CVProcessor
+    from cv_processor import CVProcessor, CVTextCache
+    from cv_dedup import CVDeduplicator
     
     df_skills = load_skills_raw()
     
@@ -603,14 +832,40 @@ def initialize_cv_index(force_rebuild: bool = False):
         return
     
     # === PASO 3: Procesar CVs y generar chunks ===
-    processor = CVProcessor(CV_FOLDER, chunk_size=500, overlap=100)
+    text_cache = CVTextCache(CV_TEXT_CACHE_FILE)
+    if CV_CHUNK_MODE == "tokens":
+        processor = CVProcessor(
+            CV_FOLDER, chunk_size=500, overlap=100,
+            tokenizer=model.tokenizer,
+            max_tokens=model.max_seq_length,
+            token_overlap=CV_CHUNK_OVERLAP_TOKENS,
+            report_truncation=CV_TRUNCATION_REPORT,
+            truncation_sample_pages=CV_TRUNCATION_SAMPLE_PAGES,
+            text_cache=text_cache
+        )
+    else:
+        processor = CVProcessor(CV_FOLDER, chunk_size=500, overlap=100, text_cache=text_cache)
     chunks = processor.process_all(filename_to_matricula)
+    _cv_chunking_report = processor.truncation_report()
     
     if not chunks:
         logger.warning("No se generaron chunks de CVs")
         return
     
-    # === PASO 4: Generar embeddings e indexar ===
+    # === PASO 4: Deduplicar antes de embeber ===
+    if CV_DEDUP_ENABLED:
+        deduplicator = CVDeduplicator(
+            hamming_threshold=CV_DEDUP_HAMMING_THRESHOLD,
+            boilerplate_min_cvs=CV_BOILERPLATE_MIN_CVS
+        )
+        chunks, report = deduplicator.deduplicate(chunks)
+        _cv_dedup_report = report.to_dict()
+        
+        if not chunks:
+            logger.warning("Todos los chunks de CVs fueron descartados por deduplicacion")
+            return
+    
+    # === PASO 5: Generar embeddings e indexar ===
     logger.info(f"Generando embeddings para {len(chunks)} chunks...")
     texts = [c.text for c in chunks]
     embeddings = model.encode(texts, show_progress_bar=True)
@@ -624,6 +879,7 @@ def initialize_cv_index(force_rebuild: bool = False):
             "text": chunk.text,
             "page_num": chunk.page_num,
             "cv_filename": chunk.cv_filename,
+            "pais": _directory.get(chunk.matricula, {}).get("pais", ""),
             "vector": embeddings[i].tolist()
         })
     
@@ -636,71 +892,344 @@ def initialize_cv_index(force_rebuild: bool = False):
 
 
 # ============================================
-# BUSQUEDA Y ENRIQUECIMIENTO
+# INDICE AGREGADO POR CANDIDATO
 # ============================================
+# Una fila por (matricula, fuente) con el centroide de todos los vectores de
+# esa persona en la tabla fila-a-fila correspondiente. La primera etapa de
+# busqueda corre sobre esta tabla, asi el numero de filas a traer por
+# consulta depende de cuantas personas se piden y no de cuantas certs tiene
+# cada una. Las tablas por fila quedan solo para la evidencia.
+#
+# Los centroides y la consulta se normalizan (L2): la distancia equivale a la
+# de coseno y una persona con items muy variados (centroide corto) no queda
+# a la misma distancia de todas las consultas.
+
+# Columna que marca una tabla agregada con centroides normalizados
+CENTROID_MARKER = "vector_normalizado"
+
+
+def _unit(vector) -> np.ndarray:
+    """Vector normalizado (L2) en float32."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+def _centroids_by_matricula(table, fuente: str) -> List[Dict[str, Any]]:
+    """Centroide de los vectores de una tabla agrupados por matricula."""
+    if table is None:
+        return []
+    
+    df = table.to_pandas()[["matricula", "vector"]]
+    df = df[df["matricula"].astype(str).str.strip() != ""]
+    
+    rows = []
+    for mat, group in df.groupby("matricula", sort=False):
+        vectors = np.vstack(group["vector"].to_numpy())
+        rows.append({
+            "matricula": str(mat).strip(),
+            "fuente": fuente,
+            "n_items": len(group),
+            CENTROID_MARKER: True,
+            "vector": _unit(vectors.mean(axis=0)).tolist()
+        })
+    return rows
 
-def get_basic_info_for_matricula(matricula: str) -> Optional[Dict]:
+
+def initialize_candidate_index(force_rebuild: bool = False):
     """
-    Busca info basica de un empleado por matricula.
-    Usado cuando un candidato aparece solo en CV pero no en certs/skills.
+    Construye la tabla agregada por candidato a partir de las tablas
+    de certificaciones, skills y CVs ya indexadas.
+    
+    Args:
+        force_rebuild: Si True, regenera la tabla aunque exista
     """
-    # Primero intentar en skills (Census)
-    df = load_skills_raw()
-    if not df.empty:
-        mat_col = find_column(df, ["Matrícula", "Matricula"])
-        if mat_col:
-            matches = df[df[mat_col].astype(str).str.strip() == str(matricula).strip()]
-            if not matches.empty:
-                row = matches.iloc[0]
-                return {
-                    "nombre": get_col_value(row, ["Colaborador", "Nome"]),
-                    "email": get_col_value(row, ["Email"]),
-                    "cargo": get_col_value(row, ["Cargo"]),
-                    "pais": None
-                }
+    global _table_candidates
     
-    # Luego intentar en certificaciones
-    df = load_certifications_raw()
-    if not df.empty:
-        mat_col = find_column(df, ["[Colaborador] Matricula", "Matricula"])
-        if mat_col:
-            matches = df[df[mat_col].astype(str).str.strip() == str(matricula).strip()]
-            if not matches.empty:
-                row = matches.iloc[0]
-                return {
-                    "nombre": get_col_value(row, ["[Colaborador] Nome", "Nome"]),
-                    "email": get_col_value(row, ["[Colaborador] Email", "Email"]),
-                    "cargo": get_col_value(row, ["[Colaborador] Cargo", "Cargo"]),
-                    "pais": get_col_value(row, ["[Colaborador] País", "[Colaborador] Pais"])
-                }
+    if _db is None:
+        return
     
-    return None
+    existing = _db.table_names()
+    if TABLE_CANDIDATES in existing and not force_rebuild:
+        table = _db.open_table(TABLE_CANDIDATES)
+        if CENTROID_MARKER in table.schema.names:
+            logger.info(f"Reutilizando tabla {TABLE_CANDIDATES}")
+            _table_candidates = table
+            return
+        logger.info(f"Tabla {TABLE_CANDIDATES} con centroides sin normalizar, regenerando")
+    
+    rows = (
+        _centroids_by_matricula(_table_certs, "certificacion")
+        + _centroids_by_matricula(_table_skills, "skill")
+        + _centroids_by_matricula(_table_cvs, "cv")
+    )
+    if not rows:
+        logger.warning("No hay datos para la tabla agregada de candidatos")
+        return
+    
+    records = []
+    for i, row in enumerate(rows):
+        basic = _directory.get(row["matricula"])
+        if basic is None:
+            continue
+        records.append({"id": i, **row, **basic})
+    
+    if TABLE_CANDIDATES in existing:
+        _db.drop_table(TABLE_CANDIDATES)
+    _table_candidates = _db.create_table(TABLE_CANDIDATES, records)
+    logger.info(
+        f"Tabla {TABLE_CANDIDATES}: {len(records)} vectores de "
+        f"{len({r['matricula'] for r in records})} candidatos"
+    )
 
 
-def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
-                      include_cv_search: bool = True) -> List[PerfilCompleto]:
+# ============================================
+# INDICE INVERTIDO DE TERMINOS EXACTOS
+# ============================================
+
+def initialize_term_index():
+    """Construye el indice invertido de skills y certificaciones en memoria."""
+    global _term_index
+    from term_index import TermIndex
+    
+    df_certs = load_certifications_raw()
+    df_skills = load_skills_raw()
+    
+    _term_index = TermIndex.from_columns(
+        zip(df_certs["matricula"], df_certs["certificacion"]),
+        zip(df_skills["matricula"], df_skills["skill"], df_skills["proficiencia"])
+    )
+
+
+def _pais_ok(matricula: str, pais: Optional[str]) -> bool:
+    """Filtro de pais para candidatos que no vienen de la tabla de certs."""
+    if not pais:
+        return True
+    cand_pais = _directory.get(matricula, {}).get("pais", "")
+    return not cand_pais or cand_pais.lower() == pais.lower()
+
+
+def exact_lookup(query: str, required_terms: Optional[List[str]] = None):
+    """Resuelve la consulta contra el indice invertido (None si no aplica)."""
+    if not EXACT_FAST_PATH_ENABLED or _term_index is None:
+        return None
+    if required_terms:
+        return _term_index.lookup_terms(required_terms)
+    return _term_index.lookup_text(query)
+
+
+# ============================================
+# BUNDLE DE INDICES
+# ============================================
+
+def load_index_bundle(bundle_dir: Path):
     """
-    Busca candidatos y retorna perfiles ENRIQUECIDOS con todas sus certs, skills y CVs.
+    Carga un bundle prebuilt (solo lectura) en lugar de construir indices.
     
-    Args:
-        query: Consulta de busqueda
-        limit: Maximo de resultados
-        pais: Filtrar por pais
-        include_cv_search: Si True, tambien busca en CVs indexados (v4.0)
+    Raises:
+        BundleError: Si el bundle es invalido o de otro modelo de embeddings
     """
+    global _model, _db, _table_certs, _table_skills, _table_cvs, _table_candidates
+    global _df_certs_raw, _df_skills_raw, _available_countries
+    global _cv_mapping, _cv_mapping_reverse, _cv_dedup_report, _bundle_manifest
+    import index_bundle as ib
+    
+    bundle_dir = Path(bundle_dir)
+    logger.info(f"Cargando bundle: {bundle_dir}")
+    manifest = ib.verify_bundle(bundle_dir, check_hashes=INDEX_BUNDLE_VERIFY)
+    
+    if manifest.get("embedding_model") != EMBEDDING_MODEL:
+        raise ib.BundleError(
+            f"Bundle generado con {manifest.get('embedding_model')}, el servidor usa {EMBEDDING_MODEL}"
+        )
+    
+    # Snapshot columnar de RRHH (ya en esquema canonico)
+    _df_certs_raw = pd.read_parquet(bundle_dir / ib.HR_CERTS_FILE).fillna("")
+    _df_skills_raw = pd.read_parquet(bundle_dir / ib.HR_CENSUS_FILE).fillna("")
+    _available_countries = sorted([p for p in _df_certs_raw["pais"].unique() if p])
+    
+    _model = SentenceTransformer(str(bundle_dir / ib.MODEL_DIR))
+    
+    _db = lancedb.connect(str(bundle_dir / ib.LANCEDB_DIR))
+    existing = _db.table_names()
+    _table_certs = _db.open_table(TABLE_CERTS) if TABLE_CERTS in existing else None
+    _table_skills = _db.open_table(TABLE_SKILLS) if TABLE_SKILLS in existing else None
+    _table_cvs = _db.open_table(TABLE_CVS) if TABLE_CVS in existing else None
+    _table_candidates = _db.open_table(TABLE_CANDIDATES) if TABLE_CANDIDATES in existing else None
+    if _table_candidates is not None and CENTROID_MARKER not in _table_candidates.schema.names:
+        # Bundle anterior a la normalizacion: sin shortlist (solo lectura, no se regenera)
+        logger.warning(f"Bundle con {TABLE_CANDIDATES} sin normalizar, shortlist deshabilitado")
+        _table_candidates = None
+    
+    _cv_mapping_reverse = json.loads((bundle_dir / ib.CV_MAPPING_FILE).read_text(encoding="utf-8"))
+    _cv_mapping = {v: k for k, v in _cv_mapping_reverse.items()}
+    _cv_dedup_report = manifest.get("cv_deduplicacion", {})
+    
+    initialize_directory()
+    initialize_term_index()
+    
+    _bundle_manifest = manifest
+    logger.info(f"Bundle {manifest['version']} listo")
+
+
+def export_index_bundle(out_dir: Path) -> Dict[str, Any]:
+    """Construye (o reutiliza) los indices locales y los exporta como bundle."""
+    import index_bundle as ib
+    
     if _table_certs is None and _table_skills is None:
-        return []
+        initialize_directory()
+        initialize_vector_db()
+        initialize_term_index()
+        initialize_cv_index()
+        initialize_candidate_index()
+    
+    return ib.write_bundle(
+        out_dir=Path(out_dir),
+        lancedb_path=LANCEDB_PATH,
+        frames={"certificaciones": load_certifications_raw(), "census": load_skills_raw()},
+        cv_mapping=_cv_mapping_reverse,
+        cv_manifest=ib.build_cv_manifest(CV_FOLDER, _cv_mapping_reverse),
+        model=get_model(),
+        embedding_model=EMBEDDING_MODEL,
+        extra={"cv_deduplicacion": _cv_dedup_report, "cv_chunking": _cv_chunking_report}
+    )
+
+
+def initialize_all():
+    """Arranque: bundle prebuilt si esta configurado, si no construye indices."""
+    global _readiness
     
-    model = get_model()
-    query_vector = model.encode([query])[0].tolist()
+    if INDEX_BUNDLE_PATH:
+        _readiness = "cargando_bundle"
+        load_index_bundle(Path(INDEX_BUNDLE_PATH))
+    else:
+        _readiness = "construyendo"
+        initialize_directory()
+        initialize_vector_db()
+        initialize_term_index()
+        # v4.0: Inicializar CVs
+        initialize_cv_index()
+        initialize_candidate_index()
+    
+    bump_index_generation()
+    _readiness = "listo"
+
+
+def _ensure_writable_index():
+    """Los endpoints de reindexado no aplican sobre un bundle de solo lectura."""
+    if _bundle_manifest:
+        raise HTTPException(409, "Indices servidos desde un bundle de solo lectura; generar un bundle nuevo")
+
+
+# ============================================
+# BUSQUEDA Y ENRIQUECIMIENTO
+# ============================================
+
+def get_basic_info_for_matricula(matricula: str) -> Optional[Dict]:
+    """
+    Info basica de un empleado por matricula (directorio en memoria).
+    Usado cuando un candidato aparece solo en CV pero no en certs/skills.
+    """
+    info = _directory.get(str(matricula).strip())
+    if info is None:
+        return None
+    return {**info, "pais": info["pais"] or None}
+
+
+def profile_for_matricula(matricula: str) -> Optional[Dict[str, Any]]:
+    """
+    Perfil completo de un colaborador por matricula (sin busqueda).
+    Retorna None si la matricula no existe en certificaciones ni skills.
+    """
+    matricula = str(matricula).strip()
+    info = get_basic_info_for_matricula(matricula)
+    if info is None:
+        return None
     
+    return {
+        "matricula": matricula,
+        "nombre": info.get("nombre", ""),
+        "email": info.get("email", ""),
+        "cargo": info.get("cargo", ""),
+        "pais": info.get("pais"),
+        "certificaciones": certs_for_matricula(matricula),
+        "skills": skills_for_matricula(matricula),
+        "lider": leader_for_matricula(matricula),
+        "tiene_cv": matricula in _cv_mapping,
+        "cv_filename": _cv_mapping.get(matricula)
+    }
+
+
+def distance_to_score(distance) -> float:
+    """Convierte la distancia de LanceDB en score 0-100."""
+    dist = float(distance or 0)
+    # Validar que dist sea un número válido
+    if math.isnan(dist) or math.isinf(dist):
+        dist = 0
+    return 100 * math.exp(-dist / 15)
+
+
+def _sql_quote(value: str) -> str:
+    """Literal SQL para filtros de LanceDB."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def shortlist_candidates(query_vector: List[float], n: int,
+                         pais: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Primera etapa: mejores `n` candidatos segun la tabla agregada.
+    
+    Returns:
+        Dict matricula -> {nombre, email, cargo, pais, fuente, score},
+        vacio si la tabla agregada no esta disponible
+    """
+    if not CANDIDATE_SHORTLIST_ENABLED or _table_candidates is None:
+        return {}
+    
+    search = _table_candidates.search(_unit(query_vector).tolist())
+    if pais:
+        # Los candidatos sin pais (solo Census) no se descartan, igual que en skills
+        search = search.where(f"pais = '' OR lower(pais) = {_sql_quote(pais.lower())}", prefilter=True)
+    
+    # Como maximo una fila por fuente y persona
+    results = search.limit(n * 3).to_pandas()
+    
+    shortlist: Dict[str, Dict] = {}
+    for rec in results.to_dict(orient="records"):
+        mat = str(rec.get("matricula", "")).strip()
+        score = distance_to_score(rec.get("_distance"))
+        if mat and (mat not in shortlist or score > shortlist[mat]["score"]):
+            shortlist[mat] = {
+                "nombre": rec.get("nombre", ""),
+                "email": rec.get("email", ""),
+                "cargo": rec.get("cargo", ""),
+                "pais": rec.get("pais") or None,
+                "fuente": rec.get("fuente", ""),
+                "score": score
+            }
+    
+    top = sorted(shortlist.items(), key=lambda kv: kv[1]["score"], reverse=True)[:n]
+    return dict(top)
+
+
+def _search_rows(table, query_vector: List[float], n: int,
+                 where: Optional[str] = None) -> pd.DataFrame:
+    """Busqueda en una tabla por fila, opcionalmente restringida a un shortlist."""
+    search = table.search(query_vector)
+    if where:
+        search = search.where(where, prefilter=True)
+    return search.limit(n).to_pandas()
+
+
+def _row_candidates(query_vector: List[float], limit: int, pais: Optional[str],
+                    evidence_filter: Optional[str]) -> Dict[str, Dict]:
+    """Candidatos desde las filas de certificaciones y skills (mejor fila por matricula)."""
     candidatos_raw: Dict[str, Dict] = {}  # matricula -> data
-    cv_matches_by_matricula: Dict[str, List[CVMatch]] = {}  # v4.0: matches de CV
     
     # Buscar en certificaciones
     if _table_certs:
         search_limit = limit * 5 if pais else limit * 3
-        results = _table_certs.search(query_vector).limit(search_limit).to_pandas()
+        results = _search_rows(_table_certs, query_vector, search_limit, evidence_filter)
         
         if pais:
             results = results[results["pais"].str.lower() == pais.lower()]
@@ -710,11 +1239,7 @@ def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
             if not mat:
                 continue
             
-            dist = float(row.get("_distance", 0) or 0)
-            # Validar que dist sea un número válido
-            if math.isnan(dist) or math.isinf(dist):
-                dist = 0
-            score = 100 * math.exp(-dist / 15)
+            score = distance_to_score(row.get("_distance"))
             
             if mat not in candidatos_raw or score > candidatos_raw[mat]["score"]:
                 candidatos_raw[mat] = {
@@ -730,18 +1255,14 @@ def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
     
     # Buscar en skills (complementar)
     if _table_skills and len(candidatos_raw) < limit:
-        results = _table_skills.search(query_vector).limit(limit * 3).to_pandas()
+        results = _search_rows(_table_skills, query_vector, limit * 3, evidence_filter)
         
         for _, row in results.iterrows():
             mat = str(row.get("matricula", "")).strip()
             if not mat:
                 continue
             
-            dist = float(row.get("_distance", 0) or 0)
-            # Validar que dist sea un número válido
-            if math.isnan(dist) or math.isinf(dist):
-                dist = 0
-            score = 100 * math.exp(-dist / 15)
+            score = distance_to_score(row.get("_distance"))
             
             if mat not in candidatos_raw or score > candidatos_raw[mat]["score"]:
                 candidatos_raw[mat] = {
@@ -757,20 +1278,54 @@ def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
                     "lider_email": row.get("lider_email")
                 }
     
+    return candidatos_raw
+
+
+def _semantic_candidates(query: str, limit: int, pais: Optional[str],
+                         include_cv_search: bool) -> Tuple[Dict[str, Dict], Dict[str, List[Dict]]]:
+    """
+    Busqueda semantica en certs, skills y CVs.
+    
+    Returns:
+        Tupla (candidatos_raw por matricula, matches de CV por matricula)
+    """
+    model = get_model()
+    query_vector = model.encode([query])[0].tolist()
+    
+    cv_matches_by_matricula: Dict[str, List[Dict]] = {}  # v4.0: matches de CV
+    
+    # Primera etapa: shortlist por persona sobre la tabla agregada.
+    # Las tablas por fila solo aportan evidencia para esas matriculas; el
+    # shortlist no aporta candidatos propios (su score es de otra escala).
+    shortlist = shortlist_candidates(
+        query_vector, max(limit * CANDIDATE_SHORTLIST_FACTOR, CANDIDATE_SHORTLIST_MIN), pais
+    )
+    evidence_filter = None
+    if shortlist:
+        evidence_filter = "matricula IN (" + ", ".join(_sql_quote(m) for m in shortlist) + ")"
+        candidatos_raw = _row_candidates(query_vector, limit, pais, evidence_filter)
+        if len(candidatos_raw) < limit:
+            # El shortlist dejo fuera evidencia: repetir sin prefiltro
+            logger.info(f"Shortlist con {len(candidatos_raw)}/{limit} candidatos, buscando sin prefiltro")
+            evidence_filter = None
+    if evidence_filter is None:
+        candidatos_raw = _row_candidates(query_vector, limit, pais, None)
+    
     # v4.0: Buscar en CVs
     if include_cv_search and _table_cvs is not None:
-        cv_results = _table_cvs.search(query_vector).limit(limit * 5).to_pandas()
+        cv_filter = evidence_filter
+        if pais and "pais" in _table_cvs.schema.names:
+            # Chunks sin pais (solo Census) no se descartan, igual que en el shortlist
+            pais_filter = f"(pais = '' OR lower(pais) = {_sql_quote(pais.lower())})"
+            cv_filter = f"{evidence_filter} AND {pais_filter}" if evidence_filter else pais_filter
+        cv_results = _search_rows(_table_cvs, query_vector, limit * 5, cv_filter)
         
         for _, row in cv_results.iterrows():
             mat = str(row.get("matricula", "")).strip()
             if not mat:
                 continue
             
-            dist = float(row.get("_distance", 0) or 0)
-            # Validar que dist sea un número válido
-            if math.isnan(dist) or math.isinf(dist):
-                dist = 0
-            score = 100 * math.exp(-dist / 15)
+            score = distance_to_score(row.get("_distance"))
             
             # Guardar matches de CV para mostrar despues
             if mat not in cv_matches_by_matricula:
@@ -788,14 +1343,14 @@ def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
                 except (ValueError, TypeError):
                     pass
             
-            cv_matches_by_matricula[mat].append(CVMatch(
-                texto=texto_cv[:300] + "..." if len(texto_cv) > 300 else texto_cv,
-                pagina=page_num_clean,
-                score=round(score, 2)
-            ))
+            cv_matches_by_matricula[mat].append({
+                "texto": texto_cv[:300] + "..." if len(texto_cv) > 300 else texto_cv,
+                "pagina": page_num_clean,
+                "score": round(score, 2)
+            })
             
             # Si el candidato no existe en certs/skills, agregarlo desde CV
-            if mat not in candidatos_raw:
+            if mat not in candidatos_raw and _pais_ok(mat, pais):
                 info = get_basic_info_for_matricula(mat)
                 if info:
                     candidatos_raw[mat] = {
@@ -809,74 +1364,297 @@ def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
                         "source": "cv"
                     }
     
+    return candidatos_raw, cv_matches_by_matricula
+
+
+def rank_candidates(query: str, limit: int = 10, pais: Optional[str] = None,
+                    include_cv_search: bool = True,
+                    required_terms: Optional[List[str]] = None
+                    ) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict]]]:
+    """
+    Ranking de candidatos sin enriquecer.
+    
+    Si la consulta misma es una lista de nombres exactos de skills/certificaciones
+    que existen en el indice invertido, se resuelve sin embeddings. Si no (p.ej.
+    un rol con descripcion y `required_terms`), se hace la busqueda semantica,
+    que ordena por la descripcion y trae la evidencia de CV, y el indice
+    invertido solo bonifica a quien posee los items exactos.
+    
+    Returns:
+        Tupla (candidatos ordenados por score, hasta `limit`; matches de CV por matricula)
+    """
+    if _table_certs is None and _table_skills is None:
+        return [], {}
+    
+    exact = exact_lookup(query, required_terms)
+    exact_pool = [h for h in exact.ranked() if _pais_ok(h.matricula, pais)] if exact else []
+    
+    if exact and exact.completa and not required_terms and len(exact_pool) >= limit:
+        # Fast path: la consulta es solo nombres exactos, no hay descripcion que rankear
+        candidatos_raw: Dict[str, Dict] = {}
+        cv_matches_by_matricula: Dict[str, List[Dict]] = {}
+        for hit in exact_pool[:limit]:
+            info = get_basic_info_for_matricula(hit.matricula) or {}
+            candidatos_raw[hit.matricula] = {
+                "matricula": hit.matricula,
+                "nombre": info.get("nombre", ""),
+                "email": info.get("email", ""),
+                "cargo": info.get("cargo", ""),
+                "pais": info.get("pais"),
+                "match_principal": ", ".join(hit.terminos[:3]),
+                "score": hit.score,
+                "source": "exacto"
+            }
+    else:
+        candidatos_raw, cv_matches_by_matricula = _semantic_candidates(
+            query, limit, pais, include_cv_search
+        )
+        
+        # Score combinado: bonificar a quien posee los items exactos requeridos.
+        # La fraccion ya esta escalada por la cobertura de la consulta; solo se
+        # agregan hasta `limit` candidatos que la busqueda semantica no encontro.
+        agregados = 0
+        for hit in exact_pool:
+            cand = candidatos_raw.get(hit.matricula)
+            if cand is not None:
+                cand["score"] = min(100.0, cand["score"] + EXACT_MATCH_BOOST * hit.fraccion)
+            elif agregados < limit and hit.fraccion > 0:
+                agregados += 1
+                info = get_basic_info_for_matricula(hit.matricula)
+                if info:
+                    candidatos_raw[hit.matricula] = {
+                        "matricula": hit.matricula,
+                        "nombre": info.get("nombre", ""),
+                        "email": info.get("email", ""),
+                        "cargo": info.get("cargo", ""),
+                        "pais": info.get("pais"),
+                        "match_principal": ", ".join(hit.terminos[:3]),
+                        "score": hit.score,
+                        "source": "exacto"
+                    }
+    
     # Ordenar por score y limitar
     sorted_candidates = sorted(candidatos_raw.values(), key=lambda x: x["score"], reverse=True)[:limit]
+    return sorted_candidates, cv_matches_by_matricula
+
+
+def enrich_candidates(candidatos: List[Dict[str, Any]],
+                      cv_matches_by_matricula: Dict[str, List[Dict]],
+                      proyeccion: Optional[ProyeccionPerfil] = None) -> List[Dict[str, Any]]:
+    """
+    Enriquece candidatos rankeados con certs, skills, lider y CVs.
+    
+    Los perfiles son dicts planos con la forma de PerfilCompleto (sin construir
+    modelos Pydantic por candidato); los campos no proyectados no aparecen.
+    """
+    proyeccion = proyeccion or ProyeccionPerfil()
+    campos = proyeccion.campos_perfil()
     
-    # ENRIQUECER cada candidato
     perfiles = []
-    for cand in sorted_candidates:
+    for cand in candidatos:
         mat = cand["matricula"]
+        extra: Dict[str, Any] = {}
+        
+        if "pais" in campos:
+            extra["pais"] = cand.get("pais")
         
         # Obtener TODAS las certificaciones
-        all_certs = get_all_certs_for_matricula(mat)
+        if "certificaciones" in campos:
+            extra["certificaciones"] = certs_for_matricula(mat)[:proyeccion.max_certificaciones]
         
         # Obtener TODOS los skills
-        all_skills = get_all_skills_for_matricula(mat)
+        if "skills" in campos:
+            extra["skills"] = skills_for_matricula(mat)[:proyeccion.max_skills]
         
         # Obtener lider
-        lider = None
-        if cand.get("lider_nombre") or cand.get("lider_email"):
-            lider = Lider(nombre=cand.get("lider_nombre"), email=cand.get("lider_email"))
-        else:
-            lider = get_leader_info(mat)
+        if "lider" in campos:
+            if cand.get("lider_nombre") or cand.get("lider_email"):
+                extra["lider"] = {"nombre": cand.get("lider_nombre"), "email": cand.get("lider_email")}
+            else:
+                extra["lider"] = leader_for_matricula(mat)
         
         # v4.0: Obtener matches de CV (top 3)
-        cv_matches = cv_matches_by_matricula.get(mat, [])
-        cv_matches = sorted(cv_matches, key=lambda x: x.score, reverse=True)[:3]
+        if "cv_matches" in campos:
+            cv_matches = cv_matches_by_matricula.get(mat, [])
+            extra["cv_matches"] = sorted(cv_matches, key=lambda x: x["score"], reverse=True)[:3]
+        if "tiene_cv" in campos:
+            extra["tiene_cv"] = mat in _cv_mapping
+        if "cv_filename" in campos:
+            extra["cv_filename"] = _cv_mapping.get(mat)
         
-        perfiles.append(PerfilCompleto(
-            matricula=mat,
-            nombre=cand["nombre"],
-            email=cand["email"],
-            cargo=cand["cargo"],
-            pais=cand.get("pais"),
-            certificaciones=all_certs,
-            skills=all_skills,
-            lider=lider,
-            match_principal=cand["match_principal"],
-            score=round(cand["score"], 2),
-            # v4.0: Campos de CV
-            cv_matches=cv_matches,
-            tiene_cv=mat in _cv_mapping,
-            cv_filename=_cv_mapping.get(mat)
-        ))
+        perfiles.append({
+            "matricula": mat,
+            "nombre": cand["nombre"],
+            "email": cand["email"],
+            "cargo": cand["cargo"],
+            "match_principal": cand["match_principal"],
+            "score": round(cand["score"], 2),
+            **extra
+        })
     
     return perfiles
 
 
-def search_for_roles(roles: List[RequerimientoRol]) -> Dict[str, RolResultado]:
-    """Busqueda batch para multiples roles."""
+def search_profiles(query: str, limit: int = 10, pais: Optional[str] = None,
+                    include_cv_search: bool = True,
+                    required_terms: Optional[List[str]] = None,
+                    proyeccion: Optional[ProyeccionPerfil] = None) -> List[Dict[str, Any]]:
+    """
+    Busca candidatos y retorna perfiles ENRIQUECIDOS con todas sus certs, skills y CVs.
+    
+    Args:
+        query: Consulta de busqueda
+        limit: Maximo de resultados
+        pais: Filtrar por pais
+        include_cv_search: Si True, tambien busca en CVs indexados (v4.0)
+        required_terms: Nombres exactos de skills/certificaciones requeridos
+        proyeccion: Campos a poblar; los omitidos no se calculan ni se serializan
+    """
+    candidatos, cv_matches_by_matricula = rank_candidates(
+        query, limit, pais, include_cv_search, required_terms
+    )
+    return enrich_candidates(candidatos, cv_matches_by_matricula, proyeccion)
+
+
+def search_and_enrich(query: str, limit: int = 10, pais: Optional[str] = None,
+                      include_cv_search: bool = True,
+                      required_terms: Optional[List[str]] = None,
+                      proyeccion: Optional[ProyeccionPerfil] = None) -> List[PerfilCompleto]:
+    """Igual que search_profiles pero retorna modelos PerfilCompleto."""
+    return [
+        PerfilCompleto(**p)
+        for p in search_profiles(query, limit, pais, include_cv_search, required_terms, proyeccion)
+    ]
+
+
+def search_roles_profiles(roles: List[RequerimientoRol],
+                          proyeccion: Optional[ProyeccionPerfil] = None) -> Dict[str, Dict[str, Any]]:
+    """Busqueda batch para multiples roles (resultados como dicts planos)."""
     resultados = {}
     
     for rol in roles:
         logger.info(f"Buscando: {rol.rol_id} - {rol.descripcion[:50]}...")
         
-        candidatos = search_and_enrich(
+        candidatos = search_profiles(
             query=rol.descripcion,
             limit=rol.cantidad,
-            pais=rol.pais
+            pais=rol.pais,
+            required_terms=(rol.skills + rol.certificaciones) or None,
+            proyeccion=proyeccion
         )
         
-        resultados[rol.rol_id] = RolResultado(
-            rol_id=rol.rol_id,
-            descripcion=rol.descripcion,
-            candidatos=candidatos,
-            total=len(candidatos)
-        )
+        resultados[rol.rol_id] = {
+            "rol_id": rol.rol_id,
+            "descripcion": rol.descripcion,
+            "candidatos": candidatos,
+            "total": len(candidatos)
+        }
     
     return resultados
 
 
+def search_for_roles(roles: List[RequerimientoRol],
+                     proyeccion: Optional[ProyeccionPerfil] = None) -> Dict[str, RolResultado]:
+    """Busqueda batch para multiples roles."""
+    return {
+        rol_id: RolResultado(**res)
+        for rol_id, res in search_roles_profiles(roles, proyeccion).items()
+    }
+
+
+# ============================================
+# PAGINACION POR CURSOR
+# ============================================
+# La primera pagina calcula el ranking completo (hasta SEARCH_CURSOR_POOL
+# candidatos, sin enriquecer) y lo guarda en memoria con un TTL corto; las
+# paginas siguientes solo enriquecen su tramo. El cursor lleva la generacion
+# de los indices: tras un reindex los cursores anteriores dejan de valer.
+
+class CursorError(Exception):
+    """Cursor invalido, expirado o de otra generacion de indices."""
+
+
+def bump_index_generation():
+    """Marca que los indices cambiaron: invalida rankings y cursores."""
+    global _index_generation
+    _index_generation += 1
+    _rankings.clear()
+
+
+def _encode_cursor(ranking_id: str, offset: int) -> str:
+    raw = json.dumps({"r": ranking_id, "o": offset, "g": _index_generation}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"r": str(data["r"]), "o": int(data["o"]), "g": int(data["g"])}
+    except Exception:
+        raise CursorError("Cursor invalido")
+
+
+def _purge_rankings(now: float):
+    expired = [k for k, e in _rankings.items() if now - e["created"] > SEARCH_CURSOR_TTL]
+    for k in expired:
+        del _rankings[k]
+
+
+def search_page(query: str, page_size: int, pais: Optional[str] = None,
+                cursor: Optional[str] = None,
+                proyeccion: Optional[ProyeccionPerfil] = None) -> Dict[str, Any]:
+    """
+    Pagina de un ranking cacheado.
+    
+    Sin cursor calcula y guarda el ranking; con cursor lo reutiliza y
+    verifica que corresponda a la misma consulta, pais y generacion.
+    
+    Returns:
+        {"candidatos", "siguiente_cursor", "total_ranking"}
+    
+    Raises:
+        CursorError: Cursor invalido o expirado (hay que repetir la busqueda)
+    """
+    now = time.monotonic()
+    _purge_rankings(now)
+    
+    if cursor:
+        data = _decode_cursor(cursor)
+        if data["g"] != _index_generation:
+            raise CursorError("Los indices cambiaron; repetir la busqueda")
+        entry = _rankings.get(data["r"])
+        if entry is None:
+            raise CursorError("Cursor expirado; repetir la busqueda")
+        if entry["consulta"] != query or entry["pais"] != pais:
+            raise CursorError("El cursor corresponde a otra consulta")
+        ranking_id, offset = data["r"], data["o"]
+        _rankings.move_to_end(ranking_id)
+    else:
+        ranked, cv_matches = rank_candidates(query, SEARCH_CURSOR_POOL, pais)
+        ranking_id, offset = uuid.uuid4().hex, 0
+        entry = {
+            "consulta": query,
+            "pais": pais,
+            "ranked": ranked,
+            "cv_matches": cv_matches,
+            "created": now
+        }
+        _rankings[ranking_id] = entry
+        while len(_rankings) > SEARCH_CURSOR_MAX_ENTRIES:
+            _rankings.popitem(last=False)
+    
+    ranked = entry["ranked"]
+    page = enrich_candidates(ranked[offset:offset + page_size], entry["cv_matches"], proyeccion)
+    next_offset = offset + page_size
+    
+    return {
+        "candidatos": page,
+        "siguiente_cursor": _encode_cursor(ranking_id, next_offset) if next_offset < len(ranked) else None,
+        "total_ranking": len(ranked)
+    }
+
+
 # ============================================
 # GEMINI INTEGRATION
 # ============================================
@@ -917,7 +1695,39 @@ async def call_gemini(prompt: str, system_prompt: str = "") -> Optional[str]:
     return None
 
 
+def get_query_interpreter():
+    """Interprete local por reglas (singleton)."""
+    global _query_interpreter
+    if _query_interpreter is None:
+        from query_parser import RuleBasedInterpreter
+        _query_interpreter = RuleBasedInterpreter(min_confidence=CHAT_RULES_MIN_CONFIDENCE)
+    return _query_interpreter
+
+
 async def interpret_natural_query(mensaje: str) -> Dict[str, Any]:
+    """
+    Interpreta una consulta en lenguaje natural.
+    
+    Primero intenta con el interprete local por reglas; deriva a Gemini solo
+    si la confianza es baja. Sin GOOGLE_API_KEY se acepta cualquier
+    interpretacion local antes que el fallback basico.
+    """
+    interprete = get_query_interpreter()
+    interpretacion = None
+    
+    if CHAT_RULES_ENABLED:
+        local = interprete.interpret(mensaje, _available_countries)
+        if interprete.aceptable(local) or (local and not GOOGLE_API_KEY):
+            interpretacion = local
+    
+    if interpretacion is None:
+        interpretacion = await interpret_with_gemini(mensaje)
+    
+    interprete.record(interpretacion["fuente"])
+    return interpretacion
+
+
+async def interpret_with_gemini(mensaje: str) -> Dict[str, Any]:
     """Usa Gemini para interpretar consulta en lenguaje natural."""
     
     system_prompt = """Eres un asistente que interpreta solicitudes de busqueda de talento/personal.
@@ -958,7 +1768,8 @@ IMPORTANTE:
                 "pais": None,
                 "cantidad": 5
             }],
-            "resumen": mensaje
+            "resumen": mensaje,
+            "fuente": "fallback"
         }
     
     # Limpiar respuesta (quitar markdown si existe)
@@ -968,7 +1779,7 @@ IMPORTANTE:
         result = re.sub(r'\n?```$', '', result)
     
     try:
-        return json.loads(result)
+        return {**json.loads(result), "fuente": "gemini"}
     except json.JSONDecodeError:
         logger.warning(f"No se pudo parsear respuesta de Gemini: {result[:100]}")
         return {
@@ -978,24 +1789,27 @@ IMPORTANTE:
                 "pais": None,
                 "cantidad": 5
             }],
-            "resumen": mensaje
+            "resumen": mensaje,
+            "fuente": "fallback"
         }
 
 
-async def generate_natural_response(candidatos: List[PerfilCompleto], query: str) -> str:
-    """Genera respuesta en lenguaje natural."""
+async def generate_natural_response(candidatos: List[Dict[str, Any]], query: str) -> str:
+    """Genera respuesta en lenguaje natural a partir de perfiles (dicts planos)."""
     if not candidatos:
         return f"No encontré candidatos que coincidan con tu búsqueda: '{query}'"
     
     # Construir resumen para Gemini
     resumen = f"Consulta: {query}\n\nCandidatos encontrados ({len(candidatos)}):\n"
     for i, c in enumerate(candidatos[:5], 1):
-        certs_str = ", ".join([cert.nombre[:30] for cert in c.certificaciones[:3]]) if c.certificaciones else "Sin certificaciones"
-        skills_str = ", ".join([s.nombre for s in c.skills[:5]]) if c.skills else "Sin skills registrados"
-        resumen += f"\n{i}. {c.nombre} ({c.cargo})"
+        certs = c.get("certificaciones") or []
+        skills = c.get("skills") or []
+        certs_str = ", ".join([cert["nombre"][:30] for cert in certs[:3]]) if certs else "Sin certificaciones"
+        skills_str = ", ".join([s["nombre"] for s in skills[:5]]) if skills else "Sin skills registrados"
+        resumen += f"\n{i}. {c['nombre']} ({c['cargo']})"
         resumen += f"\n   - Certs: {certs_str}"
         resumen += f"\n   - Skills: {skills_str}"
-        resumen += f"\n   - Match: {c.match_principal} (score: {c.score:.0%})"
+        resumen += f"\n   - Match: {c['match_principal']} (score: {c['score']:.0%})"
     
     prompt = f"""Basándote en estos resultados de búsqueda, genera una respuesta breve y profesional para el usuario:
 
@@ -1012,7 +1826,43 @@ La respuesta debe:
         return result
     
     # Fallback
-    return f"Encontré {len(candidatos)} candidatos. El mejor match es {candidatos[0].nombre} ({candidatos[0].cargo}) con {len(candidatos[0].certificaciones)} certificaciones y {len(candidatos[0].skills)} skills."
+    mejor = candidatos[0]
+    return f"Encontré {len(candidatos)} candidatos. El mejor match es {mejor['nombre']} ({mejor['cargo']}) con {len(mejor.get('certificaciones') or [])} certificaciones y {len(mejor.get('skills') or [])} skills."
+
+
+# ============================================
+# CACHE SEMANTICO DE CHAT
+# ============================================
+
+def get_chat_cache(tipo: str):
+    """Cache semantico de /chat por tipo ("interpretacion" o "respuesta")."""
+    if tipo not in _chat_caches:
+        from semantic_cache import SemanticCache
+        _chat_caches[tipo] = SemanticCache(
+            threshold=CHAT_CACHE_THRESHOLD,
+            ttl_seconds=CHAT_CACHE_TTL,
+            max_entries=CHAT_CACHE_MAX_ENTRIES
+        )
+    return _chat_caches[tipo]
+
+
+def clear_chat_caches():
+    """Invalida el cache de chat (los indices cambiaron)."""
+    for cache in _chat_caches.values():
+        cache.clear()
+
+
+def chat_cache_guard(mensaje: str) -> str:
+    """
+    Clave exacta que acompana a la similitud: cantidades, paises, seniority,
+    roles y tecnologias mencionados. Dos consultas solo comparten cache si
+    coinciden en ella ("Java" y "Python" difieren en un token y pueden
+    superar el umbral de similitud).
+    """
+    numeros, seniority, paises, perfiles = get_query_interpreter().signals(mensaje, _available_countries)
+    return "#".join([
+        "|".join(map(str, numeros)), "|".join(seniority), "|".join(paises), "|".join(perfiles)
+    ])
 
 
 # ============================================
@@ -1040,6 +1890,16 @@ def get_statistics() -> Dict[str, Any]:
             "top_skills": df["skill"].value_counts().head(20).to_dict()
         }
     
+    if _cv_chunking_report:
+        stats["cvs_chunking"] = _cv_chunking_report
+    if _cv_dedup_report:
+        stats["cvs_deduplicacion"] = _cv_dedup_report
+    
+    if _chat_caches:
+        stats["chat_cache"] = {tipo: cache.stats() for tipo, cache in _chat_caches.items()}
+    if _query_interpreter is not None:
+        stats["chat_interprete"] = _query_interpreter.stats()
+    
     stats["paises_disponibles"] = _available_countries
     
     return stats
@@ -1052,16 +1912,16 @@ def get_statistics() -> Dict[str, Any]:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle: inicializa DB al arrancar."""
+    global _readiness
     logger.info("=" * 60)
     logger.info("MCP Talent Search Server v4.0 (con CVs)")
     logger.info(f"Gemini: {GEMINI_MODEL} ({'configurado' if GOOGLE_API_KEY else 'NO configurado'})")
     logger.info("=" * 60)
     
     try:
-        initialize_vector_db()
-        # v4.0: Inicializar CVs
-        initialize_cv_index()
+        initialize_all()
     except Exception as e:
+        _readiness = "error"
         logger.error(f"Error inicializando: {e}")
     
     yield
@@ -1108,6 +1968,12 @@ GET /cvs/download/12345
     redoc_url="/redoc"
 )
 
+# Compresion negociada por Accept-Encoding (br si esta instalado, si no gzip)
+if BROTLI_AVAILABLE:
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1139,13 +2005,36 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 
+def dumps_json(content: Any) -> bytes:
+    """Serializa a JSON compacto con orjson (json estandar si no esta instalado)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, separators=(",", ":"),
+        default=lambda o: o.item() if hasattr(o, "item") else str(o)
+    ).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON serializada con orjson (json estandar si no esta instalado).
+    
+    Los endpoints de busqueda la retornan directamente con dicts planos: FastAPI
+    no re-valida contra response_model, que se mantiene solo para el OpenAPI.
+    """
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
 # === ENDPOINTS ===
 
 @app.get("/health", response_model=HealthResponse, tags=["Sistema"])
 async def health_check():
     """Verifica el estado del servicio."""
     return HealthResponse(
-        status="healthy" if _table_certs else "degraded",
+        status="healthy" if _table_certs and _readiness == "listo" else "degraded",
         version="4.0.0",
         gemini_disponible=bool(GOOGLE_API_KEY),
         total_certificaciones=_table_certs.count_rows() if _table_certs else 0,
@@ -1156,7 +2045,9 @@ async def health_check():
         modelo_embeddings=EMBEDDING_MODEL,
         # v4.0: Info de CVs
         total_cvs=len(_cv_mapping),
-        total_cv_chunks=_table_cvs.count_rows() if _table_cvs else 0
+        total_cv_chunks=_table_cvs.count_rows() if _table_cvs else 0,
+        readiness=_readiness,
+        bundle_version=_bundle_manifest.get("version")
     )
 
 
@@ -1191,14 +2082,29 @@ async def search_talent(request: TalentSearchRequest):
     
     logger.info(f"Búsqueda: '{request.consulta}' | pais={request.pais} | limit={request.limit}")
     
-    candidatos = search_and_enrich(request.consulta, request.limit, request.pais)
+    if request.paginar or request.cursor:
+        try:
+            pagina = search_page(request.consulta, request.limit, request.pais, request.cursor, proyeccion=request)
+        except CursorError as e:
+            raise HTTPException(410, str(e))
+        candidatos = pagina["candidatos"]
+        return FastJSONResponse({
+            "exito": bool(candidatos),
+            "mensaje": f"Se encontraron {pagina['total_ranking']} candidatos" if candidatos else "No se encontraron candidatos",
+            "candidatos": candidatos,
+            "total": len(candidatos),
+            "siguiente_cursor": pagina["siguiente_cursor"],
+            "total_ranking": pagina["total_ranking"]
+        })
     
-    return TalentSearchResponse(
-        exito=bool(candidatos),
-        mensaje=f"Se encontraron {len(candidatos)} candidatos" if candidatos else "No se encontraron candidatos",
-        candidatos=candidatos,
-        total=len(candidatos)
-    )
+    candidatos = search_profiles(request.consulta, request.limit, request.pais, proyeccion=request)
+    
+    return FastJSONResponse({
+        "exito": bool(candidatos),
+        "mensaje": f"Se encontraron {len(candidatos)} candidatos" if candidatos else "No se encontraron candidatos",
+        "candidatos": candidatos,
+        "total": len(candidatos)
+    })
 
 
 @app.post("/batch-search", response_model=BatchSearchResponse, tags=["Búsqueda"])
@@ -1213,15 +2119,71 @@ async def batch_search(request: BatchSearchRequest):
     
     logger.info(f"Batch search: {len(request.roles)} roles")
     
-    resultados = search_for_roles(request.roles)
-    total_candidatos = sum(r.total for r in resultados.values())
+    resultados = search_roles_profiles(request.roles, proyeccion=request)
+    total_candidatos = sum(r["total"] for r in resultados.values())
     
-    return BatchSearchResponse(
-        exito=True,
-        mensaje=f"Búsqueda completada: {len(request.roles)} roles, {total_candidatos} candidatos",
-        resultados=resultados,
-        total_roles=len(request.roles),
-        total_candidatos=total_candidatos
+    return FastJSONResponse({
+        "exito": True,
+        "mensaje": f"Búsqueda completada: {len(request.roles)} roles, {total_candidatos} candidatos",
+        "resultados": resultados,
+        "total_roles": len(request.roles),
+        "total_candidatos": total_candidatos
+    })
+
+
+async def _batch_search_ndjson(request: BatchSearchRequest):
+    """
+    Genera un registro NDJSON por rol apenas se resuelve, y un resumen final.
+    
+    Registros:
+    - {"tipo": "rol", "rol_id", "descripcion", "candidatos", "total"}
+    - {"tipo": "error", "rol_id", "error"}  (el stream continua con el siguiente rol)
+    - {"tipo": "resumen", "exito", "mensaje", "total_roles", "total_candidatos", "roles_fallidos"}
+    """
+    total_candidatos = 0
+    fallidos = []
+    
+    for rol in request.roles:
+        try:
+            # La busqueda es sincrona: se ejecuta fuera del event loop para
+            # que cada registro se envie al cliente mientras se resuelve el siguiente
+            resultado = await run_in_threadpool(search_roles_profiles, [rol], request)
+            registro = resultado[rol.rol_id]
+            total_candidatos += registro["total"]
+            yield dumps_json({"tipo": "rol", **registro}) + b"\n"
+        except Exception as e:
+            logger.error(f"Error en rol {rol.rol_id}: {e}")
+            fallidos.append(rol.rol_id)
+            yield dumps_json({"tipo": "error", "rol_id": rol.rol_id, "error": str(e)}) + b"\n"
+    
+    yield dumps_json({
+        "tipo": "resumen",
+        "exito": len(fallidos) < len(request.roles),
+        "mensaje": f"Búsqueda completada: {len(request.roles)} roles, {total_candidatos} candidatos",
+        "total_roles": len(request.roles),
+        "total_candidatos": total_candidatos,
+        "roles_fallidos": fallidos
+    }) + b"\n"
+
+
+@app.post("/batch-search/stream", tags=["Búsqueda"])
+async def batch_search_stream(request: BatchSearchRequest):
+    """
+    Variante streaming de /batch-search (application/x-ndjson).
+    
+    Emite un registro JSON por linea por cada rol resuelto y un registro final
+    de resumen, de modo que el cliente puede persistir resultados parciales
+    sin esperar (ni perder por timeout) la respuesta completa.
+    """
+    if _table_certs is None and _table_skills is None:
+        raise HTTPException(503, "Base de datos no inicializada")
+    
+    logger.info(f"Batch search (stream): {len(request.roles)} roles")
+    
+    return StreamingResponse(
+        _batch_search_ndjson(request),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
@@ -1242,47 +2204,94 @@ async def chat_natural(request: ChatRequest):
     
     logger.info(f"Chat: '{request.mensaje}'")
     
+    # Cache semantico: consultas parecidas (con las mismas cantidades, paises
+    # y seniority) reutilizan la interpretacion y, si aplica, la respuesta
+    interpretacion = None
+    cache_usado = None
+    if CHAT_CACHE_ENABLED:
+        vector = get_model().encode(request.mensaje, normalize_embeddings=True)
+        guard = chat_cache_guard(request.mensaje)
+        guard_respuesta = guard + "#" + json.dumps([
+            request.pais_default, sorted(request.campos_perfil()),
+            request.max_certificaciones, request.max_skills
+        ])
+        
+        if CHAT_CACHE_RESPONSES:
+            hit = get_chat_cache("respuesta").get(vector, guard_respuesta)
+            if hit:
+                respuesta_cache, similitud = hit
+                logger.info(f"Chat: respuesta desde cache (similitud {similitud:.3f})")
+                return FastJSONResponse({
+                    **respuesta_cache,
+                    "mensaje_original": request.mensaje,
+                    "cache": "respuesta"
+                })
+        
+        hit = get_chat_cache("interpretacion").get(vector, guard)
+        if hit:
+            interpretacion = copy.deepcopy(hit[0])
+            cache_usado = "interpretacion"
+            logger.info(f"Chat: interpretacion desde cache (similitud {hit[1]:.3f})")
+    
     # Interpretar con Gemini
-    interpretacion = await interpret_natural_query(request.mensaje)
+    nueva = interpretacion is None
+    if nueva:
+        interpretacion = await interpret_natural_query(request.mensaje)
+    
+    # Validar antes de cachear: una interpretacion invalida (p.ej. cantidad
+    # fuera de rango devuelta por Gemini) es un error del request, no del servidor
+    try:
+        roles = [RequerimientoRol(**r) for r in interpretacion.get("roles", [])]
+    except ValidationError as e:
+        logger.warning(f"Chat: interpretacion invalida para '{request.mensaje}': {e}")
+        raise HTTPException(422, f"No se pudo interpretar la consulta: {e.errors()[0].get('msg')}")
+    
+    # El fallback basico no se cachea: la proxima vez puede responder Gemini
+    if nueva and CHAT_CACHE_ENABLED and interpretacion.get("fuente") != "fallback":
+        get_chat_cache("interpretacion").put(vector, copy.deepcopy(interpretacion), guard)
     
     # Aplicar pais default si no se especifico
     if request.pais_default:
-        for rol in interpretacion.get("roles", []):
+        for rol, requerimiento in zip(interpretacion.get("roles", []), roles):
             if not rol.get("pais"):
-                rol["pais"] = request.pais_default
+                rol["pais"] = requerimiento.pais = request.pais_default
     
     # Buscar candidatos
-    roles = [RequerimientoRol(**r) for r in interpretacion.get("roles", [])]
-    resultados = search_for_roles(roles)
+    resultados = search_roles_profiles(roles, proyeccion=request)
     
     # Aplanar candidatos
     todos_candidatos = []
     for resultado in resultados.values():
-        todos_candidatos.extend(resultado.candidatos)
+        todos_candidatos.extend(resultado["candidatos"])
     
     # Deduplicar por matricula (mantener mejor score)
     seen = {}
     for c in todos_candidatos:
-        if c.matricula not in seen or c.score > seen[c.matricula].score:
-            seen[c.matricula] = c
-    candidatos_unicos = sorted(seen.values(), key=lambda x: x.score, reverse=True)
+        if c["matricula"] not in seen or c["score"] > seen[c["matricula"]]["score"]:
+            seen[c["matricula"]] = c
+    candidatos_unicos = sorted(seen.values(), key=lambda x: x["score"], reverse=True)
     
     # Generar respuesta natural
     respuesta = await generate_natural_response(candidatos_unicos, request.mensaje)
     
-    return ChatResponse(
-        exito=bool(candidatos_unicos),
-        mensaje_original=request.mensaje,
-        interpretacion=interpretacion,
-        candidatos=candidatos_unicos,
-        total=len(candidatos_unicos),
-        respuesta_natural=respuesta
-    )
+    contenido = {
+        "exito": bool(candidatos_unicos),
+        "mensaje_original": request.mensaje,
+        "interpretacion": interpretacion,
+        "candidatos": candidatos_unicos,
+        "total": len(candidatos_unicos),
+        "respuesta_natural": respuesta
+    }
+    if CHAT_CACHE_ENABLED and CHAT_CACHE_RESPONSES and interpretacion.get("fuente") != "fallback":
+        get_chat_cache("respuesta").put(vector, contenido, guard_respuesta)
+    
+    return FastJSONResponse({**contenido, "cache": cache_usado})
 
 
 @app.post("/reindex", tags=["Sistema"])
 async def reindex():
     """Reconstruye los índices vectoriales."""
+    _ensure_writable_index()
     try:
         logger.info("Reconstruyendo índices...")
         
@@ -1291,13 +2300,19 @@ async def reindex():
         _df_certs_raw = None
         _df_skills_raw = None
         
+        initialize_directory()
         initialize_vector_db(force_rebuild=True)
+        initialize_term_index()
+        initialize_candidate_index(force_rebuild=True)
+        clear_chat_caches()
+        bump_index_generation()
         
         return {
             "exito": True,
             "mensaje": "Índices reconstruidos",
             "certificaciones": _table_certs.count_rows() if _table_certs else 0,
-            "skills": _table_skills.count_rows() if _table_skills else 0
+            "skills": _table_skills.count_rows() if _table_skills else 0,
+            "candidatos": _table_candidates.count_rows() if _table_candidates else 0
         }
     except Exception as e:
         raise HTTPException(500, str(e))
@@ -1391,6 +2406,7 @@ async def reindex_cvs():
     - Se corrige el archivo cv_mapping.xlsx
     - Se quiere regenerar el matching automatico
     """
+    _ensure_writable_index()
     try:
         logger.info("Reindexando CVs...")
         
@@ -1402,12 +2418,17 @@ async def reindex_cvs():
             shutil.copy(CV_MAPPING_FILE, backup_path)
         
         initialize_cv_index(force_rebuild=True)
+        initialize_candidate_index(force_rebuild=True)
+        clear_chat_caches()
+        bump_index_generation()
         
         return {
             "exito": True,
             "mensaje": "CVs reindexados",
             "total_chunks": _table_cvs.count_rows() if _table_cvs else 0,
             "total_cvs_mapeados": len(_cv_mapping),
+            "chunking": _cv_chunking_report,
+            "deduplicacion": _cv_dedup_report,
             "revisar": f"Ver GET /cvs/mapping-review para CVs que requieren revision manual"
         }
     except Exception as e:
@@ -1424,49 +2445,102 @@ try:
     mcp = FastMCP("talent-search")
     MCP_AVAILABLE = True
     
+    from tool_output import CompactFormatter
+    _formatter = CompactFormatter(token_budget=MCP_TOOL_TOKEN_BUDGET)
+    
+    def _detalle_compacto(detalle: Optional[str]) -> bool:
+        return (detalle or MCP_TOOL_DETALLE) != "completo"
+    
     @mcp.tool()
-    def buscar_talento(consulta: str, pais: str = None, limit: int = 10) -> str:
+    def buscar_talento(consulta: str, pais: str = None, limit: int = 10,
+                       detalle: str = None, presupuesto_tokens: int = None) -> str:
         """
-        Busca candidatos con perfiles enriquecidos (todas las certs y skills).
+        Busca candidatos con perfiles enriquecidos (certs, skills y CVs).
+        
+        En modo compacto cada candidato trae solo la evidencia mas relevante
+        para la consulta; usar obtener_perfil(matricula) para el detalle.
         
         Args:
             consulta: Skills o certificaciones buscadas
             pais: Filtro por país (opcional)
             limit: Máximo de resultados
+            detalle: "compacto" o "completo" (por defecto MCP_TOOL_DETALLE)
+            presupuesto_tokens: Tokens máximos de la respuesta en modo compacto
         """
-        candidatos = search_and_enrich(consulta, limit, pais)
+        candidatos = search_profiles(consulta, limit, pais)
+        
+        if not _detalle_compacto(detalle):
+            return json.dumps({
+                "exito": bool(candidatos),
+                "total": len(candidatos),
+                "candidatos": candidatos
+            }, ensure_ascii=False, indent=2)
+        
         return json.dumps({
             "exito": bool(candidatos),
             "total": len(candidatos),
-            "candidatos": [c.model_dump() for c in candidatos]
-        }, ensure_ascii=False, indent=2)
+            **_formatter.format(candidatos, consulta, presupuesto_tokens),
+            "detalle": "obtener_perfil(matricula) para el perfil completo"
+        }, ensure_ascii=False, separators=(",", ":"))
     
     @mcp.tool()
-    def buscar_equipo(roles_json: str) -> str:
+    def buscar_equipo(roles_json: str, detalle: str = None, presupuesto_tokens: int = None) -> str:
         """
         Busca equipo completo para múltiples roles.
         
         Args:
             roles_json: JSON con formato:
                 [{"rol_id": "Dev_Java", "descripcion": "Java Spring", "pais": "Chile", "cantidad": 3}]
+            detalle: "compacto" o "completo" (por defecto MCP_TOOL_DETALLE)
+            presupuesto_tokens: Tokens máximos de la respuesta en modo compacto
+                (se reparte en partes iguales entre roles)
         """
         try:
             roles_data = json.loads(roles_json)
             roles = [RequerimientoRol(**r) for r in roles_data]
-            resultados = search_for_roles(roles)
+            resultados = search_roles_profiles(roles)
+            compacto = _detalle_compacto(detalle)
+            presupuesto_rol = (presupuesto_tokens or MCP_TOOL_TOKEN_BUDGET) // max(1, len(resultados))
             
             output = {}
             for rol_id, res in resultados.items():
-                output[rol_id] = {
-                    "descripcion": res.descripcion,
-                    "total": res.total,
-                    "candidatos": [c.model_dump() for c in res.candidatos]
-                }
+                if compacto:
+                    output[rol_id] = {
+                        "descripcion": res["descripcion"],
+                        "total": res["total"],
+                        **_formatter.format(res["candidatos"], res["descripcion"], presupuesto_rol)
+                    }
+                else:
+                    output[rol_id] = {
+                        "descripcion": res["descripcion"],
+                        "total": res["total"],
+                        "candidatos": res["candidatos"]
+                    }
             
+            if compacto:
+                return json.dumps({
+                    "exito": True,
+                    "resultados": output,
+                    "detalle": "obtener_perfil(matricula) para el perfil completo"
+                }, ensure_ascii=False, separators=(",", ":"))
             return json.dumps({"exito": True, "resultados": output}, ensure_ascii=False, indent=2)
         except Exception as e:
             return json.dumps({"exito": False, "error": str(e)}, ensure_ascii=False)
     
+    @mcp.tool()
+    def obtener_perfil(matricula: str) -> str:
+        """
+        Perfil completo de un candidato: todas sus certificaciones, skills,
+        líder y disponibilidad de CV.
+        
+        Args:
+            matricula: Matrícula retornada por buscar_talento o buscar_equipo
+        """
+        perfil = profile_for_matricula(matricula)
+        if perfil is None:
+            return json.dumps({"exito": False, "error": f"Matrícula no encontrada: {matricula}"}, ensure_ascii=False)
+        return json.dumps({"exito": True, "perfil": perfil}, ensure_ascii=False, indent=2)
+    
     @mcp.tool()
     def listar_paises() -> str:
         """Lista países disponibles."""
@@ -1487,7 +2561,7 @@ def main():
     
     if mode == "mcp" and MCP_AVAILABLE:
         logger.info("Modo MCP (stdio)")
-        initialize_vector_db()
+        initialize_all()
         mcp.run()
     else:
         port = int(os.environ.get("MCP_PORT", "8080"))
@@ -0,0 +1,189 @@
+"""
+Term Index - Indice invertido en memoria de skills y certificaciones.
+
+Proceso:
+1. Normaliza cada nombre de skill ("Conhecimento") y certificacion ("Certificação")
+2. Construye termino normalizado -> {matricula: proficiencia}
+3. Resuelve consultas que son listas de nombres exactos sin embeddings
+4. Calcula un score por candidato segun cuantos items requeridos posee
+
+Las consultas pueden venir como lista explicita de terminos o como texto
+libre; en texto libre se buscan los n-gramas mas largos que existan en el
+indice y se mide que fraccion de la consulta quedo cubierta.
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Iterable
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExactHit:
+    """
+    Items requeridos que posee un candidato.
+
+    Attributes:
+        matricula: Matricula del colaborador
+        terminos: Nombres (originales) de los items que posee
+        fraccion: Fraccion ponderada de la consulta que cubren sus items (0-1)
+    """
+    matricula: str
+    terminos: List[str] = field(default_factory=list)
+    fraccion: float = 0.0
+
+    @property
+    def score(self) -> float:
+        return round(100 * self.fraccion, 2)
+
+
+@dataclass
+class ExactLookup:
+    """
+    Resultado de resolver una consulta contra el indice.
+
+    Attributes:
+        encontrados: Terminos normalizados encontrados en el indice
+        cobertura: Fraccion de la consulta cubierta por terminos exactos (0-1)
+        hits: Candidatos que poseen al menos un termino, por matricula
+    """
+    encontrados: List[str] = field(default_factory=list)
+    cobertura: float = 0.0
+    hits: Dict[str, ExactHit] = field(default_factory=dict)
+
+    @property
+    def completa(self) -> bool:
+        """True si toda la consulta se resolvio con terminos exactos."""
+        return bool(self.encontrados) and self.cobertura >= 1.0
+
+    def ranked(self) -> List[ExactHit]:
+        return sorted(self.hits.values(), key=lambda h: h.fraccion, reverse=True)
+
+
+class TermIndex:
+    """
+    Indice invertido termino -> matriculas.
+
+    Caracteristicas:
+    - Normalizacion sin acentos ni puntuacion (mismo termino en PT/ES)
+    - Las skills guardan la proficiencia (1-5) y pesan segun ella
+    - Las certificaciones pesan 1
+    """
+
+    def __init__(self, max_words: int = 12):
+        """
+        Inicializa el indice vacio.
+
+        Args:
+            max_words: Largo maximo (en palabras) de un termino buscado en texto libre
+        """
+        self.max_words = max_words
+        self.postings: Dict[str, Dict[str, Optional[int]]] = {}
+        self.display: Dict[str, str] = {}
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Minusculas, sin acentos, alfanumericos separados por un espacio."""
+        text = unicodedata.normalize('NFD', str(text).lower())
+        text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+        return re.sub(r'[^a-z0-9+#]+', ' ', text).strip()
+
+    def add(self, term: str, matricula: str, proficiencia: Optional[int] = None):
+        """Registra que `matricula` posee `term`."""
+        key = self.normalize(term)
+        if not key or not matricula:
+            return
+        if len(key.split()) > self.max_words:
+            self.max_words = len(key.split())
+        self.display.setdefault(key, str(term).strip())
+        by_mat = self.postings.setdefault(key, {})
+        prev = by_mat.get(matricula)
+        if matricula not in by_mat or (proficiencia or 0) > (prev or 0):
+            by_mat[matricula] = proficiencia
+
+    @classmethod
+    def from_columns(
+        cls,
+        cert_pairs: Iterable,
+        skill_triples: Iterable
+    ) -> "TermIndex":
+        """
+        Construye el indice.
+
+        Args:
+            cert_pairs: Iterable de (matricula, certificacion)
+            skill_triples: Iterable de (matricula, skill, proficiencia_str)
+        """
+        index = cls()
+        for matricula, cert in cert_pairs:
+            index.add(cert, matricula)
+        for matricula, skill, prof in skill_triples:
+            prof = str(prof).strip()
+            index.add(skill, matricula, int(prof) if prof.isdigit() else None)
+        logger.info(f"TermIndex: {len(index.postings)} terminos")
+        return index
+
+    @staticmethod
+    def _weight(proficiencia: Optional[int]) -> float:
+        # Certificaciones (None) pesan 1; skills entre 0.8 (nivel 1) y 1.0 (nivel 5)
+        if proficiencia is None:
+            return 1.0
+        return 0.75 + 0.05 * max(1, min(5, proficiencia))
+
+    def _score(self, keys: List[str], n_requested: int) -> Dict[str, ExactHit]:
+        hits: Dict[str, ExactHit] = {}
+        if not n_requested:
+            return hits
+        for key in keys:
+            for matricula, prof in self.postings.get(key, {}).items():
+                hit = hits.setdefault(matricula, ExactHit(matricula=matricula))
+                hit.terminos.append(self.display[key])
+                hit.fraccion += self._weight(prof) / n_requested
+        return hits
+
+    def lookup_terms(self, terms: List[str]) -> ExactLookup:
+        """Resuelve una lista explicita de nombres de skills/certificaciones."""
+        keys = list(dict.fromkeys(k for k in (self.normalize(t) for t in terms) if k))
+        found = [k for k in keys if k in self.postings]
+        return ExactLookup(
+            encontrados=found,
+            cobertura=len(found) / len(keys) if keys else 0.0,
+            hits=self._score(found, len(keys))
+        )
+
+    def lookup_text(self, text: str) -> ExactLookup:
+        """
+        Resuelve texto libre buscando, de izquierda a derecha, el n-grama mas
+        largo presente en el indice.
+
+        La fraccion de cada candidato se escala por la cobertura de la
+        consulta: poseer el unico termino reconocido de una frase larga no
+        equivale a cumplirla entera.
+        """
+        tokens = self.normalize(text).split()
+        if not tokens:
+            return ExactLookup()
+
+        found: List[str] = []
+        covered = 0
+        i = 0
+        while i < len(tokens):
+            for size in range(min(self.max_words, len(tokens) - i), 0, -1):
+                candidate = ' '.join(tokens[i:i + size])
+                if candidate in self.postings:
+                    if candidate not in found:
+                        found.append(candidate)
+                    covered += size
+                    i += size
+                    break
+            else:
+                i += 1
+
+        cobertura = covered / len(tokens)
+        hits = self._score(found, len(found))
+        for hit in hits.values():
+            hit.fraccion *= cobertura
+        return ExactLookup(encontrados=found, cobertura=cobertura, hits=hits)
@@ -86,6 +86,7 @@ def run_all_tests(include_chat=True, chat_only=False):
             ("Batch Un Rol", test_03_batch.test_batch_search_single_role()),
             ("Batch Multiples Roles", test_03_batch.test_batch_search_multiple_roles()),
             ("Team Building RFP", test_03_batch.test_batch_search_team_building()),
+            ("Mismos Skills Distinta Descripcion", test_03_batch.test_batch_search_same_skills_different_descriptions()),
         ]
         all_results.extend(results)
     
@@ -168,11 +168,57 @@ def test_batch_search_team_building():
         return False
 
 
+def test_batch_search_same_skills_different_descriptions():
+    """Roles con los mismos skills exactos pero distinta descripcion no devuelven el mismo ranking."""
+    print_header("TEST: Batch Search - Mismos Skills, Distinta Descripcion")
+    
+    try:
+        payload = {
+            "roles": [
+                {
+                    "rol_id": "Java_Backend",
+                    "descripcion": "Desarrollador backend Spring Boot microservicios APIs REST",
+                    "cantidad": 5,
+                    "skills": ["Java"]
+                },
+                {
+                    "rol_id": "Java_Mobile",
+                    "descripcion": "Desarrollador mobile Android aplicaciones moviles Kotlin",
+                    "cantidad": 5,
+                    "skills": ["Java"]
+                }
+            ]
+        }
+        
+        response = requests.post(f"{BASE_URL}/batch-search", json=payload, timeout=TIMEOUT)
+        
+        assert response.status_code == 200, f"Status: {response.status_code}"
+        print_ok(f"Status code: {response.status_code}")
+        
+        data = response.json()
+        backend = [c["matricula"] for c in data["resultados"]["Java_Backend"]["candidatos"]]
+        mobile = [c["matricula"] for c in data["resultados"]["Java_Mobile"]["candidatos"]]
+        
+        print_info(f"Java_Backend: {backend}")
+        print_info(f"Java_Mobile: {mobile}")
+        
+        assert backend and mobile, "No se encontraron candidatos"
+        assert backend != mobile, "La descripcion no influye en el ranking"
+        
+        print_ok("Mismos skills, distinta descripcion PASSED")
+        return True
+        
+    except Exception as e:
+        print_fail(f"Error: {e}")
+        return False
+
+
 if __name__ == "__main__":
     results = []
     results.append(("Batch Un Rol", test_batch_search_single_role()))
     results.append(("Batch Multiples Roles", test_batch_search_multiple_roles()))
     results.append(("Team Building RFP", test_batch_search_team_building()))
+    results.append(("Mismos Skills Distinta Descripcion", test_batch_search_same_skills_different_descriptions()))
     
     print_header("RESUMEN")
     passed = sum(1 for _, r in results if r)
@@ -0,0 +1,146 @@
+"""
+Test de deduplicacion de chunks de CVs (sin servidor).
+=======================================================
+Verifica CVDeduplicator: duplicados exactos y casi-duplicados dentro de un
+CV, y que el boilerplate de corpus nunca deje un CV sin chunks.
+
+Uso: python tests/test_cv_dedup.py
+"""
+import sys
+import os
+
+# Configurar encoding para Windows
+if sys.platform == "win32":
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except:
+        pass
+
+# Agregar directorio padre al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import print_header, print_ok, print_fail, print_info
+from cv_dedup import CVDeduplicator
+from cv_processor import CVChunk
+
+
+PLANTILLA = (
+    "Empresa XYZ consultoria tecnologica lider en soluciones de software "
+    "para la region con presencia en cinco paises y mas de mil colaboradores"
+)
+
+
+def _chunk(cv: str, chunk_id: int, text: str) -> CVChunk:
+    return CVChunk(matricula=cv.upper(), chunk_id=chunk_id, text=text,
+                   page_num=1, cv_filename=f"{cv}.pdf")
+
+
+def test_exact_and_near_duplicates_in_cv():
+    """Duplicados exactos (normalizados) y casi-duplicados del mismo CV."""
+    print_header("TEST: Duplicados Exactos y Casi-Duplicados")
+
+    try:
+        base = (
+            "Desarrollador backend con ocho anos de experiencia en Java Spring Boot "
+            "microservicios Kafka PostgreSQL y despliegues en Kubernetes sobre AWS "
+            "liderando equipos de cinco personas en proyectos de banca y retail"
+        )
+        chunks = [
+            _chunk("cv1", 0, base),
+            _chunk("cv1", 1, base.upper() + "!!"),            # exacto tras normalizar
+            _chunk("cv1", 2, base + " y seguros"),            # casi-duplicado
+            _chunk("cv1", 3, "Certificaciones: AWS Solutions Architect, CKA"),
+            _chunk("cv2", 0, base),                           # otro CV: se conserva
+        ]
+
+        kept, report = CVDeduplicator().deduplicate(chunks)
+        print_info(f"Reporte: {report.to_dict()}")
+
+        assert report.exact_duplicates == 1, f"Exactos: {report.exact_duplicates}"
+        assert report.near_duplicates == 1, f"Casi: {report.near_duplicates}"
+        assert report.boilerplate == 0
+        assert [(c.cv_filename, c.chunk_id) for c in kept] == [
+            ("cv1.pdf", 0), ("cv1.pdf", 3), ("cv2.pdf", 0)
+        ]
+
+        print_ok("Duplicados dentro de un CV PASSED")
+        return True
+
+    except Exception as e:
+        print_fail(f"Error: {e}")
+        return False
+
+
+def test_boilerplate_keeps_one_chunk_per_cv():
+    """CVs de un solo chunk con el mismo texto no desaparecen del indice."""
+    print_header("TEST: Boilerplate No Vacia CVs")
+
+    try:
+        chunks = [_chunk(f"cv{i}", 0, PLANTILLA) for i in range(5)]
+
+        kept, report = CVDeduplicator(boilerplate_min_cvs=5).deduplicate(chunks)
+        print_info(f"Reporte: {report.to_dict()}")
+
+        assert report.boilerplate == 0, f"Boilerplate: {report.boilerplate}"
+        assert report.kept_chunks == 5
+        assert {c.cv_filename for c in kept} == {f"cv{i}.pdf" for i in range(5)}
+
+        print_ok("Un chunk por CV PASSED")
+        return True
+
+    except Exception as e:
+        print_fail(f"Error: {e}")
+        return False
+
+
+def test_boilerplate_keeps_most_distinctive_chunk():
+    """Si todo el CV es boilerplate se conserva el chunk de cluster mas chico."""
+    print_header("TEST: Boilerplate Conserva el Chunk Mas Distintivo")
+
+    try:
+        firma = "Documento confidencial de uso interno generado por el sistema de talento humano corporativo"
+        chunks = []
+        for i in range(6):
+            chunks.append(_chunk(f"cv{i}", 0, PLANTILLA))
+            # La firma aparece en 5 CVs (cv0..cv4), la plantilla en los 6
+            if i < 5:
+                chunks.append(_chunk(f"cv{i}", 1, firma))
+        chunks.append(_chunk("cv5", 1, "Arquitecto cloud con experiencia en Azure y GCP"))
+
+        kept, report = CVDeduplicator(boilerplate_min_cvs=5).deduplicate(chunks)
+        print_info(f"Reporte: {report.to_dict()}")
+
+        kept_by_cv = {}
+        for c in kept:
+            kept_by_cv.setdefault(c.cv_filename, []).append(c.text)
+
+        # cv0..cv4: solo boilerplate -> conservan la firma (5 CVs < 6 CVs)
+        for i in range(5):
+            assert kept_by_cv.get(f"cv{i}.pdf") == [firma], f"cv{i}: {kept_by_cv.get(f'cv{i}.pdf')}"
+        # cv5 tiene texto propio: su plantilla se elimina
+        assert kept_by_cv["cv5.pdf"] == ["Arquitecto cloud con experiencia en Azure y GCP"]
+        assert report.boilerplate == 6
+
+        print_ok("Chunk mas distintivo PASSED")
+        return True
+
+    except Exception as e:
+        print_fail(f"Error: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    results = []
+    results.append(("Duplicados en un CV", test_exact_and_near_duplicates_in_cv()))
+    results.append(("Boilerplate un chunk por CV", test_boilerplate_keeps_one_chunk_per_cv()))
+    results.append(("Boilerplate chunk distintivo", test_boilerplate_keeps_most_distinctive_chunk()))
+
+    print_header("RESUMEN")
+    passed = sum(1 for _, r in results if r)
+    total = len(results)
+
+    for name, result in results:
+        status = "[OK]" if result else "[FAIL]"
+        print(f"  {status} {name}")
+
+    print(f"\nTotal: {passed}/{total} tests passed")
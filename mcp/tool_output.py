@@ -0,0 +1,158 @@
+"""
+Tool Output - Salida compacta de las tools MCP con presupuesto de tokens.
+
+Proceso:
+1. Reduce cada perfil a sus datos basicos (matricula, nombre, cargo, pais, score)
+2. Convierte certificaciones, skills y matches de CV en lineas de evidencia
+3. Ordena la evidencia por relevancia respecto a la consulta
+4. Agrega evidencia por candidato mientras quepa en el presupuesto de tokens
+5. Informa cuanta evidencia se omitio (el perfil completo se pide aparte)
+
+Los tokens se estiman por caracteres (~4 por token) sobre el JSON compacto:
+no depende del tokenizer del LLM que consume la tool.
+"""
+
+import json
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+import logging
+
+from term_index import TermIndex
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(obj: Any) -> int:
+    """Estimacion de tokens del JSON compacto de `obj`."""
+    text = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class _Evidencia:
+    texto: str
+    relevancia: float
+
+
+class CompactFormatter:
+    """
+    Formatea perfiles para el contexto de un LLM.
+
+    Caracteristicas:
+    - Datos basicos siempre incluidos
+    - Evidencia rankeada: terminos de la consulta > match principal > proficiencia
+    - Presupuesto de tokens repartido en partes iguales entre candidatos
+    """
+
+    def __init__(self, token_budget: int = 1500, cv_snippet_chars: int = 160):
+        """
+        Inicializa el formateador.
+
+        Args:
+            token_budget: Tokens maximos (estimados) de la salida completa
+            cv_snippet_chars: Largo maximo de cada fragmento de CV
+        """
+        self.token_budget = token_budget
+        self.cv_snippet_chars = cv_snippet_chars
+
+    @staticmethod
+    def _terms(text: Optional[str]) -> set:
+        return set(TermIndex.normalize(text or "").split())
+
+    def _relevancia(self, texto: str, query_terms: set, match_terms: set, base: float) -> float:
+        terms = self._terms(texto)
+        if not terms:
+            return base
+        overlap = len(terms & query_terms) / len(terms)
+        in_match = 1.0 if terms & match_terms else 0.0
+        return 2 * overlap + in_match + base
+
+    def evidencia(self, perfil: Dict[str, Any], query: str) -> List[str]:
+        """Lineas de evidencia de un perfil, de mas a menos relevante."""
+        query_terms = self._terms(query)
+        match_terms = self._terms(perfil.get("match_principal"))
+        items: List[_Evidencia] = []
+
+        for cert in perfil.get("certificaciones") or []:
+            texto = f"cert: {cert['nombre']}"
+            if cert.get("institucion"):
+                texto += f" ({cert['institucion']})"
+            items.append(_Evidencia(texto, self._relevancia(cert["nombre"], query_terms, match_terms, 0.3)))
+
+        for skill in perfil.get("skills") or []:
+            prof = skill.get("proficiencia")
+            texto = f"skill: {skill['nombre']}" + (f" ({prof}/5)" if prof else "")
+            base = 0.05 * (prof or 0)
+            items.append(_Evidencia(texto, self._relevancia(skill["nombre"], query_terms, match_terms, base)))
+
+        for match in perfil.get("cv_matches") or []:
+            snippet = " ".join(str(match["texto"]).split())
+            if len(snippet) > self.cv_snippet_chars:
+                snippet = snippet[:self.cv_snippet_chars].rsplit(" ", 1)[0] + "..."
+            pagina = f" p{match['pagina']}" if match.get("pagina") else ""
+            texto = f"cv{pagina}: {snippet}"
+            items.append(_Evidencia(texto, self._relevancia(snippet, query_terms, set(), match["score"] / 100)))
+
+        items.sort(key=lambda e: e.relevancia, reverse=True)
+        return [e.texto for e in items]
+
+    @staticmethod
+    def _basico(perfil: Dict[str, Any]) -> Dict[str, Any]:
+        compacto = {
+            "matricula": perfil["matricula"],
+            "nombre": perfil["nombre"],
+            "cargo": perfil["cargo"],
+            "score": perfil["score"],
+            "match": perfil["match_principal"],
+        }
+        if perfil.get("pais"):
+            compacto["pais"] = perfil["pais"]
+        if perfil.get("tiene_cv"):
+            compacto["cv"] = True
+        return compacto
+
+    def format(self, perfiles: List[Dict[str, Any]], query: str,
+               token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Formatea una lista de perfiles dentro del presupuesto.
+
+        Args:
+            perfiles: Perfiles (dicts) retornados por search_profiles
+            query: Consulta original (para rankear la evidencia)
+            token_budget: Reemplaza el presupuesto del formateador
+
+        Returns:
+            {"candidatos": [...], "evidencia_omitida": n, "tokens_estimados": n}
+        """
+        budget = token_budget or self.token_budget
+        candidatos = [self._basico(p) for p in perfiles]
+        usados = estimate_tokens(candidatos)
+        omitida = 0
+
+        # El presupuesto restante se reparte en partes iguales
+        por_candidato = max(0, budget - usados) // len(perfiles) if perfiles else 0
+
+        for perfil, compacto in zip(perfiles, candidatos):
+            lineas = self.evidencia(perfil, query)
+            elegidas: List[str] = []
+            gastado = 0
+            for i, linea in enumerate(lineas):
+                costo = estimate_tokens(linea) + 1
+                if gastado + costo > por_candidato:
+                    omitida += len(lineas) - i
+                    break
+                elegidas.append(linea)
+                gastado += costo
+            if elegidas:
+                compacto["evidencia"] = elegidas
+            if len(elegidas) < len(lineas):
+                compacto["omitidos"] = len(lineas) - len(elegidas)
+            usados += gastado
+
+        return {
+            "candidatos": candidatos,
+            "evidencia_omitida": omitida,
+            "tokens_estimados": usados
+        }